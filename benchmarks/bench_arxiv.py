@@ -0,0 +1,81 @@
+"""
+Benchmark of the arXiv collector against a local mock of the arXiv API feed.
+
+The mock holds a fixed number of "brain" papers, one every few hours going back from
+2023-09-30, and answers lastUpdatedDate ranges in search_query like the real API. For
+narrow windows it compares the old approach (fetch up to 20000 results, filter locally)
+with update._arxiv_pages, which sends the window with the query and stops early.
+
+    PYTHONPATH=. python benchmarks/bench_arxiv.py --papers 5000 --latency 0.05
+"""
+import argparse
+import time
+
+from servers import RequestCounter, arxiv_handler, serve
+
+
+def full_scan(c_date2, c_date):
+    # The collector before the date window was pushed into the query
+    import arxiv
+
+    from nbdt import update
+
+    search = arxiv.Search(
+        query="brain",
+        max_results=20000,
+        sort_by=arxiv.SortCriterion.SubmittedDate,
+        sort_order=arxiv.SortOrder.Descending,
+    )
+    client = arxiv.Client(page_size=update.ARXIV_PAGE_SIZE, delay_seconds=update.ARXIV_DELAY_SECONDS)
+    records = [update._arxiv_record(result) for result in client.results(search)]
+    import pandas as pd
+
+    return update._arxiv_frame(pd.DataFrame(records, columns=update.ARXIV_COLUMNS), c_date2, c_date)
+
+
+def windowed(c_date2, c_date):
+    import pandas as pd
+
+    from nbdt import update
+
+    records = [record for offset, page in update._arxiv_pages(c_date2, c_date) for record in page]
+    return update._arxiv_frame(pd.DataFrame(records, columns=update.ARXIV_COLUMNS), c_date2, c_date)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--papers", type=int, default=5000)
+    arg_parser.add_argument("--hours-apart", type=float, default=6)
+    arg_parser.add_argument("--latency", type=float, default=0.05)
+    args = arg_parser.parse_args()
+
+    import arxiv
+
+    from nbdt import update
+
+    counter = RequestCounter()
+    server, url = serve(arxiv_handler(args.papers, counter, args.hours_apart, args.latency))
+    arxiv.Client.query_url_format = f"{url}/api/query?{{}}"
+    update.ARXIV_DELAY_SECONDS = 0
+
+    windows = [("2023-09-24", "2023-09-30"), ("2023-09-01", "2023-09-30")]
+    try:
+        for c_date2, c_date in windows:
+            for name, collect in (("full scan", full_scan), ("windowed", windowed)):
+                before = counter.snapshot()
+                start = time.perf_counter()
+                papers = len(collect(c_date2, c_date))
+                elapsed = time.perf_counter() - start
+                after = counter.snapshot()
+                print(
+                    f"{c_date2}..{c_date} {name:9s} papers={papers:5d} "
+                    f"requests={after['requests'] - before['requests']:4d} "
+                    f"records_fetched={after['records'] - before['records']:6d} "
+                    f"wall={elapsed:6.2f}s"
+                )
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
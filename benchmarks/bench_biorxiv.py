@@ -0,0 +1,49 @@
+"""
+Benchmark of update.bioarxiv against a local mock of the bioRxiv details API.
+
+The mock serves a fixed number of records with a configurable per-request latency.
+The collector runs once with one worker (the old sequential behaviour) and once
+with the concurrent fetcher, and wall time and request counts are compared.
+
+    PYTHONPATH=. python benchmarks/bench_biorxiv.py --records 5000 --latency 0.2
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from servers import RequestCounter, biorxiv_handler, serve
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--records", type=int, default=5000)
+    arg_parser.add_argument("--latency", type=float, default=0.2)
+    arg_parser.add_argument("--workers", type=int, default=8)
+    args = arg_parser.parse_args()
+
+    counter = RequestCounter()
+    server, url = serve(biorxiv_handler(args.records, counter, args.latency))
+
+    from nbdt import update
+
+    update.BIORXIV_API_URL = url
+    cwd = os.getcwd()
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            os.chdir(tmp_dir)
+            for workers in (1, args.workers):
+                before = counter.snapshot()["requests"]
+                start = time.perf_counter()
+                update.bioarxiv(
+                    "2023-12-31", "out.csv", False, "2023-01-01", max_workers=workers, rate_limit=None
+                )
+                elapsed = time.perf_counter() - start
+                print(f"workers={workers:2d} requests={counter.snapshot()['requests'] - before:4d} wall={elapsed:6.2f}s")
+    finally:
+        os.chdir(cwd)
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""
+Memory benchmark of load_dataset(compact=True) on a MEDLINE-shaped CSV.
+
+Loads the same file with the default dtypes and with compact=True and reports
+memory_usage(deep=True) of both DataFrames, per column and in total.
+
+    PYTHONPATH=. python benchmarks/bench_compact.py --rows 200000
+"""
+import argparse
+import os
+import tempfile
+
+from generators import write_medline_csv
+
+from nbdt import cache
+from nbdt.datasets import load_dataset
+from nbdt.registry import Dataset, parse_medline_dates, register_dataset
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--rows", type=int, default=200000)
+    args = arg_parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cache.configure_cache(cache_dir=os.path.join(tmp_dir, "cache"))
+        path = os.path.join(tmp_dir, "MEDLINE_COMPLETE.csv")
+        write_medline_csv(path, args.rows)
+        print(f"CSV size: {os.path.getsize(path) / 1024**2:.1f} MB")
+        register_dataset(
+            Dataset("bench_medline", f"file://{path}", date_column="P_Date", date_parser=parse_medline_dates)
+        )
+
+        default = load_dataset("bench_medline")
+        compact = load_dataset("bench_medline", compact=True)
+
+    before = default.memory_usage(deep=True, index=False)
+    after = compact.memory_usage(deep=True, index=False)
+    print(f"{'column':10s} {'default':>12s} {'compact':>12s}  compact dtype")
+    for column in compact.columns:
+        default_mb = before.get(column, 0) / 1024**2
+        print(f"{column:10s} {default_mb:9.1f} MB {after[column] / 1024**2:9.1f} MB  {compact[column].dtype.name}")
+    print(f"{'total':10s} {before.sum() / 1024**2:9.1f} MB {after.sum() / 1024**2:9.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
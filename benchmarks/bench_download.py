@@ -0,0 +1,80 @@
+"""
+Benchmark of nbdt.download against a local range-capable HTTP server.
+
+The server limits the bandwidth of every connection, like a CDN does per stream, and
+can drop a connection once in the middle of a response. The benchmark compares a
+single request (server without range support) against parallel range requests, then
+checks that a download interrupted by a dropped connection resumes from its .part
+file, and that a gzip-encoded response is stored decoded.
+
+    PYTHONPATH=. python benchmarks/bench_download.py --size-mb 64 --bandwidth-mb 16
+"""
+import argparse
+import hashlib
+import os
+import tempfile
+import time
+
+from servers import RequestCounter, serve, static_handler
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--size-mb", type=int, default=64)
+    arg_parser.add_argument("--bandwidth-mb", type=float, default=16, help="per connection, in MB/s")
+    arg_parser.add_argument("--workers", type=int, default=4)
+    args = arg_parser.parse_args()
+
+    from nbdt import download
+
+    data = (b"PMID,Title,Abstract\n" + b"1,neural cortex,synaptic plasticity memory dopamine\n" * (args.size_mb * 20000))[
+        : args.size_mb * 1024**2
+    ]
+    digest = hashlib.sha256(data).hexdigest()
+    bandwidth = args.bandwidth_mb * 1024**2
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        served = os.path.join(tmp_dir, "served")
+        os.mkdir(served)
+        with open(os.path.join(served, "file.csv"), "wb") as f:
+            f.write(data)
+        path = os.path.join(tmp_dir, "file.csv")
+        for name, ranges, workers in [("single", False, 1), ("ranges", True, args.workers)]:
+            counter = RequestCounter()
+            server, url = serve(static_handler(served, counter, bandwidth=bandwidth, ranges=ranges))
+            start = time.perf_counter()
+            download.download(f"{url}/file.csv", path, sha256=digest, max_workers=workers)
+            elapsed = time.perf_counter() - start
+            server.shutdown()
+            print(f"{name:8s} workers={workers} requests={counter.snapshot()['requests']:3d} time={elapsed:6.2f} s")
+
+        # One worker and no retries, so that the fifth chunk (after the HEAD request) fails after four were completed
+        chunk_size = -(-len(data) // 8)
+        counter = RequestCounter()
+        server, url = serve(static_handler(served, counter, bandwidth=bandwidth * 8, fail_request=6))
+        url = f"{url}/file.csv"
+        download.CHUNK_RETRIES = 1
+        try:
+            download.download(url, path, sha256=digest, max_workers=1, chunk_size=chunk_size)
+            print("resume   the dropped connection was not noticed")
+        except Exception as e:
+            print(f"resume   first attempt failed as expected ({type(e).__name__})")
+        first = counter.snapshot()["requests"]
+        info = download.download(url, path, sha256=digest, max_workers=1, chunk_size=chunk_size)
+        server.shutdown()
+        print(
+            f"resume   requests first={first} second={counter.snapshot()['requests'] - first} "
+            f"(of 8 chunks, HEAD requests included) digest ok={info['sha256'] == digest}"
+        )
+
+        counter = RequestCounter()
+        server, url = serve(
+            static_handler(served, counter, bandwidth=bandwidth * 8, ranges=False, gzip_encoding=True)
+        )
+        info = download.download(f"{url}/file.csv", path, sha256=digest)
+        server.shutdown()
+        print(f"gzip     stored {info['size']} bytes, digest ok={info['sha256'] == digest}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Peak-memory benchmark of load_dataset on a MEDLINE-shaped CSV served locally.
+
+Compares the old full-buffer decode (read().decode() + StringIO) against the
+streaming parse and the chunked iterator. Each variant runs in its own process
+so that ru_maxrss reflects that variant only.
+
+    python benchmarks/bench_streaming.py --rows 200000
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+from generators import write_medline_csv
+from servers import RequestCounter, serve, static_handler
+
+VARIANTS = ["full_buffer", "streaming", "chunked"]
+
+
+def run_variant(variant, url):
+    import io
+    import resource
+    import urllib.request
+
+    import pandas as pd
+
+    if variant == "full_buffer":
+        with urllib.request.urlopen(url) as response:
+            content = response.read().decode("utf-8")
+        df = pd.read_csv(io.StringIO(content))
+        rows = len(df)
+    elif variant == "streaming":
+        with urllib.request.urlopen(url) as response:
+            df = pd.read_csv(io.BufferedReader(response, 1024 * 1024))
+        rows = len(df)
+    else:
+        rows = 0
+        with urllib.request.urlopen(url) as response:
+            with pd.read_csv(io.BufferedReader(response, 1024 * 1024), chunksize=10000) as reader:
+                for chunk in reader:
+                    rows += len(chunk)
+
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(f"{variant:12s} rows={rows:8d} peak_rss={peak_kb / 1024:8.1f} MB")
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--rows", type=int, default=200000)
+    arg_parser.add_argument("--variant", choices=VARIANTS)
+    arg_parser.add_argument("--url")
+    args = arg_parser.parse_args()
+
+    if args.variant:
+        run_variant(args.variant, args.url)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "MEDLINE_COMPLETE.csv")
+        write_medline_csv(path, args.rows)
+        print(f"CSV size: {os.path.getsize(path) / 1024**2:.1f} MB")
+
+        server, url = serve(static_handler(tmp_dir, RequestCounter(), ranges=False))
+        url = f"{url}/MEDLINE_COMPLETE.csv"
+
+        try:
+            for variant in VARIANTS:
+                subprocess.run(
+                    [sys.executable, __file__, "--variant", variant, "--url", url], check=True
+                )
+        finally:
+            server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
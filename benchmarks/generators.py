@@ -0,0 +1,139 @@
+"""
+Synthetic datasets with the columns of the published nbdt datasets.
+
+Every generator is seeded and vectorized, so the same arguments always produce the same
+file and 1M rows take seconds. The abstracts are shorter than real ones by default
+(abstract_words) to keep the 1M-row files to a few hundred MB.
+"""
+import os
+import urllib.parse
+
+import numpy as np
+import pandas as pd
+
+WORDS = np.array(
+    "neural cortex synaptic plasticity memory dopamine receptor signal model brain neuron "
+    "hippocampus circuit learning spike network activity cognitive behavior imaging".split()
+)
+MONTHS = np.array("Jan Feb Mar Apr May Jun Jul Aug Sep Oct Nov Dec".split())
+FIRST_YEAR, LAST_YEAR = 2018, 2023
+
+# Default number of rows of the benchmark runs
+SIZES = [10_000, 100_000, 1_000_000]
+
+
+def _text(rng, rows, words):
+    # About `words` random words per row, drawn as 10-word phrases from a pool so that 1M rows stay fast.
+    # A few rows repeat an earlier text, like real duplicates.
+    pool = [" ".join(phrase) for phrase in WORDS[rng.integers(0, len(WORDS), size=(10000, 10))].tolist()]
+    phrases = np.array(pool, dtype=object)[rng.integers(0, len(pool), size=(rows, max(1, words // 10)))]
+    text = pd.Series([" ".join(row) for row in phrases.tolist()])
+    duplicates = rng.random(rows) < 0.01
+    text[duplicates] = text.iloc[rng.integers(0, rows, size=duplicates.sum())].to_numpy()
+    return text
+
+
+def _dates(rng, rows, fmt):
+    days = (pd.Timestamp(f"{LAST_YEAR}-12-31") - pd.Timestamp(f"{FIRST_YEAR}-01-01")).days
+    dates = pd.Timestamp(f"{FIRST_YEAR}-01-01") + pd.to_timedelta(rng.integers(0, days + 1, rows), unit="D")
+    return pd.Series(dates).dt.strftime(fmt)
+
+
+def _names(rng, rows, prefix, count, per_row=1):
+    names = pd.Series(prefix + rng.integers(0, count, rows).astype(str))
+    for _ in range(per_row - 1):
+        names = names + "; " + prefix + rng.integers(0, count, rows).astype(str)
+    return names
+
+
+def arxiv(rows, seed=0, abstract_words=60):
+    rng = np.random.default_rng(seed)
+    ids = pd.Series(rng.permutation(rows) + 1).map(lambda i: f"{2300 + i // 100000:04d}.{i % 100000:05d}")
+    return pd.DataFrame(
+        {
+            "id": ids,
+            "submitter": _names(rng, rows, "Author ", 20000),
+            "authors": _names(rng, rows, "Author ", 20000, per_row=4),
+            "title": _text(rng, rows, 10),
+            "categories": pd.Series(np.array(["q-bio.NC", "cs.NE", "q-bio.NC cs.LG", "physics.bio-ph"])[rng.integers(0, 4, rows)]),
+            "abstract": _text(rng, rows, abstract_words),
+            "versions": "[{'version': 'v1'}]",
+            "update_date": _dates(rng, rows, "%Y-%m-%d"),
+        }
+    )
+
+
+def bioarxiv(rows, seed=0, abstract_words=60):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame(
+        {
+            "doi": pd.Series(np.arange(rows)).map(lambda i: f"10.1101/{i:08d}"),
+            "title": _text(rng, rows, 10),
+            "abstract": _text(rng, rows, abstract_words),
+            "authors": _names(rng, rows, "Author ", 20000, per_row=4),
+            "author_corresponding": _names(rng, rows, "Author ", 20000),
+            "date": _dates(rng, rows, "%Y-%m-%d"),
+            "jatsxml": pd.Series(np.arange(rows)).map(lambda i: f"https://www.biorxiv.org/content/{i}.source.xml"),
+            "category": "neuroscience",
+        }
+    )
+
+
+def plos_one(rows, seed=0, abstract_words=60):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame(
+        {
+            "ID": pd.Series(np.arange(rows)).map(lambda i: f"10.1371/journal.pone.{i:07d}"),
+            "Title": _text(rng, rows, 10),
+            "Author": _names(rng, rows, "Author ", 20000, per_row=4),
+            "Abstract": _text(rng, rows, abstract_words),
+            "Journal": "PLOS ONE",
+            "Subject": pd.Series(np.array(["/Neuroscience/", "/Neuroscience/Cognitive science/"])[rng.integers(0, 2, rows)]),
+            "Accepted_Date": _dates(rng, rows, "%Y-%m-%dT%H:%M:%SZ"),
+            "Publication Date": _dates(rng, rows, "%Y-%m-%dT%H:%M:%SZ"),
+        }
+    )
+
+
+def medline(rows, seed=0, abstract_words=60):
+    rng = np.random.default_rng(seed)
+    years = rng.integers(FIRST_YEAR, LAST_YEAR + 1, rows).astype(str)
+    return pd.DataFrame(
+        {
+            "PMID": 30000000 + np.arange(rows),
+            "Title": _text(rng, rows, 10),
+            "Abstract": _text(rng, rows, abstract_words),
+            "Journal": _names(rng, rows, "Journal ", 200),
+            "Authors": _names(rng, rows, "Author ", 50000, per_row=5),
+            "P_Date": pd.Series(years) + " " + MONTHS[rng.integers(0, 12, rows)],
+        }
+    )
+
+
+# File names under which the mock Hugging Face server publishes each dataset, as in nbdt.registry
+# and nbdt.update.SOURCE_DATASETS
+FILES = {
+    "arxiv2.csv": arxiv,
+    "bioarxiv%20(1).csv": bioarxiv,
+    "bioarxiv_final.csv": bioarxiv,
+    "plos_one_new.csv": plos_one,
+    "plos_one_final2.csv": plos_one,
+    "MEDLINE_Journal_Recommend2.csv": medline,
+    "MEDLINE_COMPLETE.csv": medline,
+}
+
+
+def write_dataset(directory, file_name, rows, seed=0, abstract_words=60):
+    """
+    Writes the synthetic version of a published file to directory and returns its path.
+    """
+    path = os.path.join(directory, urllib.parse.unquote(file_name))
+    FILES[file_name](rows, seed, abstract_words).to_csv(path, index=False)
+    return path
+
+
+def write_medline_csv(path, rows, abstract_words=220):
+    """
+    Writes a MEDLINE_COMPLETE-shaped CSV with full-length abstracts.
+    """
+    medline(rows, abstract_words=abstract_words).to_csv(path, index=False)
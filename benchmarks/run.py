@@ -0,0 +1,345 @@
+"""
+Benchmark suite of the load, filter, fetch and merge hot paths.
+
+Synthetic datasets of every size are served by a local mock of Hugging Face, next to mocks
+of the bioRxiv, PLOS Solr and arXiv APIs with a configurable latency per request (see
+benchmarks/servers.py and benchmarks/generators.py). Each scenario runs in its own
+process with an empty cache, so that the numbers of one scenario do not depend on the
+others, and reports its wall time, the peak RSS of the measured part (of the whole
+process on systems without /proc) and the requests it sent to the mock servers.
+
+    PYTHONPATH=. python benchmarks/run.py --sizes 10000,100000 --output before.json
+    PYTHONPATH=. python benchmarks/run.py --sizes 10000,100000 --output after.json
+    python benchmarks/run.py --compare before.json after.json
+
+The collection scenarios serve a tenth of the size as new papers, the merge scenario
+merges a hundredth of it into the published dataset.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import generators  # noqa: E402
+import servers  # noqa: E402
+
+# Dataset read by the load and filter scenarios, and its file on the mock Hugging Face server
+LOAD_DATASET = "medline_large"
+LOAD_FILE = "MEDLINE_COMPLETE.csv"
+# Years kept by the filtering scenarios
+FILTER_YEARS = (2020, 2021)
+
+
+def load_cold():
+    from nbdt import load_dataset
+
+    return lambda context: load_dataset(LOAD_DATASET)
+
+
+def load_warm():
+    # The cached file is revalidated with a conditional request
+    from nbdt import load_dataset
+
+    return lambda context: load_dataset(LOAD_DATASET)
+
+
+def load_parquet():
+    from nbdt import load_dataset
+
+    return lambda context: load_dataset(LOAD_DATASET, *FILTER_YEARS, format="parquet")
+
+
+def load_mmap():
+    from nbdt import load_dataset
+
+    return lambda context: load_dataset(LOAD_DATASET, *FILTER_YEARS, mmap=True)
+
+
+def filter_years():
+    from nbdt import load_dataset
+    from nbdt.datasets import filter_dataset
+
+    dataframe = load_dataset(LOAD_DATASET, offline=True)
+    return lambda context: filter_dataset(LOAD_DATASET, *FILTER_YEARS, dataframe)
+
+
+def drop_duplicates():
+    from nbdt import dedup
+
+    dataframe = generators.bioarxiv(int(os.environ["NBDT_BENCH_SIZE"]))
+    return lambda context: dedup.drop_duplicates(dataframe, "abstract", "doi")
+
+
+def merge_source():
+    from nbdt import update
+
+    size = int(os.environ["NBDT_BENCH_SIZE"])
+    collected = generators.bioarxiv(max(1, size // 100), seed=1)
+    collected = collected.drop(columns="category").rename(columns=update.SOURCE_RENAMES["bioarxiv"])
+    return lambda context: update._merge_source("bioarxiv", collected, os.path.join(context, "merged.csv"))
+
+
+def vectorize():
+    from nbdt import build_features
+
+    return lambda context: build_features(LOAD_DATASET, offline=True, rebuild=True)
+
+
+def collect_bioarxiv():
+    from nbdt import update
+
+    return lambda context: update.bioarxiv(
+        "2023-12-31", os.path.join(context, "bioarxiv.csv"), False, "2023-01-01", rate_limit=None
+    )
+
+
+def collect_plos():
+    from nbdt import update
+
+    return lambda context: update.plos_one(
+        "2023-12-31", os.path.join(context, "plos_one.csv"), False, "2023-01-01", rate_limit=None
+    )
+
+
+def collect_arxiv():
+    from nbdt import update
+
+    update.ARXIV_DELAY_SECONDS = 0
+    return lambda context: update.arxiv("2023-09-30", os.path.join(context, "arxiv.csv"), False, "2023-01-01")
+
+
+def _prepare_load():
+    from nbdt import load_dataset
+
+    load_dataset(LOAD_DATASET)
+
+
+def _prepare_parquet():
+    from nbdt import load_dataset
+
+    load_dataset(LOAD_DATASET, format="parquet")
+
+
+def _prepare_mmap():
+    from nbdt import load_dataset
+
+    load_dataset(LOAD_DATASET, mmap=True)
+
+
+# Scenario name -> (setup returning the measured function, or None; preparation run in a separate process, or None)
+SCENARIOS = {
+    "load": (load_cold, None),
+    "load_warm": (load_warm, _prepare_load),
+    "load_parquet": (load_parquet, _prepare_parquet),
+    "load_mmap": (load_mmap, _prepare_mmap),
+    "filter": (filter_years, _prepare_load),
+    "dedup": (drop_duplicates, None),
+    "merge": (merge_source, None),
+    "features": (vectorize, _prepare_load),
+    "collect_bioarxiv": (collect_bioarxiv, None),
+    "collect_plos": (collect_plos, None),
+    "collect_arxiv": (collect_arxiv, None),
+}
+
+
+def _reset_peak_rss():
+    # Writing 5 to clear_refs resets VmHWM on Linux
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def _peak_rss_mb(reset):
+    if reset:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak / 1024**2 if sys.platform == "darwin" else peak / 1024
+
+
+def run_child(scenario, prepare):
+    """
+    Runs one scenario in this process and prints its measurements as JSON.
+    """
+    setup, preparation = SCENARIOS[scenario]
+    if prepare:
+        preparation()
+        return
+    context = tempfile.mkdtemp()
+    try:
+        measured = setup()
+        reset = _reset_peak_rss()
+        start = time.perf_counter()
+        measured(context)
+        seconds = time.perf_counter() - start
+        print(json.dumps({"seconds": seconds, "peak_rss_mb": _peak_rss_mb(reset)}))
+    finally:
+        shutil.rmtree(context, ignore_errors=True)
+
+
+def _start_servers(size, data_dir, latency, counters):
+    collected = max(1, size // 10)
+    handlers = {
+        "hf": servers.static_handler(data_dir, counters["hf"], latency),
+        "biorxiv": servers.biorxiv_handler(collected, counters["biorxiv"], latency),
+        "plos": servers.plos_handler(collected, counters["plos"], latency),
+        # One paper per hour, so that all of them fall in the collected window
+        "arxiv": servers.arxiv_handler(collected, counters["arxiv"], 1.0, latency),
+    }
+    return {name: servers.serve(handler) for name, handler in handlers.items()}
+
+
+def _run_scenario(scenario, size, urls, counters):
+    cache_dir = tempfile.mkdtemp()
+    env = dict(
+        os.environ,
+        NBDT_CACHE_DIR=cache_dir,
+        NBDT_HF_BASE_URL=urls["hf"],
+        NBDT_BIORXIV_API_URL=urls["biorxiv"],
+        NBDT_PLOS_API_URL=urls["plos"],
+        NBDT_BENCH_ARXIV_URL=urls["arxiv"] + "/api/query?{}",
+        NBDT_BENCH_SIZE=str(size),
+    )
+    command = [sys.executable, os.path.abspath(__file__), "--child", scenario]
+    try:
+        if SCENARIOS[scenario][1] is not None:
+            subprocess.run(command + ["--prepare"], env=env, check=True, stdout=subprocess.DEVNULL)
+        before = {name: counter.snapshot() for name, counter in counters.items()}
+        output = subprocess.run(command, env=env, check=True, stdout=subprocess.PIPE, text=True).stdout
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+    result = json.loads(output.strip().splitlines()[-1])
+    result["requests"] = {}
+    for name, counter in counters.items():
+        after = counter.snapshot()
+        if after["requests"] > before[name]["requests"]:
+            result["requests"][name] = after["requests"] - before[name]["requests"]
+    return result
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _meta(args):
+    import numpy
+    import pandas
+
+    return {
+        "commit": _git_commit(),
+        "date": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "pandas": pandas.__version__,
+        "numpy": numpy.__version__,
+        "platform": platform.platform(),
+        "latency": args.latency,
+        "repeat": args.repeat,
+    }
+
+
+def run(args):
+    sizes = [int(size) for size in args.sizes.split(",")]
+    scenarios = args.scenarios.split(",") if args.scenarios else list(SCENARIOS)
+    results = []
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as data_dir:
+            for file_name in generators.FILES:
+                generators.write_dataset(data_dir, file_name, size, abstract_words=args.abstract_words)
+            print(f"{size} rows: {os.path.getsize(os.path.join(data_dir, LOAD_FILE)) / 1024**2:.1f} MB of {LOAD_FILE}")
+
+            counters = {name: servers.RequestCounter() for name in ("hf", "biorxiv", "plos", "arxiv")}
+            running = _start_servers(size, data_dir, args.latency, counters)
+            urls = {name: url for name, (server, url) in running.items()}
+            try:
+                for scenario in scenarios:
+                    # The fastest of the repetitions is kept
+                    runs = [_run_scenario(scenario, size, urls, counters) for _ in range(args.repeat)]
+                    result = min(runs, key=lambda r: r["seconds"])
+                    result["peak_rss_mb"] = max(r["peak_rss_mb"] for r in runs)
+                    results.append({"scenario": scenario, "size": size, **result})
+                    requests = " ".join(f"{name}={count}" for name, count in result["requests"].items())
+                    print(
+                        f"  {scenario:17s} {result['seconds']:8.3f} s {result['peak_rss_mb']:8.1f} MB  {requests}"
+                    )
+            finally:
+                for server, url in running.values():
+                    server.shutdown()
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"meta": _meta(args), "results": results}, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+def compare(before_path, after_path):
+    """
+    Prints the change of every measurement between two result files.
+    """
+    with open(before_path) as f:
+        before = json.load(f)
+    with open(after_path) as f:
+        after = json.load(f)
+    previous = {(r["scenario"], r["size"]): r for r in before["results"]}
+    print(f"{before['meta']['commit']} -> {after['meta']['commit']}")
+    print(f"{'scenario':17s} {'size':>9s} {'seconds':>21s} {'peak RSS MB':>21s} {'requests':>13s}")
+    for result in after["results"]:
+        old = previous.get((result["scenario"], result["size"]))
+        if old is None:
+            continue
+        old_requests, new_requests = sum(old["requests"].values()), sum(result["requests"].values())
+        print(
+            f"{result['scenario']:17s} {result['size']:9d} "
+            f"{old['seconds']:7.3f} {result['seconds']:7.3f} {result['seconds'] / old['seconds']:5.2f}x "
+            f"{old['peak_rss_mb']:7.1f} {result['peak_rss_mb']:7.1f} {result['peak_rss_mb'] / old['peak_rss_mb']:5.2f}x "
+            f"{old_requests:6d} {new_requests:6d}"
+        )
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--sizes", default="10000,100000", help="comma-separated row counts, e.g. 10000,100000,1000000")
+    arg_parser.add_argument("--scenarios", help=f"comma-separated subset of {', '.join(SCENARIOS)}")
+    arg_parser.add_argument("--latency", type=float, default=0.02, help="seconds added to every mock request")
+    arg_parser.add_argument("--repeat", type=int, default=1)
+    arg_parser.add_argument("--abstract-words", type=int, default=60)
+    arg_parser.add_argument("--output", help="JSON file for the results")
+    arg_parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"))
+    arg_parser.add_argument("--child", choices=list(SCENARIOS), help=argparse.SUPPRESS)
+    arg_parser.add_argument("--prepare", action="store_true", help=argparse.SUPPRESS)
+    args = arg_parser.parse_args()
+
+    if args.child:
+        if os.environ.get("NBDT_BENCH_ARXIV_URL"):
+            import arxiv
+
+            arxiv.Client.query_url_format = os.environ["NBDT_BENCH_ARXIV_URL"]
+        run_child(args.child, args.prepare)
+    elif args.compare:
+        compare(*args.compare)
+    else:
+        run(args)
+
+
+if __name__ == "__main__":
+    main()
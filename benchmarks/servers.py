@@ -0,0 +1,264 @@
+"""
+Local mock servers standing in for Hugging Face, the bioRxiv details API, PLOS Solr and the arXiv API.
+
+Every handler factory takes a RequestCounter and a latency in seconds added to each
+request. Start a handler with serve(), which returns the server and its base URL.
+"""
+import datetime
+import email.utils
+import gzip
+import http.server
+import json
+import os
+import re
+import threading
+import time
+import urllib.parse
+
+LATEST = datetime.datetime(2023, 9, 30, tzinfo=datetime.timezone.utc)
+
+
+class RequestCounter:
+    """
+    Counts the requests and records served by a mock server.
+    """
+
+    def __init__(self):
+        self.requests = 0
+        self.records = 0
+        self.lock = threading.Lock()
+
+    def add(self, records=0):
+        with self.lock:
+            self.requests += 1
+            self.records += records
+            return self.requests
+
+    def snapshot(self):
+        with self.lock:
+            return {"requests": self.requests, "records": self.records}
+
+
+class QuietHandler(http.server.BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def send_body(self, body, status=200, headers=()):
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def serve(handler):
+    """
+    Starts a threaded server with handler on a free local port.
+
+    Returns:
+        tuple: The server (call shutdown() when done) and its base URL.
+    """
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def static_handler(directory, counter, latency=0.0, bandwidth=None, ranges=True, gzip_encoding=False, fail_request=None):
+    """
+    Serves the files of directory like the Hugging Face CDN: ETag/Last-Modified revalidation and byte ranges.
+
+    Args:
+        bandwidth (float, optional): Bytes per second per connection. Defaults to unlimited.
+        ranges (bool, optional): Whether byte ranges are supported. Defaults to True.
+        gzip_encoding (bool, optional): Whether full responses are gzip-encoded for clients accepting it.
+        fail_request (int, optional): The request (counting from 1, HEAD requests included) whose response is cut halfway.
+    """
+
+    class StaticHandler(QuietHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _file(self):
+            path = os.path.join(directory, urllib.parse.unquote(urllib.parse.urlparse(self.path).path.lstrip("/")))
+            if not os.path.isfile(path):
+                self.send_body(b"", status=404)
+                return None, None
+            stat = os.stat(path)
+            return path, [
+                ("ETag", f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'),
+                ("Last-Modified", email.utils.formatdate(stat.st_mtime, usegmt=True)),
+            ] + ([("Accept-Ranges", "bytes")] if ranges else [])
+
+        def do_HEAD(self):
+            time.sleep(latency)
+            counter.add()
+            path, headers = self._file()
+            if path is None:
+                return
+            status = 304 if self.headers.get("If-None-Match") == dict(headers)["ETag"] else 200
+            self.send_response(status)
+            self.send_header("Content-Length", str(os.path.getsize(path)))
+            for name, value in headers:
+                self.send_header(name, value)
+            self.end_headers()
+
+        def do_GET(self):
+            time.sleep(latency)
+            number = counter.add()
+            path, headers = self._file()
+            if path is None:
+                return
+            if self.headers.get("If-None-Match") == dict(headers)["ETag"]:
+                self.send_body(b"", status=304, headers=headers)
+                return
+            with open(path, "rb") as f:
+                data = f.read()
+            status = 200
+            match = re.match(r"bytes=(\d+)-(\d+)", self.headers.get("Range", ""))
+            if ranges and match:
+                start, end = int(match.group(1)), min(int(match.group(2)), len(data) - 1)
+                data = data[start : end + 1]
+                status = 206
+                headers = headers + [("Content-Range", f"bytes {start}-{end}/{os.path.getsize(path)}")]
+            elif gzip_encoding and "gzip" in self.headers.get("Accept-Encoding", ""):
+                data = gzip.compress(data)
+                headers = headers + [("Content-Encoding", "gzip")]
+
+            self.send_response(status)
+            self.send_header("Content-Length", str(len(data)))
+            for name, value in headers:
+                self.send_header(name, value)
+            self.end_headers()
+            sent = 0
+            block = 256 * 1024
+            started = time.perf_counter()
+            while sent < len(data):
+                if number == fail_request and sent >= len(data) // 2:
+                    self.close_connection = True
+                    return
+                self.wfile.write(data[sent : sent + block])
+                sent += block
+                if bandwidth:
+                    delay = sent / bandwidth - (time.perf_counter() - started)
+                    if delay > 0:
+                        time.sleep(delay)
+
+    return StaticHandler
+
+
+def biorxiv_handler(records, counter, latency=0.0):
+    """
+    Serves `records` neuroscience papers from /details/biorxiv/<from>/<to>/<cursor>/json, 100 per page.
+    """
+
+    class BiorxivHandler(QuietHandler):
+        def do_GET(self):
+            match = re.match(r"/details/biorxiv/[^/]+/[^/]+/(\d+)/json", self.path)
+            cursor = int(match.group(1))
+            time.sleep(latency)
+            collection = [
+                {
+                    "doi": f"10.1101/{i:08d}",
+                    "title": f"Title {i}",
+                    "abstract": f"Abstract of paper {i}",
+                    "authors": "Doe, J.; Roe, R.",
+                    "author_corresponding": "Doe, J.",
+                    "date": "2023-03-01",
+                    "category": "neuroscience",
+                    "jatsxml": f"https://www.biorxiv.org/{i}.source.xml",
+                }
+                for i in range(cursor, min(cursor + 100, records))
+            ]
+            counter.add(len(collection))
+            body = json.dumps({"messages": [{"status": "ok", "total": records}], "collection": collection})
+            self.send_body(body.encode(), headers=[("Content-Type", "application/json")])
+
+    return BiorxivHandler
+
+
+def plos_handler(docs, counter, latency=0.0):
+    """
+    Serves `docs` articles from /search like PLOS Solr, with start/rows and cursorMark paging.
+    """
+
+    def doc(i):
+        return {
+            "id": f"10.1371/journal.pone.{i:07d}",
+            "title": f"Title {i}",
+            "author": ["Doe, J."],
+            "abstract": [f"Abstract of article {i}"],
+            "journal": "PLOS ONE",
+            "subject_facet": ["/Neuroscience/"],
+            "accepted_date": "2023-07-01T00:00:00Z",
+        }
+
+    class PlosHandler(QuietHandler):
+        def do_GET(self):
+            query = urllib.parse.parse_qs(urllib.parse.urlparse(self.path).query)
+            rows = int(query.get("rows", ["10"])[0])
+            time.sleep(latency)
+            body = {"response": {"numFound": docs}}
+            if "cursorMark" in query:
+                mark = query["cursorMark"][0]
+                start = 0 if mark == "*" else int(mark)
+                page = [doc(i) for i in range(start, min(start + rows, docs))]
+                body["nextCursorMark"] = str(start + len(page)) if page else mark
+            else:
+                start = int(query.get("start", ["0"])[0])
+                page = [doc(i) for i in range(start, min(start + rows, docs))]
+            body["response"]["docs"] = page
+            counter.add(len(page))
+            self.send_body(json.dumps(body).encode(), headers=[("Content-Type", "application/json")])
+
+    return PlosHandler
+
+
+def arxiv_handler(papers, counter, hours_apart=6.0, latency=0.0):
+    """
+    Serves `papers` "brain" papers from /api/query as an Atom feed, one every hours_apart hours
+    going back from 2023-09-30, honouring lastUpdatedDate ranges in search_query like the real API.
+    """
+    dates = [LATEST - datetime.timedelta(hours=hours_apart * i) for i in range(papers)]
+
+    def entry(i):
+        updated = dates[i].strftime("%Y-%m-%dT%H:%M:%SZ")
+        return (
+            f"<entry><id>http://arxiv.org/abs/2309.{i:05d}v1</id>"
+            f"<updated>{updated}</updated><published>{updated}</published>"
+            f"<title>Brain paper {i}</title><summary>Abstract of paper {i}</summary>"
+            f"<author><name>Author {i}</name></author>"
+            '<arxiv:primary_category xmlns:arxiv="http://arxiv.org/schemas/atom" term="q-bio.NC"/>'
+            '<category term="q-bio.NC"/>'
+            f'<link href="http://arxiv.org/abs/2309.{i:05d}v1" rel="alternate" type="text/html"/>'
+            "</entry>"
+        )
+
+    class ArxivHandler(QuietHandler):
+        def do_GET(self):
+            query = urllib.parse.parse_qs(urllib.parse.urlparse(self.path).query)
+            start = int(query["start"][0])
+            max_results = int(query["max_results"][0])
+            matching = range(papers)
+            window = re.search(r"lastUpdatedDate:\[(\d{12}) TO (\d{12})\]", query["search_query"][0])
+            if window:
+                low, high = (
+                    datetime.datetime.strptime(value, "%Y%m%d%H%M").replace(tzinfo=datetime.timezone.utc)
+                    for value in window.groups()
+                )
+                matching = [i for i in matching if low <= dates[i] <= high + datetime.timedelta(minutes=1)]
+            page = matching[start : start + max_results]
+
+            time.sleep(latency)
+            counter.add(len(page))
+            body = (
+                '<?xml version="1.0" encoding="UTF-8"?>'
+                '<feed xmlns="http://www.w3.org/2005/Atom" xmlns:opensearch="http://a9.com/-/spec/opensearch/1.1/">'
+                f"<opensearch:totalResults>{len(matching)}</opensearch:totalResults>"
+                f"<opensearch:startIndex>{start}</opensearch:startIndex>"
+                f"<opensearch:itemsPerPage>{max_results}</opensearch:itemsPerPage>"
+                + "".join(entry(i) for i in page)
+                + "</feed>"
+            )
+            self.send_body(body.encode())
+
+    return ArxivHandler
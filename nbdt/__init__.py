@@ -1,2 +1,34 @@
-from .datasets import load_dataset
-from .update import update_dataset
+import importlib
+
+# Public names and the submodules defining them. The submodules, and pandas, are only
+# imported when one of the names is first used, so that importing nbdt stays cheap.
+_EXPORTS = {
+    "load_dataset": "datasets",
+    "iter_dataset": "datasets",
+    "update_all": "update",
+    "update_dataset": "update",
+    "cache_info": "cache",
+    "clear_cache": "cache",
+    "Dataset": "registry",
+    "get_dataset": "registry",
+    "list_datasets": "registry",
+    "register_dataset": "registry",
+    "build_index": "search",
+    "build_features": "features",
+    "add_sink": "events",
+    "remove_sink": "events",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{_EXPORTS[name]}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
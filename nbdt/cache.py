@@ -0,0 +1,318 @@
+import contextlib
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+import requests
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+from . import download, events
+from .fetch import REQUEST_TIMEOUT, make_session
+
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "nbdt")
+DEFAULT_MAX_SIZE = 10 * 1024**3
+
+_options = {
+    "cache_dir": os.environ.get("NBDT_CACHE_DIR", DEFAULT_CACHE_DIR),
+    "max_size": int(os.environ.get("NBDT_CACHE_MAX_SIZE", DEFAULT_MAX_SIZE)),
+    "offline": os.environ.get("NBDT_OFFLINE", "").lower() in ("1", "true", "yes"),
+}
+# Serializes the updates of the index by threads downloading different files, e.g. the
+# partitions read by nbdt.partitions.read_partitions or the sources of update_all
+_index_lock = threading.Lock()
+
+# Cache subdirectories holding copies derived from a cached file, named after its digest:
+# columnar files (nbdt.storage), year partitions, dedup indexes, search indexes and feature stores
+DERIVED_DIRS = ("columnar", "partitions", "dedup", "indexes", "features")
+
+
+def configure_cache(cache_dir=None, max_size=None, offline=None):
+    """
+    Changes the settings of the local dataset cache.
+
+    Args:
+        cache_dir (str, optional): Directory holding the cached files. Defaults to $NBDT_CACHE_DIR or ~/.cache/nbdt.
+        max_size (int, optional): Maximum total size of the cache in bytes. Least recently used files are evicted above it.
+        offline (bool, optional): If True, never touch the network and only serve files already in the cache.
+    """
+    if cache_dir is not None:
+        _options["cache_dir"] = cache_dir
+    if max_size is not None:
+        _options["max_size"] = int(max_size)
+    if offline is not None:
+        _options["offline"] = bool(offline)
+
+
+def get_cache_dir():
+    """
+    Returns the cache directory, creating it if needed.
+
+    Returns:
+        str: The path of the cache directory.
+    """
+    cache_dir = _options["cache_dir"]
+    os.makedirs(os.path.join(cache_dir, "blobs"), exist_ok=True)
+    return cache_dir
+
+
+def _index_path():
+    return os.path.join(get_cache_dir(), "index.json")
+
+
+def _blob_path(digest):
+    return os.path.join(get_cache_dir(), "blobs", digest)
+
+
+def _read_index():
+    try:
+        with open(_index_path()) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+@contextlib.contextmanager
+def _file_lock(path):
+    # Where fcntl exists, excludes other processes and the other threads opening path
+    with open(path, "a") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        yield
+
+
+@contextlib.contextmanager
+def _locked_index():
+    # Holds the index for a read-modify-write, against other threads and, where fcntl exists, other processes
+    with _index_lock, _file_lock(os.path.join(get_cache_dir(), "index.lock")):
+        yield
+
+
+def _write_index(index):
+    fd, tmp_path = tempfile.mkstemp(dir=get_cache_dir(), suffix=".tmp")
+    with os.fdopen(fd, "w") as f:
+        json.dump(index, f, indent=1)
+    os.replace(tmp_path, _index_path())
+
+
+def _store(response):
+    # Streams the body to a temp file and moves it under its sha256 digest.
+    sha = hashlib.sha256()
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.join(get_cache_dir(), "blobs"), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            while True:
+                block = response.read(1024 * 1024)
+                if not block:
+                    break
+                sha.update(block)
+                f.write(block)
+        digest = sha.hexdigest()
+        os.replace(tmp_path, _blob_path(digest))
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return digest
+
+
+def _derived_paths(digest):
+    # The copies derived from the blob with this digest
+    paths = []
+    for subdir in DERIVED_DIRS:
+        directory = os.path.join(get_cache_dir(), subdir)
+        if os.path.isdir(directory):
+            paths.extend(os.path.join(directory, name) for name in os.listdir(directory) if name.startswith(digest))
+    return paths
+
+
+def _path_size(path):
+    if not os.path.isdir(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+
+def _sizes(index):
+    # The size of each blob plus the copies derived from it, by digest
+    sizes = {}
+    for entry in index.values():
+        digest = entry["sha256"]
+        if digest not in sizes:
+            sizes[digest] = entry["size"] + sum(_path_size(path) for path in _derived_paths(digest))
+    return sizes
+
+
+def _remove_blob(digest):
+    for path in _derived_paths(digest):
+        if os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+        else:
+            os.remove(path)
+    if os.path.exists(_blob_path(digest)):
+        os.remove(_blob_path(digest))
+
+
+def _evict(index, keep_url):
+    sizes = _sizes(index)
+    total = sum(sizes.values())
+
+    for url in sorted(index, key=lambda u: index[u]["last_access"]):
+        if total <= _options["max_size"]:
+            break
+        if url == keep_url:
+            continue
+        digest = index.pop(url)["sha256"]
+        if all(entry["sha256"] != digest for entry in index.values()):
+            _remove_blob(digest)
+            total -= sizes[digest]
+
+
+def _conditional_headers(entry):
+    headers = {}
+    if entry is not None:
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+    return headers
+
+
+def _fetch_http(url, entry, sha256=None):
+    # Revalidates the cached copy with a conditional HEAD request and downloads the file only if it changed
+    session = make_session(pool_size=download.MAX_WORKERS)
+    if entry is not None:
+        head = session.head(url, headers=_conditional_headers(entry), allow_redirects=True, timeout=REQUEST_TIMEOUT)
+        if head.status_code == 304:
+            return entry
+        head.raise_for_status()
+
+    # The partial download is named after the URL, so that an interrupted download resumes
+    part_path = os.path.join(get_cache_dir(), "blobs", "download-" + hashlib.sha256(url.encode()).hexdigest())
+    # Only one process or thread downloads a URL at a time; the others wait and reuse its copy
+    with _file_lock(part_path + ".lock"):
+        current = _read_index().get(url)
+        if current is not None and (entry is None or current["sha256"] != entry["sha256"]) and os.path.exists(_blob_path(current["sha256"])):
+            return current
+        info = download.download(url, part_path, sha256=sha256, session=session)
+        os.replace(part_path, _blob_path(info["sha256"]))
+    return info
+
+
+def _fetch_urllib(url, entry):
+    # Used for URLs other than http(s), e.g. file:// URLs
+    request = urllib.request.Request(url, headers=_conditional_headers(entry))
+    try:
+        with urllib.request.urlopen(request) as response:
+            digest = _store(response)
+            return {
+                "sha256": digest,
+                "size": os.path.getsize(_blob_path(digest)),
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+            }
+    except urllib.error.HTTPError as e:
+        if e.code != 304 or entry is None:
+            raise
+        return entry
+
+
+def cached_download(url, offline=None, sha256=None):
+    """
+    Returns a local path holding the content of url, downloading it only when needed.
+
+    A cached copy is revalidated with a conditional request (ETag / If-Modified-Since)
+    and reused when the server reports it unchanged. http(s) files are downloaded with
+    nbdt.download.download: in parallel byte ranges when the server supports them, resuming
+    an interrupted download, and checked against their size and sha256.
+
+    Args:
+        url (str): The URL of the file.
+        offline (bool, optional): Overrides the cache-wide offline setting for this call.
+        sha256 (str, optional): The expected SHA-256 digest of the file. A file that does not match it is not returned.
+
+    Returns:
+        str: The path of the cached file.
+    """
+    if offline is None:
+        offline = _options["offline"]
+
+    index = _read_index()
+    entry = index.get(url)
+    if entry is not None and not os.path.exists(_blob_path(entry["sha256"])):
+        entry = None
+
+    if offline:
+        if entry is None:
+            raise FileNotFoundError(f'"{url}" is not in the local cache and offline mode is enabled.')
+        status = "offline"
+    else:
+        try:
+            if urllib.parse.urlparse(url).scheme in ("http", "https"):
+                fetched = _fetch_http(url, entry, sha256)
+            else:
+                fetched = _fetch_urllib(url, entry)
+            status = "revalidated" if fetched is entry else "downloaded"
+            entry = fetched
+        except urllib.error.HTTPError:
+            raise
+        except (urllib.error.URLError, requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            if entry is None:
+                raise
+            print(f"Could not reach {url} ({getattr(e, 'reason', e)}), using the cached copy.")
+            status = "stale"
+    events.emit("cache", url=url, status=status)
+
+    if sha256 is not None and entry["sha256"] != sha256.lower():
+        raise ValueError(f'The checksum of "{url}" is {entry["sha256"]}, expected {sha256}.')
+
+    entry["last_access"] = time.time()
+    with _locked_index():
+        index = _read_index()
+        index[url] = entry
+        _evict(index, url)
+        _write_index(index)
+    return _blob_path(entry["sha256"])
+
+
+def cache_info():
+    """
+    Describes the content of the local dataset cache.
+
+    Returns:
+        dict: The cache directory, its total size and limit in bytes, and one entry per cached URL.
+            The size includes the copies derived from the cached files, e.g. columnar files and indexes.
+    """
+    index = _read_index()
+    sizes = _sizes(index)
+    return {
+        "cache_dir": get_cache_dir(),
+        "size": sum(sizes.values()),
+        "max_size": _options["max_size"],
+        "offline": _options["offline"],
+        "entries": index,
+    }
+
+
+def clear_cache():
+    """
+    Removes every file from the local dataset cache.
+    """
+    cache_dir = get_cache_dir()
+    for name in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, name)
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        else:
+            os.remove(path)
+    print("Cache cleared.")
@@ -0,0 +1,249 @@
+"""
+The nbdt command: batch fetch, convert, filter and update jobs, e.g. for cron.
+
+    nbdt fetch --jobs 5                                  # warm the cache with every dataset
+    nbdt convert medline_large arxiv --format parquet    # columnar copies in the cache
+    nbdt filter medline_large --start-year 2015 --end-year 2020 --output medline.parquet
+    nbdt filter medline_large --per-year --output medline_by_year --format parquet --jobs 4
+    nbdt update bioarxiv=bioarxiv.csv plos_one --end-date 2023-08-31 --incremental
+
+The exit status is 0 when every job succeeded, 1 when one of them failed and 2 when the
+arguments are wrong.
+"""
+import argparse
+import functools
+import logging
+import os
+import shutil
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from . import events
+from .storage import EXTENSIONS
+
+# Formats written by the filter and update commands, and converted by the convert command
+OUTPUT_FORMATS = ("csv", "parquet", "feather", "arrow")
+CONVERT_FORMATS = ("parquet", "feather", "arrow")
+
+
+def _descriptor(name):
+    from .registry import get_dataset
+
+    dataset = get_dataset(name)
+    if dataset is None:
+        raise ValueError(f'Dataset "{name}" is not available.')
+    return dataset
+
+
+def _extension(fmt):
+    return EXTENSIONS.get(fmt, ".csv")
+
+
+def _output_format(path):
+    # The format written to path by nbdt.storage.write_frame, from its extension
+    return {extension: fmt for fmt, extension in EXTENSIONS.items()}.get(os.path.splitext(path)[1].lower(), "csv")
+
+
+def run_jobs(jobs, max_parallel=1):
+    """
+    Runs jobs in up to max_parallel threads and reports the ones failing.
+
+    Args:
+        jobs (dict): Callables by label, e.g. the dataset they process.
+        max_parallel (int, optional): Number of jobs run at the same time. Defaults to 1.
+
+    Returns:
+        list: The labels of the jobs that failed.
+    """
+
+    def run(label):
+        try:
+            jobs[label]()
+            return True
+        except Exception as e:
+            # The other jobs still run; the traceback is kept in an "error" event
+            print(f"[{label}] {type(e).__name__}: {e}", file=sys.stderr)
+            events.error(label, e)
+            return False
+
+    with ThreadPoolExecutor(max_workers=max(1, max_parallel)) as executor:
+        results = dict(zip(jobs, executor.map(run, jobs)))
+    return [label for label, ok in results.items() if not ok]
+
+
+def fetch(args):
+    from .cache import cached_download
+    from .registry import list_datasets
+
+    def job(name):
+        dataset = _descriptor(name)
+        path = cached_download(dataset.url, offline=args.offline, sha256=dataset.sha256)
+        print(f"[{name}] {path} ({os.path.getsize(path) / 1024**2:.1f} MB)")
+
+    names = args.datasets or list_datasets()
+    return run_jobs({name: functools.partial(job, name) for name in names}, args.jobs or 1)
+
+
+def convert(args):
+    from .datasets import normalize_dates
+    from .storage import columnar_path
+
+    def job(name):
+        dataset = _descriptor(name)
+        path = columnar_path(
+            dataset.url,
+            functools.partial(normalize_dates, name),
+            fmt=args.format,
+            offline=args.offline,
+            dtype=dataset.dtypes,
+            sha256=dataset.sha256,
+        )
+        if args.output_dir:
+            path = shutil.copyfile(path, os.path.join(args.output_dir, name + _extension(args.format)))
+        print(f"[{name}] {path}")
+
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+    return run_jobs({name: functools.partial(job, name) for name in args.datasets}, args.jobs or 1)
+
+
+def filter_years(args):
+    from .datasets import filter_dataset, load_dataset, normalize_dates
+    from .storage import write_frame
+
+    # The dataset is read and its dates parsed once; the slices are filtered and written in parallel
+    dataframe = load_dataset(args.dataset, offline=args.offline)
+    if dataframe is None:
+        return [args.dataset]
+    dataframe = normalize_dates(args.dataset, dataframe)
+
+    def job(start_year, end_year, path):
+        sliced = filter_dataset(args.dataset, start_year, end_year, dataframe)
+        if sliced is None:
+            raise ValueError(f"No papers between {start_year} and {end_year}.")
+        write_frame(sliced, path)
+        print(f"[{args.dataset}] {len(sliced)} papers written to {path}")
+
+    if not args.per_year:
+        return run_jobs({args.dataset: functools.partial(job, args.start_year, args.end_year, args.output)})
+
+    years = dataframe["Year"].dropna()
+    start_year = int(years.min()) if args.start_year is None else args.start_year
+    end_year = int(years.max()) if args.end_year is None else args.end_year
+    # Years without papers get no file
+    present = set(years.astype(int))
+    os.makedirs(args.output, exist_ok=True)
+    jobs = {
+        f"{args.dataset} {year}": functools.partial(
+            job, year, year, os.path.join(args.output, f"{args.dataset}_{year}{_extension(args.format)}")
+        )
+        for year in range(start_year, end_year + 1)
+        if year in present
+    }
+    return run_jobs(jobs, args.jobs or 1)
+
+
+def update(args):
+    from .update import update_all
+
+    destination_paths = {}
+    for target in args.datasets:
+        name, _, path = target.partition("=")
+        destination_paths[name] = path or name + _extension(args.format)
+    results = update_all(
+        args.end_date,
+        destination_paths,
+        args.start_date,
+        args.update,
+        incremental=args.incremental,
+        # Without --jobs, update_all updates every source at once
+        max_parallel=args.jobs,
+        near_duplicates=args.near_duplicates,
+    )
+    return [name for name, result in results.items() if not result["ok"]]
+
+
+def _parser():
+    parser = argparse.ArgumentParser(prog="nbdt", description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument(
+        "-j", "--jobs", type=int, help="number of datasets or years processed at the same time; 1 by default, every source for update"
+    )
+    common.add_argument("-v", "--verbose", action="store_true", help="log progress and timing events")
+    cached = argparse.ArgumentParser(add_help=False, parents=[common])
+    cached.add_argument("--offline", action="store_true", default=None, help="only use the files already in the cache")
+
+    command = commands.add_parser("fetch", parents=[cached], help="download datasets into the local cache")
+    command.add_argument("datasets", nargs="*", help="dataset names, every registered dataset by default")
+    command.set_defaults(run=fetch)
+
+    command = commands.add_parser("convert", parents=[cached], help="convert datasets to a columnar copy in the cache")
+    command.add_argument("datasets", nargs="+")
+    command.add_argument("-f", "--format", choices=CONVERT_FORMATS, default="parquet")
+    command.add_argument("-o", "--output-dir", help="also copy the converted files to this directory")
+    command.set_defaults(run=convert)
+
+    command = commands.add_parser("filter", parents=[cached], help="write the papers of a range of years")
+    command.add_argument("dataset")
+    command.add_argument("--start-year", type=int)
+    command.add_argument("--end-year", type=int)
+    command.add_argument("-o", "--output", required=True, help="the output file, or directory with --per-year")
+    command.add_argument("-f", "--format", choices=OUTPUT_FORMATS, help="the output format, given by the extension of --output by default")
+    command.add_argument("--per-year", action="store_true", help="write one file per year, in --jobs threads")
+    command.set_defaults(run=filter_years)
+
+    command = commands.add_parser("update", parents=[common], help="collect new papers, see nbdt.update.update_all")
+    command.add_argument("datasets", nargs="+", metavar="DATASET[=PATH]", help="e.g. bioarxiv=bioarxiv.csv; the path defaults to DATASET.FORMAT")
+    command.add_argument("--end-date", required=True, help="yyyy-mm-dd")
+    command.add_argument("--start-date", help="yyyy-mm-dd")
+    command.add_argument("--update", action="store_true", help="merge the new papers into the published dataset")
+    command.add_argument("--incremental", action="store_true", help="only append the papers published since the last run")
+    command.add_argument("--near-duplicates", action="store_true", help="also drop papers whose abstract nearly duplicates another")
+    command.add_argument("-f", "--format", choices=OUTPUT_FORMATS, default="csv", help="the format of the default paths")
+    command.set_defaults(run=update)
+    return parser
+
+
+def _check(parser, args):
+    if args.jobs is not None and args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+    if args.command != "filter":
+        return
+    if args.per_year:
+        args.format = args.format or "csv"
+    elif args.start_year is None or args.end_year is None:
+        parser.error("--start-year and --end-year are required without --per-year")
+    elif args.format is None:
+        args.format = _output_format(args.output)
+    elif args.format != _output_format(args.output):
+        parser.error(f"--output must end in {_extension(args.format)} with --format {args.format}")
+
+
+def main(argv=None):
+    """
+    Runs the nbdt command.
+
+    Args:
+        argv (list, optional): The arguments. Defaults to sys.argv[1:].
+
+    Returns:
+        int: The exit status: 0 if every job succeeded, 1 otherwise.
+    """
+    parser = _parser()
+    args = parser.parse_args(argv)
+    _check(parser, args)
+    if args.verbose:
+        logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+        events.add_sink(events.LoggingSink())
+
+    failed = args.run(args)
+    if failed:
+        print(f"Failed: {', '.join(failed)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,124 +1,425 @@
-import pandas as pd
-import urllib.request
-import io
-
-
-def load_dataset(dataset_name, start_year=None, end_year=None, destination_path=None):
-    """
-    Loads a dataset by name and optionally filters it based on start_year and end_year.
-    Saves the filtered dataset to a destination_path if provided.
-
-    Args:
-        dataset_name (str): The name of the dataset to load.
-        start_year (int, optional): The start year for filtering the dataset. Defaults to None.
-        end_year (int, optional): The end year for filtering the dataset. Defaults to None.
-        destination_path (str, optional): The file path to save the filtered dataset. Defaults to None.
-
-    Returns:
-        pd.DataFrame or None: The loaded dataset as a DataFrame if destination_path is not provided, otherwise None.
-    """
-    # Mapping of dataset names to dataset URLs
-    dataset_mapping = {
-        "arxiv": "https://huggingface.co/datasets/PenguinMan/ARXIV/resolve/main/arxiv2.csv",
-        "bioarxiv": "https://huggingface.co/datasets/PenguinMan/ARXIV/resolve/main/bioarxiv%20(1).csv",
-        "plos_one": "https://huggingface.co/datasets/PenguinMan/ARXIV/resolve/main/plos_one_new.csv",
-        "medline_small": "https://huggingface.co/datasets/PenguinMan/ARXIV/resolve/main/MEDLINE_Journal_Recommend2.csv",
-        "medline_large": "https://huggingface.co/datasets/PenguinMan/ARXIV/resolve/main/MEDLINE_COMPLETE.csv"
-        # Add more dataset mappings as needed
-    }
-
-    if dataset_name in dataset_mapping:
-        dataset_url = dataset_mapping[dataset_name]
-
-        with urllib.request.urlopen(dataset_url) as response:
-            dataset_content = response.read().decode("utf-8")
-
-        dataset_dataframe = pd.read_csv(io.StringIO(dataset_content))
-
-        if start_year is not None and end_year is not None:
-            dataset_dataframe = filter_dataset(
-                dataset_name, start_year, end_year, dataset_dataframe
-            )
-
-        if destination_path is not None:
-            dataset_dataframe.to_csv(destination_path, index=False)
-            print(f'Dataset downloaded successfully and saved to "{destination_path}".')
-        else:
-            print("Dataset downloaded successfully.")
-            return dataset_dataframe
-    else:
-        print(f'Dataset "{dataset_name}" is not available.')
-
-
-def filter_dataset(dataset_name, start_year, end_year, dataset_dataframe):
-    """
-    Filters the dataset based on start_year and end_year.
-
-    Args:
-        dataset_name (str): The name of the dataset being filtered.
-        start_year (int): The start year for filtering.
-        end_year (int): The end year for filtering.
-        dataset_dataframe (pd.DataFrame): The dataset to filter.
-
-    Returns:
-        pd.DataFrame: The filtered dataset.
-    """
-    if start_year in range(2018, 2024) and end_year in range(2018, 2024):
-        if dataset_name == "arxiv":
-            dataset_dataframe = dataset_dataframe[
-                (pd.to_datetime(dataset_dataframe["update_date"]).dt.year >= start_year)
-                & (pd.to_datetime(dataset_dataframe["update_date"]).dt.year <= end_year)
-            ]
-        elif dataset_name == "bioarxiv":
-            dataset_dataframe = dataset_dataframe[
-                (pd.to_datetime(dataset_dataframe["date"]).dt.year >= start_year)
-                & (pd.to_datetime(dataset_dataframe["date"]).dt.year <= end_year)
-            ]
-        elif dataset_name == "plos_one":
-            dataset_dataframe = dataset_dataframe[
-                (
-                    (
-                        pd.to_datetime(
-                            dataset_dataframe["Publication Date"],
-                            format="%Y-%m-%dT%H:%M:%SZ",
-                        )
-                    ).dt.year
-                    >= start_year
-                )
-                & (
-                    (
-                        pd.to_datetime(
-                            dataset_dataframe["Publication Date"],
-                            format="%Y-%m-%dT%H:%M:%SZ",
-                        )
-                    ).dt.year
-                    <= end_year
-                )
-            ]
-        elif dataset_name in ["medline_large", "medline_small"]:
-            dataset_dataframe["Year"] = dataset_dataframe["P_Date"].str.split(
-                " ", expand=True
-            )[0]
-            dataset_dataframe["Month"] = dataset_dataframe["P_Date"].str.split(
-                " ", expand=True
-            )[1]
-            dataset_dataframe["Year"] = pd.to_numeric(
-                dataset_dataframe["Year"], errors="coerce"
-            )
-            dataset_dataframe["Month"] = pd.to_datetime(
-                dataset_dataframe["Month"], format="%b", errors="coerce"
-            ).dt.month
-            dataset_dataframe = dataset_dataframe[
-                (dataset_dataframe["Year"] >= start_year)
-                & (dataset_dataframe["Year"] <= end_year)
-            ]
-
-        print(f'Dataset "{dataset_name}" loaded and filtered based on date selection.')
-        return dataset_dataframe
-    else:
-        print("The selected filters are not available.")
-        return None
-
-
-
-
+import pandas as pd
+import urllib.request
+import io
+import os
+import functools
+import collections
+import time
+
+from . import events
+from .cache import cached_download
+from .partitions import local_partitions, read_manifest, read_partitions
+from .registry import get_dataset
+from .storage import columnar_path, read_columnar, read_mapped, write_batches, write_frame, year_range
+
+# Optional base URL of published year partitions, one directory per dataset
+PARTITIONS_URL = os.environ.get("NBDT_PARTITIONS_URL")
+
+# Text columns with at most this many distinct values per row are stored as categories by compact_frame
+CATEGORY_MAX_RATIO = 0.5
+# Rows looked at to rule out the category dtype before counting the distinct values of a whole column
+CATEGORY_SAMPLE_SIZE = 10000
+
+
+def load_dataset(
+    dataset_name,
+    start_year=None,
+    end_year=None,
+    destination_path=None,
+    cache=True,
+    offline=None,
+    chunksize=None,
+    format="csv",
+    columns=None,
+    partitioned=False,
+    compact=False,
+    mmap=False,
+):
+    """
+    Loads a dataset by name and optionally filters it based on start_year and end_year.
+    Saves the filtered dataset to a destination_path if provided.
+
+    The CSV is parsed with the dtypes and columns of the dataset descriptor (see nbdt.registry),
+    so pandas does not have to infer them.
+
+    Args:
+        dataset_name (str): The name of the dataset to load, see nbdt.registry.list_datasets.
+        start_year (int, optional): The start year for filtering the dataset. Defaults to None.
+        end_year (int, optional): The end year for filtering the dataset. The dataset is only filtered when both years are given. Defaults to None.
+        destination_path (str, optional): The file path to save the filtered dataset. Defaults to None.
+        cache (bool, optional): Whether to keep the downloaded file in the local cache and revalidate it on later loads. Must be True with format="parquet"/"feather", partitioned or mmap, whose copies are kept in the cache. Defaults to True.
+        offline (bool, optional): If True, only the cached copy is used. Defaults to the cache-wide setting.
+        chunksize (int, optional): If given, the dataset is parsed in chunks of this many rows and an iterator of DataFrames is returned. Defaults to None.
+        format (str, optional): "csv", or "parquet"/"feather" to convert the dataset once into a columnar copy in the cache and read from it. Defaults to "csv".
+        columns (list, optional): Only load these columns. Defaults to None.
+        partitioned (bool, optional): If True, the dataset is read from one file per publication year and only the years between start_year and end_year are fetched and parsed. The partitions come from $NBDT_PARTITIONS_URL if set, otherwise they are built once in the local cache. Defaults to False.
+        compact (bool, optional): If True, the DataFrame uses compact dtypes, see compact_frame. Not supported with chunksize. Defaults to False.
+        mmap (bool, optional): If True, the dataset is converted once into an uncompressed Arrow file in the cache, which is memory-mapped instead of read. Processes loading the same dataset then share its memory. The columns have pd.ArrowDtype dtypes. Defaults to False.
+
+    Returns:
+        pd.DataFrame, iterator of pd.DataFrame or None: The loaded dataset as a DataFrame (or an iterator of DataFrames if chunksize is given) if destination_path is not provided, otherwise None.
+    """
+    dataset = get_dataset(dataset_name)
+
+    if dataset is not None:
+        dataset_url = dataset.url
+        if start_year is None or end_year is None:
+            # A single bound is ignored, so that every format loads the same rows
+            start_year = end_year = None
+
+        if format not in ("csv", "parquet", "feather"):
+            raise ValueError(f'Unknown format "{format}", use "csv", "parquet" or "feather".')
+        if not cache and (format != "csv" or partitioned or mmap):
+            # The columnar copies and partitions are kept in the cache
+            raise ValueError('cache=False is only supported with format="csv", without partitioned or mmap.')
+
+        if chunksize is not None:
+            if format != "csv":
+                raise ValueError('chunksize is only supported with format="csv".')
+            if mmap:
+                raise ValueError("chunksize is not supported with mmap=True.")
+            if partitioned:
+                raise ValueError("chunksize is not supported with partitioned=True.")
+            if compact:
+                # Every chunk would get its own categories, so the chunks could not be combined
+                raise ValueError("chunksize is not supported with compact=True.")
+            if start_year is not None and end_year is not None and start_year > end_year:
+                print("The selected filters are not available.")
+                return None
+            chunks = _read_chunks(dataset, start_year, end_year, cache, offline, chunksize, columns)
+            if destination_path is not None:
+                # The extension of destination_path gives the format, as for write_frame
+                if write_batches(chunks, destination_path):
+                    print(f'Dataset downloaded successfully and saved to "{destination_path}".')
+                else:
+                    print("No papers match the selected filters.")
+                return None
+            return chunks
+
+        if partitioned:
+            fmt = "parquet" if format == "csv" else format
+            if PARTITIONS_URL:
+                location = f"{PARTITIONS_URL.rstrip('/')}/{dataset_name}"
+            else:
+                location = local_partitions(
+                    dataset_url,
+                    dataset_name,
+                    functools.partial(normalize_dates, dataset_name),
+                    fmt=fmt,
+                    offline=offline,
+                    dtype=dataset.dtypes,
+                    sha256=dataset.sha256,
+                )
+            if start_year is not None and end_year is not None:
+                years = [
+                    p["year"] for p in read_manifest(location, offline)["partitions"] if p["year"] is not None
+                ]
+                if not _years_available(start_year, end_year, min(years, default=None), max(years, default=None)):
+                    return None
+            with events.timed("read", dataset=dataset_name, format="partitioned") as fields:
+                dataset_dataframe = read_partitions(
+                    location, start_year, end_year, columns, offline=offline
+                )
+                fields["rows"] = len(dataset_dataframe)
+            if start_year is not None and end_year is not None:
+                print(f'Dataset "{dataset_name}" loaded and filtered based on date selection.')
+        elif mmap:
+            if compact:
+                raise ValueError("compact is not supported with mmap=True.")
+            path = columnar_path(
+                dataset_url,
+                functools.partial(normalize_dates, dataset_name),
+                fmt="arrow",
+                offline=offline,
+                dtype=dataset.dtypes,
+                sha256=dataset.sha256,
+            )
+            if start_year is not None and end_year is not None:
+                if not _years_available(start_year, end_year, *year_range(path)):
+                    return None
+            with events.timed("read", dataset=dataset_name, format="arrow") as fields:
+                dataset_dataframe = read_mapped(path, columns, start_year, end_year)
+                fields["rows"] = len(dataset_dataframe)
+            if start_year is not None and end_year is not None:
+                print(f'Dataset "{dataset_name}" loaded and filtered based on date selection.')
+        elif format != "csv":
+            path = columnar_path(
+                dataset_url,
+                functools.partial(normalize_dates, dataset_name),
+                fmt=format,
+                offline=offline,
+                dtype=dataset.dtypes,
+                sha256=dataset.sha256,
+            )
+            if start_year is not None and end_year is not None:
+                if not _years_available(start_year, end_year, *year_range(path)):
+                    return None
+            with events.timed("read", dataset=dataset_name, format=format) as fields:
+                dataset_dataframe = read_columnar(path, columns, start_year, end_year)
+                fields["rows"] = len(dataset_dataframe)
+            if start_year is not None and end_year is not None:
+                print(f'Dataset "{dataset_name}" loaded and filtered based on date selection.')
+        else:
+            read_options = dataset.read_options(_usecols(dataset, columns, start_year, end_year))
+            if compact:
+                read_options = _compact_read_options(read_options)
+            if cache:
+                path = cached_download(dataset_url, offline=offline, sha256=dataset.sha256)
+                with events.timed("parse", dataset=dataset_name) as fields:
+                    dataset_dataframe = pd.read_csv(path, **read_options)
+                    fields["rows"] = len(dataset_dataframe)
+            else:
+                # The response is parsed as a binary stream, without decoding it into one string
+                with urllib.request.urlopen(dataset_url) as response:
+                    with events.timed("parse", dataset=dataset_name) as fields:
+                        dataset_dataframe = pd.read_csv(
+                            io.BufferedReader(response, 1024 * 1024), **read_options
+                        )
+                        fields["rows"] = len(dataset_dataframe)
+
+            if start_year is not None and end_year is not None:
+                dataset_dataframe = filter_dataset(
+                    dataset_name, start_year, end_year, dataset_dataframe
+                )
+            if dataset_dataframe is not None and columns is not None:
+                dataset_dataframe = dataset_dataframe[columns]
+
+        if dataset_dataframe is None:
+            return None
+        if compact:
+            dataset_dataframe = compact_frame(dataset_name, dataset_dataframe)
+
+        if destination_path is not None:
+            write_frame(dataset_dataframe, destination_path)
+            print(f'Dataset downloaded successfully and saved to "{destination_path}".')
+        else:
+            print("Dataset downloaded successfully.")
+            return dataset_dataframe
+    else:
+        print(f'Dataset "{dataset_name}" is not available.')
+
+
+def _usecols(dataset, columns, start_year, end_year):
+    """
+    Returns the columns to parse from the CSV: the requested ones plus the date column when filtering.
+    """
+    if columns is None:
+        return None
+    if start_year is not None and end_year is not None and dataset.date_column not in columns:
+        return list(columns) + [dataset.date_column]
+    return columns
+
+
+def _read_chunks(dataset, start_year, end_year, cache, offline, chunksize, columns=None):
+    """
+    Yields the dataset in chunks of chunksize rows, filtered by year if requested.
+    """
+    if cache:
+        response = None
+        source = cached_download(dataset.url, offline=offline, sha256=dataset.sha256)
+    else:
+        response = urllib.request.urlopen(dataset.url)
+        source = io.BufferedReader(response, 1024 * 1024)
+
+    try:
+        read_options = dataset.read_options(_usecols(dataset, columns, start_year, end_year))
+        with pd.read_csv(source, chunksize=chunksize, **read_options) as reader:
+            for chunk in reader:
+                if start_year is not None and end_year is not None:
+                    chunk = _filter_by_year(dataset, start_year, end_year, chunk)
+                if columns is not None:
+                    chunk = chunk[columns]
+                yield chunk
+    finally:
+        if response is not None:
+            response.close()
+
+
+def iter_dataset(dataset_name, batch_size=100000, columns=None, years=None, cache=True, offline=None):
+    """
+    Reads a dataset batch by batch, so that datasets larger than the available memory can be processed.
+
+    Only one batch is parsed at a time and the year filter is applied to each batch, so
+    memory use depends on batch_size and not on the size of the dataset.
+
+    Args:
+        dataset_name (str or Dataset): The name of the dataset, or a Dataset descriptor (see nbdt.registry).
+        batch_size (int, optional): Maximum number of rows per batch. Defaults to 100000.
+        columns (list, optional): Only read these columns. Defaults to None.
+        years (tuple, optional): A (start_year, end_year) pair; only the papers published in these years are kept. Defaults to None.
+        cache (bool, optional): Whether to read the file from the local cache. Defaults to True.
+        offline (bool, optional): If True, only the cached copy is used.
+
+    Yields:
+        pd.DataFrame: The batches, in file order. Batches left empty by the year filter are skipped.
+    """
+    dataset = _descriptor(dataset_name)
+    start_year, end_year = years if years is not None else (None, None)
+    for batch in _read_chunks(dataset, start_year, end_year, cache, offline, batch_size, columns):
+        if len(batch):
+            yield batch
+
+
+def _descriptor(dataset):
+    """
+    Returns the Dataset descriptor of a dataset given by name or by descriptor.
+
+    Raises:
+        ValueError: If no dataset has this name.
+    """
+    if not isinstance(dataset, str):
+        return dataset
+    descriptor = get_dataset(dataset)
+    if descriptor is None:
+        raise ValueError(f'Dataset "{dataset}" is not available.')
+    return descriptor
+
+
+def filter_dataset(dataset_name, start_year, end_year, dataset_dataframe):
+    """
+    Filters the dataset based on start_year and end_year.
+
+    The dates are normalized once with normalize_dates, so the returned DataFrame carries
+    "Year" and "Month" columns and filtering it again only compares integers.
+
+    Args:
+        dataset_name (str): The name of the dataset being filtered.
+        start_year (int): The start year for filtering.
+        end_year (int): The end year for filtering.
+        dataset_dataframe (pd.DataFrame): The dataset to filter. It is not modified.
+
+    Returns:
+        pd.DataFrame: The filtered dataset.
+
+    Raises:
+        ValueError: If no dataset has this name.
+    """
+    _descriptor(dataset_name)
+    started = time.perf_counter()
+    rows_in = len(dataset_dataframe)
+    dataset_dataframe = normalize_dates(dataset_name, dataset_dataframe)
+    years = dataset_dataframe["Year"]
+    if not _years_available(start_year, end_year, years.min(), years.max()):
+        return None
+
+    dataset_dataframe = _filter_by_year(dataset_name, start_year, end_year, dataset_dataframe)
+    events.emit(
+        "filter",
+        dataset=dataset_name,
+        rows_in=rows_in,
+        rows=len(dataset_dataframe),
+        seconds=time.perf_counter() - started,
+    )
+    print(f'Dataset "{dataset_name}" loaded and filtered based on date selection.')
+    return dataset_dataframe
+
+
+def normalize_dates(dataset_name, dataset_dataframe):
+    """
+    Parses the date column of the dataset once into compact "Year" (Int16) and "Month" (Int8) columns.
+
+    DataFrames that already have both columns, such as columnar copies or the output of an
+    earlier call, are returned as they are.
+
+    Args:
+        dataset_name (str or Dataset): The name or the descriptor of the dataset.
+        dataset_dataframe (pd.DataFrame): The dataset. It is not modified.
+
+    Returns:
+        pd.DataFrame: The dataset with "Year" and "Month" columns.
+    """
+    if "Year" in dataset_dataframe and "Month" in dataset_dataframe:
+        if dataset_dataframe["Year"].dtype == "Int16":
+            return dataset_dataframe
+
+    dataset = _descriptor(dataset_name)
+    years, months = dataset.parse_dates(dataset_dataframe[dataset.date_column])
+    return dataset_dataframe.assign(Year=years.astype("Int16"), Month=months.astype("Int8"))
+
+
+def compact_frame(dataset_name, dataset_dataframe):
+    """
+    Converts the dataset to compact dtypes.
+
+    Repetitive text columns, such as journal names or categories, become pandas categories.
+    Other text columns use the Arrow-backed string dtype when pyarrow is installed. The
+    date column becomes datetime64, unless the dataset has its own date parser (as MEDLINE
+    does), and "Year"/"Month" are added as in normalize_dates.
+
+    Args:
+        dataset_name (str or Dataset): The name or the descriptor of the dataset.
+        dataset_dataframe (pd.DataFrame): The dataset. It is not modified.
+
+    Returns:
+        pd.DataFrame: The dataset with compact dtypes.
+    """
+    dataset = _descriptor(dataset_name)
+    if dataset.date_column in dataset_dataframe:
+        dataset_dataframe = normalize_dates(dataset_name, dataset_dataframe)
+
+    string_dtype = _string_dtype()
+    converted = {}
+    for column in dataset_dataframe.columns:
+        values = dataset_dataframe[column]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            continue
+        if not (values.dtype == object or pd.api.types.is_string_dtype(values.dtype)):
+            continue
+        if column == dataset.date_column and dataset.date_parser is None:
+            converted[column] = pd.to_datetime(values, format=dataset.date_format, errors="coerce", utc=True)
+        elif _is_low_cardinality(values):
+            converted[column] = values.astype("category")
+        else:
+            converted[column] = values.astype(string_dtype)
+    return dataset_dataframe.assign(**converted)
+
+
+def _is_low_cardinality(values):
+    sample = values.iloc[:CATEGORY_SAMPLE_SIZE]
+    if sample.nunique() > CATEGORY_MAX_RATIO * len(sample):
+        return False
+    return values.nunique() <= CATEGORY_MAX_RATIO * len(values)
+
+
+def _string_dtype():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return "string"
+    return "string[pyarrow]"
+
+
+def _compact_read_options(read_options):
+    """
+    Makes the parser store text columns in the Arrow-backed string dtype instead of Python strings.
+    """
+    dtype = read_options["dtype"]
+    if dtype is str:
+        dtype = _string_dtype()
+    elif isinstance(dtype, dict):
+        # The columns without a dtype are read as str, see nbdt.registry.Dataset
+        dtype = collections.defaultdict(
+            _string_dtype, {column: _string_dtype() if value is str else value for column, value in dtype.items()}
+        )
+    return dict(read_options, dtype=dtype)
+
+
+def _years_available(start_year, end_year, first_year, last_year):
+    """
+    Checks that the requested years overlap the years observed in the dataset.
+    """
+    if pd.isna(first_year) or start_year > end_year or end_year < first_year or start_year > last_year:
+        print("The selected filters are not available.")
+        if not pd.isna(first_year):
+            print(f"Papers are available from {int(first_year)} to {int(last_year)}.")
+        return False
+    return True
+
+
+def _filter_by_year(dataset_name, start_year, end_year, dataset_dataframe):
+    """
+    Keeps the rows of dataset_dataframe published between start_year and end_year.
+    """
+    dataset_dataframe = normalize_dates(dataset_name, dataset_dataframe)
+    in_range = dataset_dataframe["Year"].between(start_year, end_year).fillna(False)
+    return dataset_dataframe[in_range.to_numpy(dtype=bool)]
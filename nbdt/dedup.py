@@ -0,0 +1,363 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from . import events
+from .cache import cached_download, get_cache_dir
+
+# Word shingle length and number of hash functions of the MinHash signatures
+SHINGLE_SIZE = 3
+NUM_PERM = 64
+# Signatures are split in bands; papers sharing one band are compared
+LSH_BANDS = 16
+# Estimated Jaccard similarity above which two abstracts are near-duplicates
+NEAR_DUPLICATE_THRESHOLD = 0.9
+# Fingerprints added to a DedupIndex that are kept unsorted before they are merged into the sorted ones
+DELTA_SIZE = 65536
+
+
+def normalize_text(series):
+    """
+    Lowercases text and collapses runs of whitespace, so that formatting changes do not matter.
+
+    Args:
+        series (pd.Series): The text.
+
+    Returns:
+        pd.Series: The normalized text, with missing values as empty strings.
+    """
+    return (
+        series.fillna("")
+        .astype(str)
+        .str.lower()
+        .str.replace(r"\s+", " ", regex=True)
+        .str.strip()
+    )
+
+
+def fingerprint(series, normalize=True):
+    """
+    Returns a 64-bit fingerprint of every value of series.
+
+    Args:
+        series (pd.Series): The values.
+        normalize (bool, optional): Whether to apply normalize_text first. Defaults to True.
+
+    Returns:
+        np.ndarray: The uint64 fingerprints.
+    """
+    values = normalize_text(series) if normalize else series.astype(str)
+    return pd.util.hash_array(values.to_numpy(dtype=object))
+
+
+def _id_fingerprint(series):
+    # Missing IDs get 0, which never matches
+    fingerprints = pd.util.hash_array(series.astype(str).to_numpy(dtype=object))
+    fingerprints[series.isna().to_numpy()] = 0
+    return fingerprints
+
+
+def _in_sorted(values, sorted_values):
+    if len(sorted_values) == 0:
+        return np.zeros(len(values), dtype=bool)
+    positions = np.searchsorted(sorted_values, values).clip(max=len(sorted_values) - 1)
+    return sorted_values[positions] == values
+
+
+def drop_duplicates(frame, text_column="abstract", id_column=None):
+    """
+    Drops rows whose normalized text (or ID, if id_column is given) appears again later, keeping the last.
+
+    Args:
+        frame (pd.DataFrame): The rows.
+        text_column (str, optional): The column compared after normalize_text. Defaults to "abstract".
+        id_column (str, optional): A column identifying papers, e.g. the DOI. Defaults to None.
+
+    Returns:
+        pd.DataFrame: The rows without duplicates.
+    """
+    duplicated = pd.Series(fingerprint(frame[text_column])).duplicated(keep="last").to_numpy()
+    if id_column is not None:
+        ids = pd.Series(_id_fingerprint(frame[id_column]))
+        duplicated = duplicated | (ids.duplicated(keep="last").to_numpy() & (ids != 0).to_numpy())
+    return frame[~duplicated]
+
+
+class DedupIndex:
+    """
+    Fingerprints of the papers of a dataset, used to find new papers without re-hashing the dataset.
+
+    The index keeps one 64-bit fingerprint of the normalized text and one of the ID of every
+    row, in row order. Lookups use sorted copies, so checking m new rows costs O(m log n). The
+    sorted copies are saved with the index, and the fingerprints added since are kept in a
+    small unsorted delta, merged into them once there are DELTA_SIZE of them or the index is
+    saved, so neither loading nor a lookup sorts the whole index again.
+    With near_duplicates=True it also keeps MinHash signatures of the text and reports
+    texts whose estimated Jaccard similarity reaches NEAR_DUPLICATE_THRESHOLD.
+
+    Args:
+        near_duplicates (bool, optional): Whether to detect near-duplicate texts. Defaults to False.
+    """
+
+    def __init__(self, near_duplicates=False):
+        self.ids = np.zeros(0, dtype=np.uint64)
+        self.texts = np.zeros(0, dtype=np.uint64)
+        self.near_duplicates = near_duplicates
+        self.signatures = np.zeros((0, NUM_PERM), dtype=np.uint32)
+        self._sorted_ids = self._new_ids = self.ids
+        self._sorted_texts = self._new_texts = self.texts
+        self._buckets = None
+
+    def __len__(self):
+        return len(self.texts)
+
+    @classmethod
+    def from_frame(cls, frame, id_column=None, text_column="abstract", near_duplicates=False):
+        """
+        Builds the index of every row of frame.
+        """
+        index = cls(near_duplicates)
+        index.add(frame, id_column, text_column)
+        return index
+
+    @classmethod
+    def load(cls, path):
+        """
+        Reads an index written by save.
+        """
+        with np.load(path) as data:
+            index = cls(bool(data["near_duplicates"]))
+            index.ids = data["ids"]
+            index.texts = data["texts"]
+            index.signatures = data["signatures"]
+            if "sorted_texts" in data.files:
+                index._sorted_ids = data["sorted_ids"]
+                index._sorted_texts = data["sorted_texts"]
+            else:
+                # Written without the sorted copies
+                index._new_ids = index.ids
+                index._new_texts = index.texts
+                index._merge()
+        return index
+
+    def save(self, path):
+        """
+        Writes the index to path as a .npz file, with the sorted copies of the fingerprints.
+        """
+        self._merge()
+        tmp_path = path + ".tmp.npz"
+        np.savez(
+            tmp_path,
+            ids=self.ids,
+            texts=self.texts,
+            sorted_ids=self._sorted_ids,
+            sorted_texts=self._sorted_texts,
+            signatures=self.signatures,
+            near_duplicates=self.near_duplicates,
+        )
+        os.replace(tmp_path, path)
+
+    def add(self, frame, id_column=None, text_column="abstract"):
+        """
+        Adds the rows of frame to the index.
+        """
+        if id_column is None:
+            ids = np.zeros(len(frame), dtype=np.uint64)
+        else:
+            ids = _id_fingerprint(frame[id_column])
+        texts = fingerprint(frame[text_column])
+        self.ids = np.concatenate([self.ids, ids])
+        self.texts = np.concatenate([self.texts, texts])
+        self._new_ids = np.concatenate([self._new_ids, ids])
+        self._new_texts = np.concatenate([self._new_texts, texts])
+        if len(self._new_texts) >= DELTA_SIZE:
+            self._merge()
+        if self.near_duplicates:
+            self.signatures = np.concatenate(
+                [self.signatures, minhash_signatures(frame[text_column])]
+            )
+        self._buckets = None
+
+    def _merge(self):
+        # Inserts the delta into the sorted copies: O(n + m log m) instead of sorting n + m fingerprints
+        for name in ("ids", "texts"):
+            new = np.sort(getattr(self, f"_new_{name}"))
+            merged = getattr(self, f"_sorted_{name}")
+            setattr(self, f"_sorted_{name}", np.insert(merged, np.searchsorted(merged, new), new))
+            setattr(self, f"_new_{name}", new[:0])
+
+    def matches(self, ids, texts, signatures=None):
+        """
+        Tells which fingerprints are already in the index.
+
+        Args:
+            ids (np.ndarray): ID fingerprints; 0 never matches.
+            texts (np.ndarray): Text fingerprints.
+            signatures (np.ndarray, optional): MinHash signatures, checked if the index detects near-duplicates.
+
+        Returns:
+            np.ndarray: A boolean mask.
+        """
+        found_texts = _in_sorted(texts, self._sorted_texts) | np.isin(texts, self._new_texts)
+        found_ids = _in_sorted(ids, self._sorted_ids) | np.isin(ids, self._new_ids)
+        found = found_texts | (found_ids & (ids != 0))
+        if self.near_duplicates and signatures is not None:
+            found |= self._near_matches(signatures)
+        return found
+
+    def contains(self, frame, id_column=None, text_column="abstract"):
+        """
+        Tells which rows of frame are already in the index, by text or by ID.
+
+        Returns:
+            np.ndarray: A boolean mask.
+        """
+        if id_column is None:
+            ids = np.zeros(len(frame), dtype=np.uint64)
+        else:
+            ids = _id_fingerprint(frame[id_column])
+        signatures = minhash_signatures(frame[text_column]) if self.near_duplicates else None
+        return self.matches(ids, fingerprint(frame[text_column]), signatures)
+
+    def filter_new(self, frame, id_column=None, text_column="abstract"):
+        """
+        Returns the rows of frame that are not in the index, without duplicates among themselves.
+        """
+        frame = drop_duplicates(frame, text_column, id_column)
+        return frame[~self.contains(frame, id_column, text_column)]
+
+    def _near_matches(self, signatures):
+        rows = NUM_PERM // LSH_BANDS
+        if self._buckets is None:
+            self._buckets = {}
+            for position, signature in enumerate(self.signatures):
+                for band in range(LSH_BANDS):
+                    key = (band, signature[band * rows : (band + 1) * rows].tobytes())
+                    self._buckets.setdefault(key, []).append(position)
+
+        found = np.zeros(len(signatures), dtype=bool)
+        for i, signature in enumerate(signatures):
+            candidates = set()
+            for band in range(LSH_BANDS):
+                key = (band, signature[band * rows : (band + 1) * rows].tobytes())
+                candidates.update(self._buckets.get(key, ()))
+            if candidates:
+                similarity = (self.signatures[list(candidates)] == signature).mean(axis=1)
+                found[i] = similarity.max() >= NEAR_DUPLICATE_THRESHOLD
+        return found
+
+
+def minhash_signatures(series, num_perm=NUM_PERM):
+    """
+    Computes MinHash signatures of the word shingles of every normalized text.
+
+    Args:
+        series (pd.Series): The texts.
+        num_perm (int, optional): Number of hash functions. Defaults to NUM_PERM.
+
+    Returns:
+        np.ndarray: A (len(series), num_perm) uint32 matrix.
+    """
+    rng = np.random.default_rng(0)
+    multipliers = rng.integers(1, 2**63, size=num_perm, dtype=np.uint64) | np.uint64(1)
+    offsets = rng.integers(0, 2**63, size=num_perm, dtype=np.uint64)
+
+    signatures = np.full((len(series), num_perm), np.iinfo(np.uint32).max, dtype=np.uint32)
+    for i, text in enumerate(normalize_text(series)):
+        words = text.split(" ")
+        shingles = [" ".join(words[j : j + SHINGLE_SIZE]) for j in range(max(1, len(words) - SHINGLE_SIZE + 1))]
+        hashes = pd.util.hash_array(np.array(shingles, dtype=object))
+        # Multiply-shift hashing, one function per column
+        permuted = (hashes[:, None] * multipliers[None, :] + offsets[None, :]) >> np.uint64(32)
+        signatures[i] = permuted.min(axis=0).astype(np.uint32)
+    return signatures
+
+
+def source_index(dataset_url, batches, id_column=None, text_column="abstract", near_duplicates=False):
+    """
+    Returns the DedupIndex of a source dataset, building it once per version of the source file.
+
+    Args:
+        dataset_url (str): The URL the source rows are read from.
+        batches (callable): Returns an iterator over the source rows as DataFrames, see merge_batches.
+        id_column (str, optional): The ID column. Defaults to None.
+        text_column (str, optional): The text column. Defaults to "abstract".
+        near_duplicates (bool, optional): Whether the index keeps MinHash signatures. Defaults to False.
+
+    Returns:
+        DedupIndex: The index, with rows aligned to the source rows.
+    """
+    dedup_dir = os.path.join(get_cache_dir(), "dedup")
+    os.makedirs(dedup_dir, exist_ok=True)
+    suffix = "-near" if near_duplicates else ""
+    path = os.path.join(dedup_dir, f"{os.path.basename(cached_download(dataset_url))}-{id_column}{suffix}.npz")
+    if os.path.exists(path):
+        return DedupIndex.load(path)
+    index = DedupIndex(near_duplicates)
+    for batch in batches():
+        index.add(batch, id_column, text_column)
+    index.save(path)
+    return index
+
+
+def merge_batches(batches, new, id_column=None, text_column="abstract", index=None, near_duplicates=False):
+    """
+    Combines source rows with new rows like merge, reading and yielding the source rows batch by batch.
+
+    Only the fingerprints of the source (32 bytes per row with their sorted copies) are kept in memory, so sources
+    larger than the available memory can be merged.
+
+    Args:
+        batches (callable): Returns a new iterator over the source rows as DataFrames. It is called
+            once to build the index when index is None, and once to read the rows.
+        new (pd.DataFrame): The new rows.
+        id_column (str, optional): The ID column. Defaults to None.
+        text_column (str, optional): The text column. Defaults to "abstract".
+        index (DedupIndex, optional): The index of the source rows (see source_index).
+        near_duplicates (bool, optional): Whether a new row also replaces the source rows whose text
+            is a near-duplicate of its own. The index must then keep signatures. Defaults to False.
+
+    Yields:
+        pd.DataFrame: The source rows that are kept, batch by batch, and then the new rows.
+    """
+    if index is None:
+        index = DedupIndex(near_duplicates)
+        for batch in batches():
+            index.add(batch, id_column, text_column)
+    elif near_duplicates and not index.near_duplicates:
+        raise ValueError("near_duplicates needs an index built with near_duplicates=True.")
+    new = drop_duplicates(new, text_column, id_column)
+    new_index = DedupIndex.from_frame(new, id_column, text_column, near_duplicates)
+
+    keep = ~pd.Series(index.texts).duplicated(keep="last").to_numpy()
+    keep = keep & ~new_index.matches(index.ids, index.texts, index.signatures if near_duplicates else None)
+    offset = 0
+    for batch in batches():
+        yield batch[keep[offset : offset + len(batch)]]
+        offset += len(batch)
+    events.emit("merge", source_rows=len(keep), dropped=int((~keep).sum()), new_rows=len(new))
+    yield new
+
+
+def merge(source, new, id_column=None, text_column="abstract", index=None, near_duplicates=False):
+    """
+    Combines a source dataset with new rows; a new row replaces the source rows with the same text or ID.
+
+    This matches pd.concat([source, new]).drop_duplicates(keep="last") on the normalized text,
+    but only the new rows are hashed when the index of the source is given.
+
+    Args:
+        source (pd.DataFrame): The existing rows.
+        new (pd.DataFrame): The new rows.
+        id_column (str, optional): The ID column. Defaults to None.
+        text_column (str, optional): The text column. Defaults to "abstract".
+        index (DedupIndex, optional): The index of source, with rows aligned to it.
+        near_duplicates (bool, optional): Whether near-duplicate texts are replaced too, see merge_batches. Defaults to False.
+
+    Returns:
+        pd.DataFrame: The combined rows.
+    """
+    return pd.concat(
+        list(merge_batches(lambda: [source], new, id_column, text_column, index, near_duplicates)), ignore_index=True
+    )
@@ -0,0 +1,206 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from urllib3.util.request import ACCEPT_ENCODING
+
+from . import events
+from .fetch import REQUEST_TIMEOUT, make_session
+
+# Size of the byte ranges requested in parallel
+CHUNK_SIZE = 8 * 1024**2
+# Number of ranges downloaded at the same time
+MAX_WORKERS = 4
+# Attempts per range when a connection drops in the middle of the body
+CHUNK_RETRIES = 3
+
+BLOCK_SIZE = 1024 * 1024
+
+
+def _progress_path(part_path):
+    return part_path + ".json"
+
+
+def _load_progress(part_path, validators):
+    # The ranges already on disk, if the partial file belongs to the same version of the file
+    try:
+        with open(_progress_path(part_path)) as f:
+            progress = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return set()
+    if progress.get("validators") != validators or not os.path.exists(part_path):
+        return set()
+    return set(progress["done"])
+
+
+def _save_progress(part_path, validators, done):
+    tmp_path = _progress_path(part_path) + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"validators": validators, "done": sorted(done)}, f)
+    os.replace(tmp_path, _progress_path(part_path))
+
+
+def _discard(part_path):
+    for path in (part_path, _progress_path(part_path)):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def _file_sha256(path):
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(BLOCK_SIZE), b""):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def _download_range(session, url, part_path, start, end):
+    headers = {"Range": f"bytes={start}-{end}", "Accept-Encoding": "identity"}
+    for attempt in range(CHUNK_RETRIES):
+        try:
+            with session.get(url, headers=headers, stream=True, timeout=REQUEST_TIMEOUT) as response:
+                response.raise_for_status()
+                if response.status_code != 206:
+                    raise ValueError(f"{url} ignored the range request.")
+                written = 0
+                with open(part_path, "r+b") as f:
+                    f.seek(start)
+                    for block in response.iter_content(BLOCK_SIZE):
+                        f.write(block)
+                        written += len(block)
+            if written != end - start + 1:
+                raise requests.exceptions.ChunkedEncodingError(
+                    f"Received {written} of {end - start + 1} bytes of {url}."
+                )
+            return
+        except (requests.exceptions.ConnectionError, requests.exceptions.ChunkedEncodingError):
+            if attempt == CHUNK_RETRIES - 1:
+                raise
+
+
+def _download_ranges(session, url, part_path, size, validators, max_workers, chunk_size):
+    """
+    Downloads the missing chunks of part_path in parallel and records each completed chunk.
+
+    Returns the number of chunks that were already downloaded by an earlier attempt.
+    """
+    done = _load_progress(part_path, validators)
+    resumed = len(done)
+    if not done:
+        with open(part_path, "wb") as f:
+            f.truncate(size)
+    chunks = [i for i in range((size + chunk_size - 1) // chunk_size) if i not in done]
+    if done:
+        print(f"Resuming the download of {url} ({len(done)} chunks already downloaded)...")
+    lock = threading.Lock()
+
+    def fetch(i):
+        _download_range(session, url, part_path, i * chunk_size, min(size, (i + 1) * chunk_size) - 1)
+        with lock:
+            done.add(i)
+            _save_progress(part_path, validators, done)
+
+    _save_progress(part_path, validators, done)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(fetch, i) for i in chunks]
+        try:
+            for future in futures:
+                future.result()
+        except BaseException:
+            # The chunks completed so far stay recorded for the next attempt
+            for future in futures:
+                future.cancel()
+            raise
+    return resumed
+
+
+def _download_stream(session, url, part_path):
+    """
+    Downloads url in a single request, decoding a gzip, deflate or zstd Content-Encoding.
+    """
+    with session.get(url, headers={"Accept-Encoding": ACCEPT_ENCODING}, stream=True, timeout=REQUEST_TIMEOUT) as response:
+        response.raise_for_status()
+        encoded = response.headers.get("Content-Encoding", "identity") != "identity"
+        expected = None if encoded else response.headers.get("Content-Length")
+        written = 0
+        with open(part_path, "wb") as f:
+            for block in response.iter_content(BLOCK_SIZE):
+                f.write(block)
+                written += len(block)
+    if expected is not None and written != int(expected):
+        raise requests.exceptions.ChunkedEncodingError(f"Received {written} of {expected} bytes of {url}.")
+
+
+def download(url, path, sha256=None, size=None, max_workers=MAX_WORKERS, chunk_size=CHUNK_SIZE, session=None):
+    """
+    Downloads url to path, in parallel byte ranges when the server supports them.
+
+    The file is written to path + ".part" first. With range support, the completed chunks
+    are recorded next to it, so a download that is interrupted resumes with the missing
+    chunks on the next call, as long as the ETag and Last-Modified of the file are unchanged.
+    Servers without range support get a single request, which may use gzip, deflate or
+    zstd content encoding; the file is stored decoded. The result is checked against size
+    and sha256 before it is moved to path.
+
+    Args:
+        url (str): The http(s) URL of the file.
+        path (str): The destination path.
+        sha256 (str, optional): The expected SHA-256 digest of the file.
+        size (int, optional): The expected size of the file in bytes.
+        max_workers (int, optional): Maximum number of ranges downloaded at the same time. Defaults to 4.
+        chunk_size (int, optional): Size of each range in bytes. Defaults to 8 MiB.
+        session (requests.Session, optional): The session to use. Defaults to a new one with retries, see nbdt.fetch.make_session.
+
+    Returns:
+        dict: The "sha256" and "size" of the file, and its "etag" and "last_modified" headers.
+    """
+    if session is None:
+        session = make_session(pool_size=max_workers)
+    part_path = path + ".part"
+    started = time.perf_counter()
+    resumed = 0
+
+    head = session.head(url, headers={"Accept-Encoding": "identity"}, allow_redirects=True, timeout=REQUEST_TIMEOUT)
+    head.raise_for_status()
+    validators = [head.headers.get("ETag"), head.headers.get("Last-Modified")]
+    length = head.headers.get("Content-Length")
+    ranges = head.headers.get("Accept-Ranges", "").lower() == "bytes" and length is not None
+
+    if ranges:
+        total = int(length)
+        if size is not None and total != size:
+            raise ValueError(f"{url} has {total} bytes, expected {size}.")
+        try:
+            # Ranges are requested from the final URL, after redirects
+            resumed = _download_ranges(session, head.url, part_path, total, validators, max_workers, chunk_size)
+        except ValueError:
+            # The server does not honour ranges after all
+            _discard(part_path)
+            ranges = False
+    if not ranges:
+        _discard(part_path)
+        _download_stream(session, url, part_path)
+
+    actual_size = os.path.getsize(part_path)
+    digest = _file_sha256(part_path)
+    if (size is not None and actual_size != size) or (sha256 is not None and digest != sha256.lower()):
+        _discard(part_path)
+        raise ValueError(f"The download of {url} is corrupt: {actual_size} bytes with digest {digest}.")
+
+    os.replace(part_path, path)
+    _discard(part_path)
+    seconds = time.perf_counter() - started
+    events.emit(
+        "download",
+        url=url,
+        bytes=actual_size,
+        seconds=seconds,
+        bytes_per_second=actual_size / seconds if seconds else None,
+        ranges=ranges,
+        resumed_chunks=resumed,
+    )
+    return {"sha256": digest, "size": actual_size, "etag": validators[0], "last_modified": validators[1]}
@@ -0,0 +1,190 @@
+import contextlib
+import json
+import logging
+import os
+import threading
+import time
+import traceback
+
+# Pages looked at to estimate the time per page of a collection
+ETA_WINDOW = 20
+
+_sinks = []
+_lock = threading.Lock()
+
+
+def add_sink(sink):
+    """
+    Sends every event emitted from now on to sink.
+
+    An event is a dict with its name ("event"), the time it was emitted ("time", a Unix
+    timestamp) and fields depending on the event:
+
+    - "download": url, bytes, seconds, bytes_per_second, ranges (whether byte ranges were used), resumed_chunks
+    - "cache": url, status ("revalidated", "downloaded", "offline" or "stale")
+    - "retry": url, method, status, error, attempt
+    - "parse", "read": dataset, rows, seconds (read is a columnar or memory-mapped copy)
+    - "convert": url, format, rows, seconds
+    - "filter": dataset, rows_in, rows, seconds
+    - "write": path, rows, seconds
+    - "index": dataset, rows, seconds (see nbdt.search.build_index)
+    - "features": dataset, rows, seconds (see nbdt.features.build_features)
+    - "page": source, page, pages (None when unknown), records, seconds, seconds_per_page, eta_seconds
+    - "dedup": source, stage ("collected", or "stored" for papers already in an incrementally updated dataset), rows_in, rows
+    - "merge": source_rows, dropped (source rows replaced by new rows or duplicated), new_rows
+    - "update": dataset, ok, seconds
+    - "error": dataset, error, message, traceback
+
+    Args:
+        sink (callable): Called with every event. A LoggingSink, a JsonLinesSink or any function.
+
+    Returns:
+        callable: The sink, so that it can be passed to remove_sink later.
+    """
+    with _lock:
+        _sinks.append(sink)
+    return sink
+
+
+def remove_sink(sink):
+    """
+    Stops sending events to a sink added with add_sink.
+    """
+    with _lock:
+        if sink in _sinks:
+            _sinks.remove(sink)
+
+
+def emit(event, **fields):
+    """
+    Sends an event to every sink. Nothing is built when there are no sinks.
+    """
+    with _lock:
+        sinks = list(_sinks)
+    if not sinks:
+        return
+    record = {"event": event, "time": time.time(), **fields}
+    for sink in sinks:
+        sink(record)
+
+
+@contextlib.contextmanager
+def timed(event, **fields):
+    """
+    Emits event with the seconds spent in the with block, if it completes.
+
+    The block receives the fields as a dict, so it can add the ones only known at the end:
+
+        with events.timed("parse", dataset=name) as fields:
+            frame = pd.read_csv(path)
+            fields["rows"] = len(frame)
+    """
+    started = time.perf_counter()
+    yield fields
+    emit(event, **fields, seconds=time.perf_counter() - started)
+
+
+def error(dataset, exception):
+    """
+    Emits an "error" event for an exception that is reported instead of raised.
+    """
+    emit(
+        "error",
+        dataset=dataset,
+        error=type(exception).__name__,
+        message=str(exception),
+        traceback="".join(traceback.format_exception(type(exception), exception, exception.__traceback__)),
+    )
+
+
+def track_pages(source, pages, total_pages=None):
+    """
+    Passes the (cursor, records) pages of a collection through and emits a "page" event for each.
+
+    The ETA of every event is the number of pages left times the time per page of the
+    last ETA_WINDOW pages, so it follows the latency and concurrency actually observed.
+
+    Args:
+        source (str): The source being collected, e.g. "bioarxiv".
+        pages (iterable): The (cursor, records) pairs.
+        total_pages (int, optional): The number of pages, if known.
+
+    Yields:
+        The pages, unchanged.
+    """
+    started = time.perf_counter()
+    arrivals = [started]
+    for number, (cursor, records) in enumerate(pages, 1):
+        now = time.perf_counter()
+        arrivals = arrivals[-ETA_WINDOW:] + [now]
+        per_page = (arrivals[-1] - arrivals[0]) / (len(arrivals) - 1)
+        eta = None if total_pages is None else max(0, total_pages - number) * per_page
+        emit(
+            "page",
+            source=source,
+            page=number,
+            pages=total_pages,
+            records=len(records),
+            seconds=now - started,
+            seconds_per_page=per_page,
+            eta_seconds=eta,
+        )
+        yield cursor, records
+
+
+class LoggingSink:
+    """
+    Writes events to the "nbdt" logger, one line each.
+
+    Args:
+        logger (logging.Logger, optional): The logger. Defaults to logging.getLogger("nbdt").
+        level (int, optional): The level of the messages. Errors are always logged at ERROR. Defaults to INFO.
+    """
+
+    def __init__(self, logger=None, level=logging.INFO):
+        self.logger = logger or logging.getLogger("nbdt")
+        self.level = level
+
+    def __call__(self, event):
+        if event["event"] == "error":
+            self.logger.error("%s failed: %s\n%s", event["dataset"], event["message"], event["traceback"])
+        elif event["event"] == "page":
+            eta = "" if event["eta_seconds"] is None else f", ETA {event['eta_seconds']:.0f} s"
+            pages = "" if event["pages"] is None else f"/{event['pages']}"
+            self.logger.log(
+                self.level,
+                "%s: page %d%s, %d records, %.2f s per page%s",
+                event["source"],
+                event["page"],
+                pages,
+                event["records"],
+                event["seconds_per_page"],
+                eta,
+            )
+        else:
+            fields = " ".join(f"{name}={value}" for name, value in event.items() if name not in ("event", "time"))
+            self.logger.log(self.level, "%s %s", event["event"], fields)
+
+
+class JsonLinesSink:
+    """
+    Appends events to a JSON-lines file, one object per line.
+
+    Args:
+        path (str): The file path.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def __call__(self, event):
+        line = json.dumps(event, default=str) + "\n"
+        with self._lock:
+            with open(self.path, "a") as f:
+                f.write(line)
+
+
+# Events of every run can be recorded without changing the code, e.g. for scheduled refresh jobs
+if os.environ.get("NBDT_EVENTS_FILE"):
+    add_sink(JsonLinesSink(os.environ["NBDT_EVENTS_FILE"]))
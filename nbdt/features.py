@@ -0,0 +1,353 @@
+import json
+import os
+import shutil
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from . import events, search, state
+
+# Columns vectorized and recommended, matched case-insensitively
+TEXT_COLUMNS = search.TEXT_COLUMNS
+JOURNAL_COLUMNS = search.JOURNAL_COLUMNS
+# Words are hashed into this many features, so that new rows never change the vocabulary
+FEATURES = 2**20
+# Rows vectorized at a time, and by each worker process
+BATCH_SIZE = 50000
+# Scores computed at a time by a query (queries x papers), about 128 MB
+QUERY_CELLS = 2**25
+
+
+def _vectorize(strings):
+    # The sublinear term frequencies (1 + log(count)) of the hashed words of every string, as a CSR matrix
+    import pyarrow.compute as pc
+    import scipy.sparse as sp
+
+    tokens, parents = search._tokens(strings)
+    keep = pc.fill_null(pc.not_equal(tokens, ""), False)
+    tokens = tokens.filter(keep)
+    parents = parents.filter(keep).to_numpy(zero_copy_only=False)
+    # Only the distinct words of the batch are hashed
+    encoded = pc.dictionary_encode(tokens)
+    features = search._hash(encoded.dictionary.to_numpy(zero_copy_only=False)) % FEATURES
+    columns = features.astype(np.int32)[encoded.indices.to_numpy(zero_copy_only=False)]
+    counts = sp.csr_matrix(
+        (np.ones(len(columns), np.float32), (parents, columns)), shape=(len(strings), FEATURES)
+    )
+    counts.sum_duplicates()
+    counts.data = 1 + np.log(counts.data)
+    return counts
+
+
+def _normalize(matrix):
+    # Scales every row to unit length; empty rows stay empty
+    import scipy.sparse as sp
+
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    return sp.diags((1 / norms).astype(np.float32)) @ matrix
+
+
+def _top(scores, k):
+    # The columns of the k highest scores of every row, highest first, and the scores
+    k = min(k, scores.shape[1])
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k] if k else np.zeros((len(scores), 0), np.intp)
+    order = np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1, kind="stable")
+    top = np.take_along_axis(top, order, axis=1)
+    return top, np.take_along_axis(scores, top, axis=1)
+
+
+class FeatureStore:
+    """
+    TF-IDF vectors of the title and abstract of every paper of a dataset, for recommendation.
+
+    Words are hashed into FEATURES columns instead of being looked up in a fitted vocabulary,
+    and the term frequencies are stored without the IDF weights, which are derived from them
+    when the store is queried. Rows added later are therefore vectorized on their own and the
+    weights of the whole corpus stay exact, without refitting anything.
+
+    Build the store of a dataset with build_features.
+
+    Args:
+        counts (scipy.sparse.csr_matrix): The sublinear term frequencies, one row per paper.
+        journals (np.ndarray): The journal of every paper, as a position in journal_names, or -1.
+        journal_names (list): The journal names.
+    """
+
+    def __init__(self, counts, journals, journal_names):
+        self.counts = counts
+        self.journals = journals
+        self.journal_names = list(journal_names)
+        self._codes = {search._name(name): code for code, name in enumerate(self.journal_names)}
+        self._matrix = None
+        self._papers = None
+        self._centroids = None
+
+    def __len__(self):
+        return self.counts.shape[0]
+
+    def _add_journals(self, frame):
+        columns = search._columns(frame, JOURNAL_COLUMNS)
+        if not columns:
+            return np.full(len(frame), -1, np.int32)
+        # Journals are told apart by their normalized name and shown as first written
+        keys = search._names(search._strings(frame, columns[:1]))[0].to_numpy(zero_copy_only=False)
+        local, uniques = pd.factorize(keys)
+        names = frame[columns[0]].fillna("").astype(str).str.strip().to_numpy()
+        first = np.unique(local, return_index=True)[1]
+        mapping = np.full(len(uniques), -1, np.int32)
+        for code, (key, row) in enumerate(zip(uniques, first)):
+            if not key:
+                continue
+            if key not in self._codes:
+                self._codes[key] = len(self.journal_names)
+                self.journal_names.append(names[row])
+            mapping[code] = self._codes[key]
+        return mapping[local]
+
+    def add(self, frame):
+        """
+        Vectorizes the rows of frame as the papers following the ones already stored.
+
+        Only the new rows are tokenized; the IDF weights are updated from the stored frequencies.
+        """
+        import scipy.sparse as sp
+
+        counts = _vectorize(search._strings(frame, search._columns(frame, TEXT_COLUMNS)))
+        self.counts = sp.vstack([self.counts, counts], format="csr")
+        self.journals = np.concatenate([self.journals, self._add_journals(frame)])
+        self._matrix = self._papers = self._centroids = None
+
+    @property
+    def idf(self):
+        """
+        The smoothed inverse document frequency of every feature, log((1 + n) / (1 + df)) + 1.
+        """
+        documents = np.bincount(self.counts.indices, minlength=FEATURES)
+        return (np.log((1 + len(self)) / (1 + documents)) + 1).astype(np.float32)
+
+    @property
+    def matrix(self):
+        """
+        The TF-IDF vectors of the papers, one unit-length CSR row per paper.
+        """
+        import scipy.sparse as sp
+
+        if self._matrix is None:
+            self._matrix = _normalize(self.counts @ sp.diags(self.idf)).tocsr()
+        return self._matrix
+
+    def transform(self, texts):
+        """
+        Returns the TF-IDF vectors of texts with the weights of this corpus.
+
+        Args:
+            texts (str or list): A text or a list of texts, e.g. the title and abstract of a draft.
+
+        Returns:
+            scipy.sparse.csr_matrix: One unit-length row per text.
+        """
+        import pyarrow as pa
+        import scipy.sparse as sp
+
+        texts = [texts] if isinstance(texts, str) else [str(text) for text in texts]
+        counts = _vectorize(pa.array(texts, type=pa.large_string()))
+        return _normalize(counts @ sp.diags(self.idf)).tocsr()
+
+    def _queries(self, queries):
+        return queries.tocsr() if hasattr(queries, "tocsr") else self.transform(queries)
+
+    def nearest_papers(self, queries, k=10):
+        """
+        Finds the k papers closest to every query by cosine similarity.
+
+        Queries are scored in batches of QUERY_CELLS // len(self) against the whole corpus.
+
+            rows, scores = store.nearest_papers(["dopamine receptor binding in the striatum"], k=5)
+            df.iloc[rows[0]]
+
+        Args:
+            queries (str, list or scipy.sparse matrix): Texts, or vectors such as store.matrix[rows]
+                to find the papers closest to papers of the dataset (each paper finds itself first).
+            k (int, optional): The number of papers per query. Defaults to 10.
+
+        Returns:
+            tuple: The row positions of the papers (one row of k per query, closest first) and their scores.
+        """
+        queries = self._queries(queries)
+        if self._papers is None:
+            self._papers = self.matrix.T.tocsr()
+        batch = max(1, QUERY_CELLS // max(len(self), 1))
+        rows, scores = [], []
+        for start in range(0, queries.shape[0], batch):
+            top, top_scores = _top((queries[start : start + batch] @ self._papers).toarray(), k)
+            rows.append(top)
+            scores.append(top_scores)
+        if not rows:
+            return np.zeros((0, min(k, len(self))), np.intp), np.zeros((0, min(k, len(self))), np.float32)
+        return np.concatenate(rows), np.concatenate(scores)
+
+    def nearest_journals(self, queries, k=5):
+        """
+        Finds the k journals closest to every query, e.g. to recommend where to submit a paper.
+
+        A journal is represented by the normalized sum of the vectors of its papers.
+
+        Args:
+            queries (str, list or scipy.sparse matrix): Texts, or vectors such as store.matrix[rows].
+            k (int, optional): The number of journals per query. Defaults to 5.
+
+        Returns:
+            tuple: The journal names (one row of k per query, closest first) and their scores.
+        """
+        import scipy.sparse as sp
+
+        if not self.journal_names:
+            raise ValueError("The dataset has no journal column.")
+        if self._centroids is None:
+            papers = np.flatnonzero(self.journals >= 0)
+            membership = sp.csr_matrix(
+                (np.ones(len(papers), np.float32), (self.journals[papers], papers)),
+                shape=(len(self.journal_names), len(self)),
+            )
+            self._centroids = _normalize(membership @ self.matrix).T.tocsr()
+        top, scores = _top((self._queries(queries) @ self._centroids).toarray(), k)
+        return np.asarray(self.journal_names, dtype=object)[top], scores
+
+    @classmethod
+    def load(cls, directory):
+        """
+        Opens a store written by save.
+        """
+        import scipy.sparse as sp
+
+        with open(os.path.join(directory, "features.json")) as f:
+            meta = json.load(f)
+        counts = sp.load_npz(os.path.join(directory, "counts.npz")).tocsr()
+        return cls(counts, np.load(os.path.join(directory, "journals.npy")), meta["journal_names"])
+
+    def save(self, directory, source=None):
+        """
+        Writes the store to directory: the term frequencies as a CSR .npz file and the journals.
+
+        Args:
+            directory (str): The store directory; it is replaced.
+            source (str, optional): The vectorized file. Its size and modification time are recorded,
+                so that load_features can tell when the store is out of date.
+        """
+        import scipy.sparse as sp
+
+        tmp_dir = f"{directory}.{os.getpid()}.tmp"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        sp.save_npz(os.path.join(tmp_dir, "counts.npz"), self.counts, compressed=False)
+        np.save(os.path.join(tmp_dir, "journals.npy"), self.journals)
+        with open(os.path.join(tmp_dir, "features.json"), "w") as f:
+            json.dump(
+                {
+                    "rows": len(self),
+                    "features": FEATURES,
+                    "journal_names": self.journal_names,
+                    "source": search._stamp(source) if source else None,
+                },
+                f,
+            )
+        shutil.rmtree(directory, ignore_errors=True)
+        os.replace(tmp_dir, directory)
+
+
+def _locate(dataset, offline=None):
+    return search._locate(dataset, offline, file_dir=state.features_dir, cache_subdir="features")
+
+
+def _vectorized(path, batch_size, max_workers, store):
+    # Vectorizes the batches of path in max_workers processes, keeping at most two batches per
+    # process in flight, and adds the journals of every batch to store in order
+    batches = search._batches(path, batch_size, TEXT_COLUMNS + JOURNAL_COLUMNS)
+    if max_workers == 1:
+        for batch in batches:
+            store.journals = np.concatenate([store.journals, store._add_journals(batch)])
+            yield _vectorize(search._strings(batch, search._columns(batch, TEXT_COLUMNS)))
+        return
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        pending = deque()
+        for batch in batches:
+            store.journals = np.concatenate([store.journals, store._add_journals(batch)])
+            strings = search._strings(batch, search._columns(batch, TEXT_COLUMNS))
+            pending.append(executor.submit(_vectorize, strings))
+            if len(pending) >= 2 * max_workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def load_features(dataset, offline=None):
+    """
+    Opens the stored feature store of a dataset if it is up to date with the dataset file.
+
+    Args:
+        dataset (str): A dataset name (see nbdt.registry.list_datasets) or the path of a dataset file.
+        offline (bool, optional): If True, only the cached copy of a named dataset is used.
+
+    Returns:
+        FeatureStore or None: The store, or None if it was never built or the file changed since.
+    """
+    try:
+        path, directory = _locate(dataset, offline)
+    except (ValueError, FileNotFoundError):
+        return None
+    try:
+        with open(os.path.join(directory, "features.json")) as f:
+            meta = json.load(f)
+    except FileNotFoundError:
+        return None
+    if meta["source"] != search._stamp(path) or meta["features"] != FEATURES:
+        return None
+    return FeatureStore.load(directory)
+
+
+def build_features(dataset, offline=None, batch_size=BATCH_SIZE, max_workers=None, rebuild=False):
+    """
+    Returns the TF-IDF feature store of a dataset, vectorizing it on first use.
+
+    The store of a published dataset is kept in the local cache and rebuilt when the file
+    changes. The store of a dataset file, e.g. the destination_path of update_dataset, is kept
+    in <path>.features; incremental updates (update_dataset with incremental=True) vectorize
+    the appended papers into it.
+
+        store = build_features("medline_large")
+        df = load_dataset("medline_large")
+        rows, scores = store.nearest_papers(store.matrix[[0, 1]], k=5)
+        journals, scores = store.nearest_journals("Dopamine release in the striatum of mice ...")
+
+    Args:
+        dataset (str): A dataset name (see nbdt.registry.list_datasets) or the path of a dataset file.
+        offline (bool, optional): If True, only the cached copy of a named dataset is used.
+        batch_size (int, optional): Rows vectorized at a time. Defaults to 50000.
+        max_workers (int, optional): Number of processes vectorizing batches. Defaults to the number of CPUs.
+        rebuild (bool, optional): Vectorize the dataset even if an up-to-date store is kept. Defaults to False.
+
+    Returns:
+        FeatureStore: The store.
+    """
+    import scipy.sparse as sp
+
+    if not rebuild:
+        store = load_features(dataset, offline)
+        if store is not None:
+            return store
+
+    path, directory = _locate(dataset, offline)
+    max_workers = max_workers or os.cpu_count() or 1
+    print(f"Vectorizing {dataset}...")
+    with events.timed("features", dataset=dataset) as fields:
+        store = FeatureStore(sp.csr_matrix((0, FEATURES), dtype=np.float32), np.zeros(0, np.int32), [])
+        counts = list(_vectorized(path, batch_size, max_workers, store))
+        if counts:
+            store.counts = sp.vstack(counts, format="csr")
+        fields["rows"] = len(store)
+    os.makedirs(os.path.dirname(os.path.abspath(directory)), exist_ok=True)
+    store.save(directory, path)
+    return store
@@ -0,0 +1,146 @@
+import collections
+import threading
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from . import events
+
+# Seconds before a request without any response is abandoned
+REQUEST_TIMEOUT = 60
+
+
+class RateLimiter:
+    """
+    Spaces out requests so that no host receives more than rate requests per second.
+
+    Args:
+        rate (float, optional): Maximum requests per second per host. None disables the limit.
+    """
+
+    def __init__(self, rate=None):
+        self.interval = 1.0 / rate if rate else 0.0
+        self._next = {}
+        self._lock = threading.Lock()
+
+    def wait(self, url):
+        """
+        Blocks until a request to the host of url is allowed.
+        """
+        if not self.interval:
+            return
+        host = urllib.parse.urlparse(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next.get(host, now))
+            self._next[host] = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class _Retry(Retry):
+    # Emits a "retry" event whenever a request is retried
+    def increment(self, method=None, url=None, response=None, error=None, _pool=None, _stacktrace=None):
+        retry = super().increment(method, url, response, error, _pool, _stacktrace)
+        events.emit(
+            "retry",
+            url=f"{_pool.scheme}://{_pool.host}:{_pool.port}{url}" if _pool is not None else url,
+            method=method,
+            status=response.status if response is not None else None,
+            error=type(error).__name__ if error is not None else None,
+            attempt=len(retry.history),
+        )
+        return retry
+
+
+def make_session(pool_size=10, retries=3, backoff=0.5):
+    """
+    Creates a requests.Session with pooled keep-alive connections and retries with exponential backoff.
+
+    Args:
+        pool_size (int, optional): Connections kept open per host. Defaults to 10.
+        retries (int, optional): Retries on connection errors and 429/5xx responses. Defaults to 3.
+        backoff (float, optional): Backoff factor in seconds between retries. Defaults to 0.5.
+
+    Returns:
+        requests.Session: The session.
+    """
+    retry = _Retry(
+        total=retries,
+        backoff_factor=backoff,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=["GET", "HEAD"],
+        respect_retry_after_header=True,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def get_json(session, url, rate_limiter=None):
+    """
+    Fetches url and decodes its JSON body, raising for error status codes.
+
+    Args:
+        session (requests.Session): The session to use.
+        url (str): The URL to fetch.
+        rate_limiter (RateLimiter, optional): Limiter to wait on before the request.
+
+    Returns:
+        The decoded JSON.
+    """
+    if rate_limiter is not None:
+        rate_limiter.wait(url)
+    response = session.get(url, timeout=REQUEST_TIMEOUT)
+    response.raise_for_status()
+    return response.json()
+
+
+def iter_json_pages(session, urls, max_workers=8, rate_limit=None):
+    """
+    Fetches many JSON pages concurrently and yields them in the order of urls.
+
+    Each page is yielded as soon as it and every page before it have arrived, so callers
+    can process or checkpoint the pages while the later ones are still being fetched.
+    At most 2 * max_workers pages are requested ahead of the caller, which bounds memory.
+
+    Args:
+        session (requests.Session): The session to use, see make_session.
+        urls (list): The page URLs.
+        max_workers (int, optional): Maximum number of requests in flight. Defaults to 8.
+        rate_limit (float, optional): Maximum requests per second per host. Defaults to None.
+
+    Yields:
+        The decoded JSON of every page.
+    """
+    rate_limiter = RateLimiter(rate_limit)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        in_flight = collections.deque()
+        for url in urls:
+            in_flight.append(executor.submit(get_json, session, url, rate_limiter))
+            if len(in_flight) >= 2 * max_workers:
+                yield in_flight.popleft().result()
+        while in_flight:
+            yield in_flight.popleft().result()
+
+
+def fetch_json_pages(session, urls, max_workers=8, rate_limit=None):
+    """
+    Fetches many JSON pages concurrently and returns them in the order of urls.
+
+    Args:
+        session (requests.Session): The session to use, see make_session.
+        urls (list): The page URLs.
+        max_workers (int, optional): Maximum number of requests in flight. Defaults to 8.
+        rate_limit (float, optional): Maximum requests per second per host. Defaults to None.
+
+    Returns:
+        list: The decoded JSON of every page.
+    """
+    return list(iter_json_pages(session, urls, max_workers, rate_limit))
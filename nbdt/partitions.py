@@ -0,0 +1,168 @@
+import json
+import os
+import shutil
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from .cache import cached_download, get_cache_dir
+
+MANIFEST_NAME = "manifest.json"
+
+
+def partition_dataset(dataframe, out_dir, dataset_name, fmt="parquet"):
+    """
+    Writes dataframe as one file per publication year plus a manifest of the columns, row counts and byte sizes.
+
+    Rows without a year go to a "year=unknown" partition.
+
+    Args:
+        dataframe (pd.DataFrame): The dataset, with a "Year" column (see nbdt.datasets.normalize_dates).
+        out_dir (str): The directory receiving the partitions. It can be copied as-is to a web server.
+        dataset_name (str): The name of the dataset, recorded in the manifest.
+        fmt (str, optional): "parquet" or "feather". Defaults to "parquet".
+
+    Returns:
+        dict: The manifest.
+    """
+    import pyarrow as pa
+    import pyarrow.feather as feather
+    import pyarrow.parquet as pq
+
+    os.makedirs(out_dir, exist_ok=True)
+    extension = ".parquet" if fmt == "parquet" else ".feather"
+    # Every partition gets the same schema, so they can be concatenated without casts
+    schema = pa.Schema.from_pandas(dataframe, preserve_index=False)
+
+    partitions = []
+    for year, group in dataframe.groupby("Year", dropna=False, sort=True):
+        year = None if pd.isna(year) else int(year)
+        file_name = f"year={'unknown' if year is None else year}{extension}"
+        path = os.path.join(out_dir, file_name)
+        table = pa.Table.from_pandas(group, schema=schema, preserve_index=False)
+        if fmt == "parquet":
+            pq.write_table(table, path)
+        else:
+            feather.write_feather(table, path)
+        partitions.append(
+            {"year": year, "file": file_name, "rows": len(group), "bytes": os.path.getsize(path)}
+        )
+
+    manifest = {"dataset": dataset_name, "format": fmt, "columns": list(schema.names), "partitions": partitions}
+    with open(os.path.join(out_dir, MANIFEST_NAME), "w") as f:
+        json.dump(manifest, f, indent=1)
+    return manifest
+
+
+def local_partitions(dataset_url, dataset_name, normalize, fmt="parquet", offline=None, dtype=None, sha256=None):
+    """
+    Returns the directory of the year partitions of the CSV at dataset_url, building them on first use.
+
+    The directory is named after the digest of the cached CSV, so it is rebuilt whenever
+    the source file changes.
+
+    Args:
+        dataset_url (str): The URL of the source CSV.
+        dataset_name (str): The name of the dataset.
+        normalize (callable): Maps the CSV DataFrame to a DataFrame with a "Year" column.
+        fmt (str, optional): "parquet" or "feather". Defaults to "parquet".
+        offline (bool, optional): If True, only the cached copy of the CSV is used.
+        dtype (dict or type, optional): The dtypes of the CSV columns. Defaults to None, which infers them.
+        sha256 (str, optional): The expected digest of the CSV, see nbdt.cache.cached_download.
+
+    Returns:
+        str: The partition directory.
+    """
+    csv_path = cached_download(dataset_url, offline=offline, sha256=sha256)
+    out_dir = os.path.join(get_cache_dir(), "partitions", f"{os.path.basename(csv_path)}-{fmt}")
+    if not os.path.exists(os.path.join(out_dir, MANIFEST_NAME)):
+        print(f"Partitioning {dataset_name} by year...")
+        # Several processes may partition the same file at once; each writes its own copy
+        tmp_dir = f"{out_dir}.{os.getpid()}.tmp"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        partition_dataset(normalize(pd.read_csv(csv_path, dtype=dtype)), tmp_dir, dataset_name, fmt)
+        try:
+            os.replace(tmp_dir, out_dir)
+        except OSError:
+            # Another process finished first; its partitions are the same
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            if not os.path.exists(os.path.join(out_dir, MANIFEST_NAME)):
+                raise
+    return out_dir
+
+
+def _is_url(location):
+    return urllib.parse.urlparse(location).scheme in ("http", "https", "file")
+
+
+def _resolve(location, file_name, offline):
+    # Remote partitions go through the local cache, local ones are read in place
+    if _is_url(location):
+        return cached_download(f"{location.rstrip('/')}/{file_name}", offline=offline)
+    return os.path.join(location, file_name)
+
+
+def read_manifest(location, offline=None):
+    """
+    Reads the manifest of a partition directory or URL.
+
+    Args:
+        location (str): A local directory or an http(s) URL holding the partitions.
+        offline (bool, optional): If True, only cached copies of remote files are used.
+
+    Returns:
+        dict: The manifest.
+    """
+    with open(_resolve(location, MANIFEST_NAME, offline)) as f:
+        return json.load(f)
+
+
+def read_partitions(location, start_year=None, end_year=None, columns=None, max_workers=8, offline=None):
+    """
+    Loads only the year partitions between start_year and end_year, reading them in parallel.
+
+    The partitions are read as Arrow tables and concatenated without copying, and converted
+    to a DataFrame once.
+
+    Args:
+        location (str): A local directory or an http(s) URL holding the partitions.
+        start_year (int, optional): The first year to load. Defaults to None.
+        end_year (int, optional): The last year to load. Defaults to None.
+        columns (list, optional): Only read these columns. Defaults to None.
+        max_workers (int, optional): Number of partitions fetched and parsed at the same time. Defaults to 8.
+        offline (bool, optional): If True, only cached copies of remote files are used.
+
+    Returns:
+        pd.DataFrame: The rows of the selected years.
+    """
+    import pyarrow as pa
+    import pyarrow.feather as feather
+    import pyarrow.parquet as pq
+
+    manifest = read_manifest(location, offline)
+    partitions = manifest["partitions"]
+    if start_year is not None or end_year is not None:
+        partitions = [
+            p
+            for p in partitions
+            if p["year"] is not None
+            and (start_year is None or p["year"] >= start_year)
+            and (end_year is None or p["year"] <= end_year)
+        ]
+
+    def read(partition):
+        path = _resolve(location, partition["file"], offline)
+        if manifest["format"] == "parquet":
+            return pq.read_table(path, columns=columns)
+        return feather.read_table(path, columns=columns)
+
+    if not partitions:
+        if not manifest["partitions"]:
+            # An empty dataset has no partition to take the column types from
+            return pd.DataFrame(columns=columns if columns is not None else manifest.get("columns", []))
+        return read(manifest["partitions"][0]).slice(0, 0).to_pandas()
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        tables = list(executor.map(read, partitions))
+    return pa.concat_tables(tables).to_pandas()
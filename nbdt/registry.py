@@ -0,0 +1,244 @@
+import collections
+import os
+
+# Base URL of the Hugging Face repository hosting the datasets
+HF_BASE_URL = os.environ.get(
+    "NBDT_HF_BASE_URL", "https://huggingface.co/datasets/PenguinMan/ARXIV/resolve/main"
+)
+
+# Entry point group through which other packages register datasets
+ENTRY_POINT_GROUP = "nbdt.datasets"
+
+MONTHS = {
+    month: number
+    for number, month in enumerate(
+        ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"], 1
+    )
+}
+
+
+def parse_dates(dates, date_format=None):
+    """
+    Parses date strings into years and months.
+
+    Args:
+        dates (pd.Series): The dates.
+        date_format (str, optional): The strftime format of the dates. Defaults to None, which infers it.
+
+    Returns:
+        tuple: The years and the months, as pd.Series with missing values where a date could not be parsed.
+    """
+    import pandas as pd
+
+    parsed = pd.to_datetime(dates, format=date_format, errors="coerce", utc=True)
+    return parsed.dt.year, parsed.dt.month
+
+
+def parse_medline_dates(dates):
+    """
+    Parses MEDLINE publication dates such as "2021 Mar" or "2021 Mar 15" into years and months.
+
+    Args:
+        dates (pd.Series): The dates.
+
+    Returns:
+        tuple: The years and the months, as pd.Series.
+    """
+    import pandas as pd
+
+    parts = dates.str.extract(r"^\s*(\d{4})\s*([A-Za-z]{3})?", expand=True)
+    return pd.to_numeric(parts[0], errors="coerce"), parts[1].str.title().map(MONTHS)
+
+
+class Dataset:
+    """
+    Describes a dataset that load_dataset can load.
+
+    Args:
+        name (str): The name passed to load_dataset.
+        url (str): The URL of the CSV file.
+        date_column (str): The column holding the publication date.
+        date_format (str, optional): The strftime format of the dates, used when date_parser is not given. Defaults to None, which infers it.
+        date_parser (callable, optional): Maps the date column to a (years, months) tuple of pd.Series. Defaults to parse_dates.
+        columns (list, optional): The columns of the CSV, if known. They are not used to select what is parsed; pass columns to load_dataset for that.
+        dtypes (dict or type, optional): The dtypes passed to the parser, so that it does not infer them. A dict gives the dtypes of some columns: the other columns are read as str, and a listed column missing from the file is ignored. Defaults to str for every column.
+        size (int, optional): The size of the CSV in bytes, if known.
+        sha256 (str, optional): The SHA-256 digest of the CSV. A download that does not match it is rejected.
+        update_source (str, optional): The API update_dataset collects new papers from: "bioarxiv", "plos_one" or "arxiv". Defaults to None, for datasets that cannot be updated.
+        description (str, optional): A short description.
+    """
+
+    def __init__(
+        self,
+        name,
+        url,
+        date_column,
+        date_format=None,
+        date_parser=None,
+        columns=None,
+        dtypes=str,
+        size=None,
+        sha256=None,
+        update_source=None,
+        description="",
+    ):
+        self.name = name
+        self.url = url
+        self.date_column = date_column
+        self.date_format = date_format
+        self.date_parser = date_parser
+        self.columns = columns
+        if isinstance(dtypes, dict):
+            dtypes = collections.defaultdict(_text_dtype, dtypes)
+        self.dtypes = dtypes
+        self.size = size
+        self.sha256 = sha256
+        self.update_source = update_source
+        self.description = description
+
+    def __repr__(self):
+        return f"Dataset({self.name!r}, {self.url!r})"
+
+    def parse_dates(self, dates):
+        """
+        Parses the values of the date column into a (years, months) tuple of pd.Series.
+        """
+        if self.date_parser is not None:
+            return self.date_parser(dates)
+        return parse_dates(dates, self.date_format)
+
+    def read_options(self, columns=None):
+        """
+        Returns the dtype and usecols arguments of pd.read_csv for this dataset.
+
+        Args:
+            columns (list, optional): Only parse these columns. Defaults to None, which parses every column of the file.
+
+        Returns:
+            dict: The keyword arguments.
+        """
+        return {"dtype": self.dtypes, "usecols": columns}
+
+
+def _text_dtype():
+    # Default of the dtype mappings; a module-level function so that descriptors can be pickled
+    return str
+
+
+_registry = {}
+
+
+def register_dataset(dataset, replace=False):
+    """
+    Makes a dataset available to load_dataset under its name.
+
+    Args:
+        dataset (Dataset): The dataset.
+        replace (bool, optional): Whether to replace a dataset registered under the same name. Defaults to False.
+    """
+    if dataset.name in _registry and not replace:
+        raise ValueError(f'A dataset named "{dataset.name}" is already registered.')
+    _registry[dataset.name] = dataset
+
+
+def _entry_points():
+    from importlib.metadata import entry_points
+
+    try:
+        return list(entry_points(group=ENTRY_POINT_GROUP))
+    except TypeError:
+        # Python < 3.10
+        return list(entry_points().get(ENTRY_POINT_GROUP, []))
+
+
+def _load_entry_point(entry_point):
+    # An entry point refers to a Dataset, or to a function returning one or a list of them
+    loaded = entry_point.load()
+    if callable(loaded) and not isinstance(loaded, Dataset):
+        loaded = loaded()
+    for dataset in [loaded] if isinstance(loaded, Dataset) else loaded:
+        if dataset.name not in _registry:
+            register_dataset(dataset)
+
+
+def get_dataset(name):
+    """
+    Returns the descriptor of a dataset.
+
+    Datasets of other packages are declared as entry points of the "nbdt.datasets" group,
+    named after the dataset. Only the entry point of the requested name is imported.
+
+    Args:
+        name (str): The name of the dataset.
+
+    Returns:
+        Dataset or None: The dataset, or None if no dataset has this name.
+    """
+    if name not in _registry:
+        for entry_point in _entry_points():
+            if entry_point.name == name:
+                _load_entry_point(entry_point)
+    return _registry.get(name)
+
+
+def list_datasets():
+    """
+    Returns the names of the registered datasets, including those declared as entry points.
+
+    Returns:
+        list: The sorted names.
+    """
+    return sorted(set(_registry) | {entry_point.name for entry_point in _entry_points()})
+
+
+# PMID is the only column of the published files read as something else than str
+MEDLINE_DTYPES = {"PMID": "Int64"}
+
+register_dataset(
+    Dataset(
+        "arxiv",
+        f"{HF_BASE_URL}/arxiv2.csv",
+        date_column="update_date",
+        update_source="arxiv",
+        description="Nearly 3.5k neuroscience papers from arXiv",
+    )
+)
+register_dataset(
+    Dataset(
+        "bioarxiv",
+        f"{HF_BASE_URL}/bioarxiv%20(1).csv",
+        date_column="date",
+        update_source="bioarxiv",
+        description="29k neuroscience papers from bioRxiv",
+    )
+)
+register_dataset(
+    Dataset(
+        "plos_one",
+        f"{HF_BASE_URL}/plos_one_new.csv",
+        date_column="Publication Date",
+        date_format="%Y-%m-%dT%H:%M:%SZ",
+        update_source="plos_one",
+        description="18k neuroscience papers from PLOS ONE",
+    )
+)
+register_dataset(
+    Dataset(
+        "medline_small",
+        f"{HF_BASE_URL}/MEDLINE_Journal_Recommend2.csv",
+        date_column="P_Date",
+        date_parser=parse_medline_dates,
+        dtypes=MEDLINE_DTYPES,
+        description="105k papers from the top 200 neuroscience journals in MEDLINE",
+    )
+)
+register_dataset(
+    Dataset(
+        "medline_large",
+        f"{HF_BASE_URL}/MEDLINE_COMPLETE.csv",
+        date_column="P_Date",
+        date_parser=parse_medline_dates,
+        dtypes=MEDLINE_DTYPES,
+        description="200k papers from MEDLINE",
+    )
+)
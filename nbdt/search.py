@@ -0,0 +1,342 @@
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from . import events, state
+from .cache import cached_download, get_cache_dir
+from .registry import get_dataset
+from .storage import file_format, read_frame
+
+# Columns indexed by each field, matched case-insensitively
+TEXT_COLUMNS = ("title", "abstract")
+AUTHOR_COLUMNS = ("authors", "author")
+JOURNAL_COLUMNS = ("journal",)
+FIELDS = ("keyword", "author", "journal")
+
+# Tokens are the runs of letters, digits and underscores
+TOKEN_SEPARATOR = r"[^\p{L}\p{N}_]+"
+# Rows read at a time when an index is built
+BATCH_SIZE = 100000
+
+
+def _hash(values):
+    return pd.util.hash_array(np.asarray(values, dtype=object))
+
+
+def _columns(frame, names):
+    return [column for column in frame.columns if str(column).lower() in names]
+
+
+def _strings(frame, columns):
+    # The columns of frame joined by spaces, as an Arrow array
+    import pyarrow as pa
+
+    if not columns:
+        return pa.array([""] * len(frame), type=pa.large_string())
+    text = frame[columns[0]].fillna("").astype(str)
+    for column in columns[1:]:
+        text = text + " " + frame[column].fillna("").astype(str)
+    return pa.array(text.to_numpy(dtype=object), type=pa.large_string())
+
+
+def _tokens(strings):
+    # The lowercase word tokens of every string, and the position of the string of each token
+    import pyarrow.compute as pc
+
+    tokens = pc.split_pattern_regex(pc.utf8_lower(strings), TOKEN_SEPARATOR)
+    return pc.list_flatten(tokens), pc.list_parent_indices(tokens)
+
+
+def _names(strings, split=False):
+    # The names of every string, lowercase, without quotes or brackets and with whitespace collapsed,
+    # and the position of the string of each name. With split, author lists are separated by ";"
+    # when there is one (e.g. "Doe, J.; Roe, R."), by "," and " and " otherwise.
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    strings = pc.replace_substring_regex(pc.utf8_lower(strings), r"[\[\]'\"]", "")
+    if split:
+        strings = pc.replace_substring_regex(strings, r"\s+and\s+", ";")
+        strings = pc.if_else(pc.match_substring(strings, ";"), strings, pc.replace_substring(strings, ",", ";"))
+        lists = pc.split_pattern(strings, ";")
+        names, parents = pc.list_flatten(lists), pc.list_parent_indices(lists)
+    else:
+        names, parents = strings, pa.array(np.arange(len(strings)))
+    return pc.utf8_trim_whitespace(pc.replace_substring_regex(names, r"\s+", " ")), parents
+
+
+def _pairs(values, parents, start_row):
+    # (term hash, row) pairs of the non-empty values, without repeated terms per row.
+    # Only the distinct values of the batch are hashed.
+    import pyarrow.compute as pc
+
+    keep = pc.fill_null(pc.not_equal(values, ""), False)
+    encoded = pc.dictionary_encode(values.filter(keep))
+    distinct = max(len(encoded.dictionary), 1)
+    codes = encoded.indices.to_numpy(zero_copy_only=False).astype(np.int64)
+    keys = np.sort(parents.filter(keep).to_numpy(zero_copy_only=False).astype(np.int64) * distinct + codes)
+    keys = keys[np.diff(keys, prepend=-1) != 0]
+    hashes = _hash(encoded.dictionary.to_numpy(zero_copy_only=False))
+    return hashes[keys % distinct], (keys // distinct + start_row).astype(np.uint32)
+
+
+def _keyword_pairs(frame, start_row):
+    return _pairs(*_tokens(_strings(frame, _columns(frame, TEXT_COLUMNS))), start_row)
+
+
+def _author_pairs(frame, start_row):
+    return _pairs(*_names(_strings(frame, _columns(frame, AUTHOR_COLUMNS)[:1]), split=True), start_row)
+
+
+def _journal_pairs(frame, start_row):
+    return _pairs(*_names(_strings(frame, _columns(frame, JOURNAL_COLUMNS)[:1])), start_row)
+
+
+PAIRS = {"keyword": _keyword_pairs, "author": _author_pairs, "journal": _journal_pairs}
+
+
+def _name(name):
+    # A queried author or journal, normalized like the indexed ones
+    import pyarrow as pa
+
+    return _names(pa.array([str(name)], type=pa.large_string()))[0][0].as_py()
+
+
+def _postings(terms, rows):
+    # Groups (term, row) pairs by term: the rows of terms[i] are rows[offsets[i]:offsets[i + 1]]
+    order = np.argsort(terms, kind="stable")
+    terms, rows = terms[order], rows[order]
+    unique, starts = np.unique(terms, return_index=True)
+    return unique, np.append(starts, len(terms)).astype(np.int64), rows
+
+
+def _stamp(path):
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+class SearchIndex:
+    """
+    Inverted indexes of a dataset: title and abstract words, authors and journals.
+
+    Every field maps the hash of a term to the sorted positions of the rows containing it,
+    so a lookup is a binary search and a slice, independent of the size of the dataset.
+    Row positions follow the order of the dataset file, i.e. of load_dataset(name) without
+    a year filter or of the concatenated batches of iter_dataset(name).
+
+    Build the index of a dataset with build_index.
+    """
+
+    def __init__(self):
+        self.rows = 0
+        self._fields = {
+            field: (np.zeros(0, np.uint64), np.zeros(1, np.int64), np.zeros(0, np.uint32)) for field in FIELDS
+        }
+
+    def __len__(self):
+        return self.rows
+
+    @classmethod
+    def from_batches(cls, batches):
+        """
+        Builds the index of the rows of consecutive DataFrames.
+        """
+        index = cls()
+        pairs = {field: ([], []) for field in FIELDS}
+        for batch in batches:
+            for field in FIELDS:
+                terms, rows = PAIRS[field](batch, index.rows)
+                pairs[field][0].append(terms)
+                pairs[field][1].append(rows)
+            index.rows += len(batch)
+        for field, (terms, rows) in pairs.items():
+            if terms:
+                index._fields[field] = _postings(np.concatenate(terms), np.concatenate(rows))
+        return index
+
+    def add(self, frame):
+        """
+        Indexes the rows of frame as the rows following the ones already indexed.
+
+        Only the new rows are tokenized; the postings of the existing rows are reused.
+        """
+        for field in FIELDS:
+            new_terms, new_rows = PAIRS[field](frame, self.rows)
+            terms, offsets, rows = self._fields[field]
+            self._fields[field] = _postings(
+                np.concatenate([np.repeat(terms, np.diff(offsets)), new_terms]), np.concatenate([rows, new_rows])
+            )
+        self.rows += len(frame)
+
+    def _lookup(self, field, term):
+        terms, offsets, rows = self._fields[field]
+        key = _hash([term])[0]
+        i = np.searchsorted(terms, key)
+        if i == len(terms) or terms[i] != key:
+            return np.zeros(0, np.uint32)
+        return rows[offsets[i] : offsets[i + 1]]
+
+    def keyword(self, *words):
+        """
+        Finds the papers whose title or abstract contains every word.
+
+        Args:
+            *words (str): Words or phrases; every word of each is required.
+
+        Returns:
+            np.ndarray: The sorted positions of the matching rows.
+        """
+        import pyarrow as pa
+
+        tokens = _tokens(pa.array([str(text) for text in words], type=pa.large_string()))[0].to_pylist()
+        tokens = [token for token in tokens if token]
+        if not tokens:
+            return np.zeros(0, np.uint32)
+        postings = sorted((self._lookup("keyword", token) for token in set(tokens)), key=len)
+        rows = postings[0]
+        for other in postings[1:]:
+            rows = np.intersect1d(rows, other, assume_unique=True)
+        return rows
+
+    def author(self, name):
+        """
+        Finds the papers of an author, written as in the dataset (case and spacing do not matter).
+
+        Returns:
+            np.ndarray: The sorted positions of the matching rows.
+        """
+        return self._lookup("author", _name(name))
+
+    def journal(self, name):
+        """
+        Finds the papers published in a journal (case and spacing do not matter).
+
+        Returns:
+            np.ndarray: The sorted positions of the matching rows.
+        """
+        return self._lookup("journal", _name(name))
+
+    @classmethod
+    def load(cls, directory):
+        """
+        Opens an index written by save. The arrays are memory-mapped, not read.
+        """
+        index = cls()
+        with open(os.path.join(directory, "index.json")) as f:
+            index.rows = json.load(f)["rows"]
+        for field in FIELDS:
+            index._fields[field] = tuple(
+                np.load(os.path.join(directory, f"{field}.{part}.npy"), mmap_mode="r")
+                for part in ("terms", "offsets", "rows")
+            )
+        return index
+
+    def save(self, directory, source=None):
+        """
+        Writes the index to directory, one .npy file per array.
+
+        Args:
+            directory (str): The index directory; it is replaced.
+            source (str, optional): The indexed file. Its size and modification time are recorded,
+                so that load_index can tell when the index is out of date.
+        """
+        tmp_dir = f"{directory}.{os.getpid()}.tmp"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        for field, arrays in self._fields.items():
+            for part, array in zip(("terms", "offsets", "rows"), arrays):
+                np.save(os.path.join(tmp_dir, f"{field}.{part}.npy"), array)
+        with open(os.path.join(tmp_dir, "index.json"), "w") as f:
+            json.dump({"rows": self.rows, "source": _stamp(source) if source else None}, f)
+        shutil.rmtree(directory, ignore_errors=True)
+        os.replace(tmp_dir, directory)
+
+
+def _locate(dataset, offline=None, file_dir=state.index_dir, cache_subdir="indexes"):
+    # The file of a dataset name or a dataset file, and the directory of what is derived from it:
+    # file_dir(path) for a dataset file, <cache>/<cache_subdir>/<file name> for a published dataset
+    if isinstance(dataset, str) and os.path.exists(dataset):
+        return dataset, file_dir(dataset)
+    descriptor = get_dataset(dataset)
+    if descriptor is None:
+        raise ValueError(f'Dataset "{dataset}" is not available.')
+    path = cached_download(descriptor.url, offline=offline, sha256=descriptor.sha256)
+    return path, os.path.join(get_cache_dir(), cache_subdir, os.path.basename(path))
+
+
+def _batches(path, batch_size, wanted=TEXT_COLUMNS + AUTHOR_COLUMNS + JOURNAL_COLUMNS):
+    # The columns of the file named in wanted (case-insensitively), batch_size rows at a time
+    wanted = set(wanted)
+    if file_format(path) == "csv":
+        with pd.read_csv(path, chunksize=batch_size, dtype=str, usecols=lambda c: c.lower() in wanted) as reader:
+            yield from reader
+    else:
+        frame = read_frame(path)
+        yield frame[[column for column in frame.columns if str(column).lower() in wanted]]
+
+
+def load_index(dataset, offline=None):
+    """
+    Opens the stored index of a dataset if it is up to date with the dataset file.
+
+    Args:
+        dataset (str): A dataset name (see nbdt.registry.list_datasets) or the path of a dataset file.
+        offline (bool, optional): If True, only the cached copy of a named dataset is used.
+
+    Returns:
+        SearchIndex or None: The index, or None if it was never built or the file changed since.
+    """
+    try:
+        path, directory = _locate(dataset, offline)
+    except (ValueError, FileNotFoundError):
+        return None
+    try:
+        with open(os.path.join(directory, "index.json")) as f:
+            source = json.load(f)["source"]
+    except FileNotFoundError:
+        return None
+    if source != _stamp(path):
+        return None
+    return SearchIndex.load(directory)
+
+
+def build_index(dataset, offline=None, batch_size=BATCH_SIZE, rebuild=False):
+    """
+    Returns the keyword, author and journal index of a dataset, building it on first use.
+
+    The index of a published dataset is stored in the local cache next to the downloaded
+    file and rebuilt when the file changes. The index of a dataset file, e.g. the
+    destination_path of update_dataset, is stored in <path>.index; incremental updates
+    (update_dataset with incremental=True) add the appended papers to it.
+
+        index = build_index("medline_large")
+        df = load_dataset("medline_large")
+        df.iloc[index.keyword("dopamine receptor")]
+        df.iloc[index.author("Doe J")]
+        df.iloc[index.journal("Neuron")]
+
+    Args:
+        dataset (str): A dataset name (see nbdt.registry.list_datasets) or the path of a dataset file.
+        offline (bool, optional): If True, only the cached copy of a named dataset is used.
+        batch_size (int, optional): Rows read at a time while building. Defaults to 100000.
+        rebuild (bool, optional): Build the index even if an up-to-date one is stored. Defaults to False.
+
+    Returns:
+        SearchIndex: The index.
+    """
+    if not rebuild:
+        index = load_index(dataset, offline)
+        if index is not None:
+            return index
+
+    path, directory = _locate(dataset, offline)
+    print(f"Indexing {dataset}...")
+    with events.timed("index", dataset=dataset) as fields:
+        index = SearchIndex.from_batches(_batches(path, batch_size))
+        fields["rows"] = len(index)
+    os.makedirs(os.path.dirname(os.path.abspath(directory)), exist_ok=True)
+    index.save(directory, path)
+    return index
@@ -0,0 +1,61 @@
+import json
+import os
+import shutil
+import tempfile
+
+
+class PageSpool:
+    """
+    Stores fetched pages on disk as they arrive, one JSON-lines file per page.
+
+    A page file only appears once it is completely written, so the files also serve as
+    checkpoints of a collection run. Without a directory, a private temporary directory
+    is created for the run and removed by remove().
+
+    Args:
+        directory (str, optional): Directory holding the pages. Defaults to a new temporary directory.
+    """
+
+    def __init__(self, directory=None):
+        if directory is None:
+            directory = tempfile.mkdtemp(prefix="nbdt-pages-")
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+
+    def _page_files(self):
+        return sorted(
+            name for name in os.listdir(self.directory) if name.startswith("page-") and name.endswith(".jsonl")
+        )
+
+    def __len__(self):
+        return len(self._page_files())
+
+    def add(self, records):
+        """
+        Writes the records of one page to a new page file.
+
+        Args:
+            records (list): The raw records of the page.
+        """
+        path = os.path.join(self.directory, f"page-{len(self):06d}.jsonl")
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            for record in records:
+                f.write(json.dumps(record, default=str) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    def pages(self):
+        """
+        Yields the records of every stored page, one page at a time and in order.
+        """
+        for name in self._page_files():
+            with open(os.path.join(self.directory, name)) as f:
+                yield [json.loads(line) for line in f if line.strip()]
+
+    def remove(self):
+        """
+        Deletes the directory and every page in it.
+        """
+        shutil.rmtree(self.directory, ignore_errors=True)
@@ -0,0 +1,73 @@
+import json
+import os
+import tempfile
+
+
+def state_path(destination_path):
+    """
+    Returns the path of the state file kept next to an incrementally updated dataset.
+    """
+    return destination_path + ".state.json"
+
+
+def pages_dir(destination_path):
+    """
+    Returns the directory holding the pages fetched by an unfinished run, see nbdt.spool.PageSpool.
+    """
+    return destination_path + ".pages"
+
+
+def dedup_path(destination_path):
+    """
+    Returns the path of the nbdt.dedup.DedupIndex of the papers stored in an incrementally updated dataset.
+    """
+    return destination_path + ".dedup.npz"
+
+
+def index_dir(destination_path):
+    """
+    Returns the directory holding the nbdt.search.SearchIndex of a dataset file.
+    """
+    return destination_path + ".index"
+
+
+def features_dir(destination_path):
+    """
+    Returns the directory holding the nbdt.features.FeatureStore of a dataset file.
+    """
+    return destination_path + ".features"
+
+
+def load_state(destination_path):
+    """
+    Reads the update state of the dataset at destination_path.
+
+    The state records the dataset name, the last date collected ("last_date"), and for an
+    unfinished run its date window and the cursor of its last completed page.
+
+    Args:
+        destination_path (str): The path of the dataset.
+
+    Returns:
+        dict or None: The state, or None if the dataset was never updated incrementally.
+    """
+    try:
+        with open(state_path(destination_path)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def save_state(destination_path, state):
+    """
+    Atomically writes the update state of the dataset at destination_path.
+
+    Args:
+        destination_path (str): The path of the dataset.
+        state (dict): The state to store.
+    """
+    path = state_path(destination_path)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix=".tmp")
+    with os.fdopen(fd, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
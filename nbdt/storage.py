@@ -0,0 +1,273 @@
+import os
+import time
+
+import pandas as pd
+
+from . import events
+from .cache import cached_download, get_cache_dir
+
+COLUMNAR_FORMATS = {".parquet": "parquet", ".feather": "feather", ".arrow": "feather"}
+
+# Extension of the columnar copies made by columnar_path. "arrow" files are uncompressed
+# Arrow IPC files, which read_mapped can map into memory without copying.
+EXTENSIONS = {"parquet": ".parquet", "feather": ".feather", "arrow": ".arrow"}
+
+# Rows per Parquet row group; small enough for year predicates to skip most of a file
+ROW_GROUP_SIZE = 50000
+
+
+def file_format(path):
+    """
+    Returns the storage format implied by the extension of path ("csv", "parquet" or "feather").
+    """
+    return COLUMNAR_FORMATS.get(os.path.splitext(path)[1].lower(), "csv")
+
+
+def write_frame(dataframe, path):
+    """
+    Writes dataframe to path in the format given by its extension (.csv, .parquet, .feather or .arrow).
+
+    .arrow files are written uncompressed, so that they can be memory-mapped (see read_mapped).
+
+    Args:
+        dataframe (pd.DataFrame): The data to write.
+        path (str): The destination file path.
+    """
+    fmt = file_format(path)
+    with events.timed("write", path=path, rows=len(dataframe)):
+        if fmt == "parquet":
+            dataframe.to_parquet(path, index=False, row_group_size=ROW_GROUP_SIZE)
+        elif fmt == "feather":
+            compression = "uncompressed" if path.lower().endswith(".arrow") else None
+            dataframe.reset_index(drop=True).to_feather(path, compression=compression)
+        else:
+            dataframe.to_csv(path, index=False)
+
+
+def append_frame(dataframe, path):
+    """
+    Appends the rows of dataframe to the file at path, creating it if needed.
+
+    CSV files are appended in place, at a cost proportional to the new rows. Parquet and
+    Feather files cannot be appended to: they are read and rewritten to a temporary file that
+    then replaces them, so they are never left half written, but every append costs as much
+    as writing the whole file. CSV is therefore the format for files appended to often, such
+    as the destination of incremental updates; convert them once they are complete.
+
+    Args:
+        dataframe (pd.DataFrame): The rows to append.
+        path (str): The file path.
+    """
+    if not os.path.exists(path):
+        write_frame(dataframe, path)
+    elif file_format(path) == "csv":
+        with events.timed("write", path=path, rows=len(dataframe)):
+            dataframe.to_csv(path, mode="a", header=False, index=False)
+    else:
+        root, extension = os.path.splitext(path)
+        tmp_path = f"{root}.{os.getpid()}.tmp{extension}"
+        write_frame(pd.concat([read_frame(path), dataframe], ignore_index=True), tmp_path)
+        os.replace(tmp_path, path)
+
+
+def write_batches(batches, path):
+    """
+    Writes DataFrames one after the other to a single file, holding only one of them in memory.
+
+    CSV files are appended to batch by batch, Parquet files get one row group per batch and
+    Feather/Arrow files one record batch per batch. Every batch must have the columns of the first.
+
+    Args:
+        batches (iterable): The DataFrames.
+        path (str): The destination file path; its extension gives the format as in write_frame.
+
+    Returns:
+        int: The number of rows written.
+    """
+    fmt = file_format(path)
+    rows = 0
+    started = False
+    writer = None
+    timer = time.perf_counter()
+    try:
+        for batch in batches:
+            if fmt == "csv":
+                batch.to_csv(path, index=False, header=not started, mode="a" if started else "w")
+            else:
+                import pyarrow as pa
+
+                if writer is None:
+                    schema = pa.Schema.from_pandas(batch, preserve_index=False)
+                    if fmt == "parquet":
+                        import pyarrow.parquet as pq
+
+                        writer = pq.ParquetWriter(path, schema)
+                    else:
+                        # Same compression as write_frame: none for .arrow, LZ4 for .feather
+                        compression = None if path.lower().endswith(".arrow") else "lz4"
+                        writer = pa.ipc.new_file(path, schema, options=pa.ipc.IpcWriteOptions(compression=compression))
+                table = pa.Table.from_pandas(batch, schema=schema, preserve_index=False)
+                if fmt == "parquet":
+                    writer.write_table(table, row_group_size=ROW_GROUP_SIZE)
+                else:
+                    writer.write_table(table)
+            started = True
+            rows += len(batch)
+    finally:
+        if writer is not None:
+            writer.close()
+    if not started:
+        write_frame(pd.DataFrame(), path)
+    else:
+        events.emit("write", path=path, rows=rows, seconds=time.perf_counter() - timer)
+    return rows
+
+def read_frame(path, columns=None):
+    """
+    Reads a file written by write_frame.
+
+    Args:
+        path (str): The file path.
+        columns (list, optional): Only read these columns. Defaults to None.
+
+    Returns:
+        pd.DataFrame: The file content.
+    """
+    fmt = file_format(path)
+    if fmt == "parquet":
+        return pd.read_parquet(path, columns=columns)
+    elif fmt == "feather":
+        return pd.read_feather(path, columns=columns)
+    return pd.read_csv(path, usecols=columns)
+
+
+def columnar_path(dataset_url, normalize=None, fmt="parquet", offline=None, dtype=None, sha256=None):
+    """
+    Returns the path of a columnar copy of the CSV at dataset_url, converting it on first use.
+
+    The copy is named after the digest of the cached CSV, so it is rebuilt whenever the
+    source file changes. If normalize is given, it is applied to the CSV before writing;
+    when it adds a "Year" column the rows are ordered by it, so that year filters can
+    skip row groups.
+
+    Args:
+        dataset_url (str): The URL of the source CSV.
+        normalize (callable, optional): Maps the CSV DataFrame to the DataFrame to store, e.g. adding "Year" and "Month" columns.
+        fmt (str, optional): "parquet", "feather" or "arrow". Defaults to "parquet".
+        offline (bool, optional): If True, only the cached copy of the CSV is used.
+        dtype (dict or type, optional): The dtypes of the CSV columns. Defaults to None, which infers them.
+        sha256 (str, optional): The expected digest of the CSV, see nbdt.cache.cached_download.
+
+    Returns:
+        str: The path of the columnar file.
+    """
+    csv_path = cached_download(dataset_url, offline=offline, sha256=sha256)
+    extension = EXTENSIONS[fmt]
+    columnar_dir = os.path.join(get_cache_dir(), "columnar")
+    os.makedirs(columnar_dir, exist_ok=True)
+    path = os.path.join(columnar_dir, os.path.basename(csv_path) + extension)
+
+    if not os.path.exists(path):
+        print(f"Converting {dataset_url} to {fmt}...")
+        with events.timed("convert", url=dataset_url, format=fmt) as fields:
+            dataframe = pd.read_csv(csv_path, dtype=dtype)
+            if normalize is not None:
+                dataframe = normalize(dataframe)
+            if "Year" in dataframe:
+                dataframe = dataframe.sort_values("Year", kind="stable")
+            # Several processes may convert the same file at once; each writes its own copy
+            tmp_path = f"{path}.{os.getpid()}.tmp{extension}"
+            write_frame(dataframe, tmp_path)
+            os.replace(tmp_path, path)
+            fields["rows"] = len(dataframe)
+
+    return path
+
+
+def read_columnar(path, columns=None, start_year=None, end_year=None):
+    """
+    Reads a columnar file, pushing the column selection and the year range down to the reader.
+
+    For Parquet files the year range is applied as a row-group predicate on the "Year" column.
+
+    Args:
+        path (str): The path of a file returned by columnar_path.
+        columns (list, optional): Only read these columns. Defaults to None.
+        start_year (int, optional): Only keep rows from this year on. Defaults to None.
+        end_year (int, optional): Only keep rows up to this year. Defaults to None.
+
+    Returns:
+        pd.DataFrame: The selected rows and columns.
+    """
+    filters = []
+    if start_year is not None:
+        filters.append(("Year", ">=", start_year))
+    if end_year is not None:
+        filters.append(("Year", "<=", end_year))
+
+    if file_format(path) == "parquet":
+        return pd.read_parquet(path, columns=columns, filters=filters or None)
+
+    import pyarrow.compute as pc
+    import pyarrow.feather as feather
+
+    table = feather.read_table(path, memory_map=True)
+    if filters:
+        mask = None
+        for column, op, value in filters:
+            condition = pc.greater_equal(table[column], value) if op == ">=" else pc.less_equal(table[column], value)
+            mask = condition if mask is None else pc.and_(mask, condition)
+        table = table.filter(mask)
+    if columns is not None:
+        table = table.select(columns)
+    return table.to_pandas()
+
+
+def read_mapped(path, columns=None, start_year=None, end_year=None):
+    """
+    Opens an uncompressed Arrow IPC file (see columnar_path with fmt="arrow") without copying it.
+
+    The file is memory-mapped and the DataFrame columns are backed by the mapped Arrow
+    buffers (pd.ArrowDtype), so processes opening the same file share its pages in the
+    operating system's page cache instead of each holding a copy. Because the rows are
+    ordered by "Year", a year range is a contiguous slice and is selected without copying either.
+
+    Args:
+        path (str): The path of the .arrow file.
+        columns (list, optional): Only keep these columns. Defaults to None.
+        start_year (int, optional): Only keep rows from this year on. Defaults to None.
+        end_year (int, optional): Only keep rows up to this year. Defaults to None.
+
+    Returns:
+        pd.DataFrame: The selected rows and columns.
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    with pa.memory_map(path) as source:
+        table = pa.ipc.open_file(source).read_all()
+
+    if start_year is not None or end_year is not None:
+        years = table["Year"]
+        start = 0 if start_year is None else pc.sum(pc.less(years, start_year)).as_py() or 0
+        stop = len(table) - pc.sum(pc.is_null(years)).as_py()
+        if end_year is not None:
+            stop = pc.sum(pc.less_equal(years, end_year)).as_py() or 0
+        table = table.slice(start, max(stop - start, 0))
+    if columns is not None:
+        table = table.select(columns)
+    return table.to_pandas(types_mapper=pd.ArrowDtype)
+
+
+def year_range(path):
+    """
+    Returns the first and last value of the "Year" column of a columnar file.
+
+    Args:
+        path (str): The path of a file returned by columnar_path.
+
+    Returns:
+        tuple: The minimum and maximum year.
+    """
+    years = read_columnar(path, ["Year"])["Year"]
+    return years.min(), years.max()
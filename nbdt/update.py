@@ -1,180 +1,384 @@
 from dateutil import parser
-from datetime import timedelta
+from dateutil.relativedelta import relativedelta
+import datetime
 import requests
 import json
+import os
+import io
+import urllib.parse
 import pandas as pd
 import csv
-import urllib.request
-import io
+import functools
+import itertools
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+from . import dedup, events, features, search, state
+from .datasets import iter_dataset
+from .registry import HF_BASE_URL, Dataset, get_dataset
+from .fetch import get_json, iter_json_pages, make_session, RateLimiter
+from .spool import PageSpool
+from .storage import append_frame, file_format, read_frame, write_batches, write_frame
+
+BIORXIV_API_URL = os.environ.get("NBDT_BIORXIV_API_URL", "https://api.biorxiv.org")
+# Records returned per bioRxiv details request
+BIORXIV_PAGE_SIZE = 100
+
+PLOS_API_URL = os.environ.get("NBDT_PLOS_API_URL", "http://api.plos.org")
+PLOS_PAGE_SIZE = 100
+# Result counts above which start/rows paging gets slow and cursorMark is used instead
+PLOS_DEEP_PAGING_THRESHOLD = 10000
+
+ARXIV_PAGE_SIZE = 100
+# Pause between arXiv API requests required by the arXiv API terms of use
+ARXIV_DELAY_SECONDS = 3.0
+
+BIORXIV_COLUMNS = ["doi", "title", "abstract", "authors", "author_corresponding", "date", "jatsxml"]
+ARXIV_COLUMNS = ["id", "submitter", "authors", "title", "categories", "abstract", "versions", "update_date"]
+
+# Start date used when none is given and the dataset has no update state yet
+DEFAULT_START_DATES = {"bioarxiv": "2023-01-01", "plos_one": "2023-05-31", "arxiv": "2023-05-31"}
+
+# Column identifying a paper in the collected data of each source
+ID_COLUMNS = {"bioarxiv": "ID", "plos_one": "ID", "arxiv": "id"}
+
+# Published datasets extended by update=True, and the renames giving them the columns of the collected papers
+SOURCE_DATASETS = {
+    "bioarxiv": Dataset(
+        "bioarxiv",
+        f"{HF_BASE_URL}/bioarxiv_final.csv",
+        date_column="date",
+        columns=["doi", "title", "abstract", "authors", "author_corresponding", "date", "jatsxml"],
+    ),
+    "plos_one": Dataset(
+        "plos_one",
+        f"{HF_BASE_URL}/plos_one_final2.csv",
+        date_column="Accepted_Date",
+        columns=["ID", "Title", "Author", "Abstract", "Journal", "Subject", "Accepted_Date"],
+    ),
+    "arxiv": Dataset("arxiv", f"{HF_BASE_URL}/arxiv2.csv", date_column="update_date", columns=ARXIV_COLUMNS),
+}
+SOURCE_RENAMES = {
+    "bioarxiv": {"doi": "ID", "jatsxml": "URL"},
+    "plos_one": {
+        "Title": "title",
+        "Author": "author",
+        "Abstract": "abstract",
+        "Journal": "journal",
+        "Subject": "subject",
+        "Accepted_Date": "date",
+    },
+    "arxiv": {},
+}
+# Rows of the published datasets read at a time when merging them with new papers
+SOURCE_BATCH_SIZE = 100000
+
+# Default number of pages fetched at the same time, and requests per second allowed per host
+MAX_WORKERS = 8
+RATE_LIMIT = 10
+
+# Concurrency and rate limits of each source when they are updated together by update_all.
+# arXiv is always fetched sequentially, ARXIV_DELAY_SECONDS apart.
+SOURCE_LIMITS = {
+    "bioarxiv": {"max_workers": MAX_WORKERS, "rate_limit": RATE_LIMIT},
+    "plos_one": {"max_workers": MAX_WORKERS, "rate_limit": RATE_LIMIT},
+    "arxiv": {},
+}
+
+
+def _parse_date(text):
+    # ISO dates ("2023-08-20") are read as they are, other formats day first ("08-2023" is 2023-08-01)
+    try:
+        return datetime.date.fromisoformat(text)
+    except ValueError:
+        first = datetime.datetime.combine(datetime.date.today().replace(day=1), datetime.time())
+        return parser.parse(text, dayfirst=True, default=first).date()
+
+
+def _month_end(day):
+    return day + relativedelta(day=31)
 
 
 def update_dataset(
-    dataset_name, end_date, destination_path, start_date=None, update=False
+    dataset_name,
+    end_date,
+    destination_path,
+    start_date=None,
+    update=False,
+    max_workers=MAX_WORKERS,
+    rate_limit=RATE_LIMIT,
+    incremental=False,
+    near_duplicates=False,
 ):
     """
     Update the dataset with new papers from the specified source.
 
     Args:
-        dataset_name (str): Name of the dataset.
+        dataset_name (str): Name of the dataset. Datasets whose descriptor has an update_source (see nbdt.registry) can be updated.
         end_date (str): End date for collecting papers in the format "yyyy-mm-dd".
-        destination_path (str): File path to store the updated dataset.
+        destination_path (str): File path to store the updated dataset. A .parquet or .feather extension writes that format instead of CSV.
         start_date (str, optional): The start date for collecting papers in the format "yyyy-mm-dd". The default is None.
         update (bool, optional): Flag indicating whether to update the source dataset. The default is False.
+        max_workers (int, optional): Maximum number of API pages fetched at the same time. The default is 8.
+        rate_limit (float, optional): Maximum API requests per second. The default is 10.
+        incremental (bool, optional): Only collect the papers published since the last incremental run and append them to destination_path. The default is False.
+            Without it, end_date and start_date are moved to the last day of their month; with it, papers are collected up to end_date itself (or today, if end_date is later).
+        near_duplicates (bool, optional): Also treat near-duplicate abstracts as duplicates (see nbdt.dedup.DedupIndex): with update=True a new paper replaces the published ones it nearly duplicates, and with incremental=True near-duplicates of stored papers are not appended. The default is False.
+
+    Returns:
+        bool: True if the dataset was updated, False if the arguments are invalid or an API request failed.
+
+    Raises:
+        Exception: Any other error, e.g. a disk error while writing destination_path.
     """
+    started = time.monotonic()
+    ok = False
     try:
         if update != False and update != True:
             raise ValueError("update should be either True or False (by default it is False)")
 
-        date_obj = parser.parse(end_date, dayfirst=True)
-        last_day = date_obj.replace(day=1, month=date_obj.month + 1) - timedelta(days=1)
-        c_date = last_day.strftime("%Y-%m-%d")
-
-        if start_date is not None:
-            date_obj2 = parser.parse(start_date, dayfirst=True)
-            last_day2 = date_obj2.replace(day=1, month=date_obj2.month + 1) - timedelta(days=1)
-            c_date2 = last_day2.strftime("%Y-%m-%d")
-
-        if dataset_name == "bioarxiv":
-            if start_date is None:
-                bioarxiv(c_date, destination_path, update)
-            else:
-                bioarxiv(c_date, destination_path, update, c_date2)
-
-        elif dataset_name == "plos_one":
-            if start_date is None:
-                plos_one(c_date, destination_path, update)
-            else:
-                plos_one(c_date, destination_path, update, c_date2)
+        if incremental:
+            # The end of the window becomes the start of the next run, so it is the day
+            # requested (never a day still to come) rather than the end of its month
+            c_date = min(_parse_date(end_date), datetime.date.today()).isoformat()
+            if start_date is not None:
+                c_date2 = _parse_date(start_date).isoformat()
+        else:
+            c_date = _month_end(_parse_date(end_date)).isoformat()
+            if start_date is not None:
+                c_date2 = _month_end(_parse_date(start_date)).isoformat()
 
-        elif dataset_name == "arxiv":
-            if start_date is None:
-                arxiv(c_date, destination_path, update)
-            else:
-                arxiv(c_date, destination_path, update, c_date2)
+        dataset = get_dataset(dataset_name)
+        if dataset is None or dataset.update_source is None:
+            raise ValueError("The given dataset is not available! Check Documentation")
+        source = dataset.update_source
+
+        if incremental:
+            ok = incremental_update(
+                source,
+                c_date,
+                destination_path,
+                c_date2 if start_date is not None else None,
+                update,
+                max_workers,
+                rate_limit,
+                near_duplicates,
+            )
+            return ok
 
+        collector = {"bioarxiv": bioarxiv, "plos_one": plos_one, "arxiv": arxiv}[source]
+        # arXiv is queried sequentially, ARXIV_DELAY_SECONDS apart
+        limits = {} if source == "arxiv" else {"max_workers": max_workers, "rate_limit": rate_limit}
+        if start_date is None:
+            ok = collector(c_date, destination_path, update, near_duplicates=near_duplicates, **limits)
         else:
-            raise ValueError("The given dataset is not available! Check Documentation")
+            ok = collector(c_date, destination_path, update, c_date2, near_duplicates=near_duplicates, **limits)
+        return ok
 
+    # Invalid arguments and failing APIs are reported; any other exception is a bug and is raised
     except ValueError as ve:
         print("ValueError:", ve)
-        # Handle the ValueError appropriately (e.g., logging, user notification, etc.)
+        events.error(dataset_name, ve)
+        return False
 
     except requests.exceptions.RequestException as re:
         print("Error making requests:", re)
-        # Handle the requests exception appropriately (e.g., logging, user notification, etc.)
+        events.error(dataset_name, re)
+        return False
 
     except json.JSONDecodeError as je:
         print("Error decoding JSON response:", je)
-        # Handle the JSON decode error appropriately (e.g., logging, user notification, etc.)
+        events.error(dataset_name, je)
+        return False
+
+    finally:
+        events.emit("update", dataset=dataset_name, ok=bool(ok), seconds=time.monotonic() - started)
 
-    except Exception as e:
-        print(f"An unexpected error occurred: {e}")
-        # Handle the unexpected error appropriately (e.g., logging, user notification, etc.)
 
 
-def bioarxiv(a1, d1, update, b1="2023-01-01"):
+def update_all(
+    end_date,
+    destination_paths,
+    start_date=None,
+    update=False,
+    incremental=False,
+    source_limits=None,
+    max_parallel=None,
+    near_duplicates=False,
+):
+    """
+    Update several datasets at the same time, one thread per source.
+
+    Each source keeps its own connection pool and rate limit (see SOURCE_LIMITS), so a slow
+    or failing API does not hold back the others. A source that fails is reported and the
+    remaining sources still complete.
+
+    Args:
+        end_date (str): End date for collecting papers in the format "yyyy-mm-dd".
+        destination_paths (dict): File path of every dataset to update, e.g. {"arxiv": "arxiv.csv", "plos_one": "plos.parquet"}.
+        start_date (str, optional): The start date for collecting papers in the format "yyyy-mm-dd". The default is None.
+        update (bool, optional): Flag indicating whether to update the source datasets. The default is False.
+        incremental (bool, optional): Append only the papers published since the last incremental run. The default is False.
+        source_limits (dict, optional): Overrides of SOURCE_LIMITS per source, e.g. {"plos_one": {"max_workers": 4, "rate_limit": 5}}.
+        max_parallel (int, optional): Maximum number of datasets updated at the same time. Defaults to all of them.
+        near_duplicates (bool, optional): Also drop near-duplicate abstracts, see update_dataset. The default is False.
+
+    Returns:
+        dict: For every dataset, whether the update succeeded ("ok") and how long it took ("seconds").
+    """
+    limits = {}
+    for name in destination_paths:
+        dataset = get_dataset(name)
+        limits[name] = dict(SOURCE_LIMITS.get(dataset.update_source if dataset else None, {}))
+    for name, overrides in (source_limits or {}).items():
+        if name in limits:
+            limits[name].update(overrides)
+
+    def run(name):
+        print(f"[{name}] Update started.")
+        started = time.monotonic()
+        try:
+            ok = update_dataset(
+                name,
+                end_date,
+                destination_paths[name],
+                start_date,
+                update,
+                incremental=incremental,
+                near_duplicates=near_duplicates,
+                **limits[name],
+            )
+        except Exception as e:
+            # One failing source must not stop the others; the traceback is kept in an "error" event
+            print(f"[{name}] An unexpected error occurred: {type(e).__name__}: {e}")
+            traceback.print_exc()
+            events.error(name, e)
+            ok = False
+        seconds = time.monotonic() - started
+        print(f"[{name}] Update {'finished' if ok else 'failed'} in {seconds:.1f} s.")
+        return {"ok": bool(ok), "seconds": seconds}
+
+    if not destination_paths:
+        return {}
+    with ThreadPoolExecutor(max_workers=max_parallel or len(destination_paths)) as executor:
+        futures = {name: executor.submit(run, name) for name in destination_paths}
+    results = {name: future.result() for name, future in futures.items()}
+
+    failed = [name for name, result in results.items() if not result["ok"]]
+    if failed:
+        print(f"The update of {', '.join(failed)} failed.")
+    return results
+
+
+def bioarxiv(a1, d1, update, b1="2023-01-01", max_workers=MAX_WORKERS, rate_limit=RATE_LIMIT, near_duplicates=False):
     """
     Collect papers from the bioarxiv source and update the dataset.
 
+    The pages are fetched concurrently, see _bioarxiv_pages.
+
     Args:
         a1 (str): End date for collecting papers.
         d1 (str): File path to store the updated dataset.
         update (bool): Flag indicating whether to update the source dataset.
         b1 (str, optional): Start date for collecting papers. Default is '2023-01-01'.
+        max_workers (int, optional): Maximum number of pages fetched at the same time. Default is 8.
+        rate_limit (float, optional): Maximum requests per second to the API. Default is 10.
+        near_duplicates (bool, optional): With update, also replace the papers whose abstract is a near-duplicate of a new one. Default is False.
     """
+    spool = PageSpool()
     try:
-        dataset_url = "https://huggingface.co/datasets/PenguinMan/ARXIV/resolve/main/bioarxiv_final.csv"
-        url = "https://api.biorxiv.org/details/biorxiv/{}/{}/{}/json?category=neuroscience".format(
-            b1, a1, "{}"
-        )
-        results1 = requests.get(url.format(0)).json()
-        total = results1["messages"][0]["total"]
-
-        print("Total number of papers:", total)
-        if total < 100:
-            print("Collecting Papers... Estimated Time: ~3 mins")
-        elif total >= 100 and total <= 10000:
-            print("Collecting Papers... Estimated Time: ~6 mins")
-        elif total > 10000:
-            print("Collecting Papers... Estimated Time: 10 mins to 30 mins")
-        elif total >= 50000:
-            print("Collecting Papers... Estimated Time: 30 mins to 1 hr")
-
-        if total >= 100:
-            url = "https://api.biorxiv.org/details/biorxiv/{}/{}/{}/json?category=neuroscience".format(
-                b1, a1, "{}"
-            )
-            articles1 = []
-            cursor = 0
-            count = 0
-            while len(results1["collection"]) != 0:
-                results1 = requests.get(url.format(cursor)).json()
-                articles1 += results1["collection"]
-                count += len(results1["collection"])
-                cursor += 100
-
-            with open("neuroscience_articles_1.json", "w") as f:
-                json.dump(articles1, f)
-
-        one = pd.read_json("neuroscience_articles_1.json")
-        neuro = one[one.category == "neuroscience"]
-        neuro_2 = neuro[
-            [
-                "doi",
-                "title",
-                "abstract",
-                "authors",
-                "author_corresponding",
-                "date",
-                "jatsxml",
-            ]
-        ].rename(columns={"doi": "ID", "jatsxml": "URL"})
-        neuro_3 = neuro_2.drop_duplicates(subset=["abstract"], keep="last")
+        for cursor, collection in _bioarxiv_pages(b1, a1, max_workers, rate_limit):
+            spool.add(collection)
+
+        neuro_3 = _collected_frame("bioarxiv", spool, b1, a1)
         print("Total number of papers collected:", neuro_3.shape[0])
 
         if not update:
-            neuro_3.to_csv(d1, index=False)
+            write_frame(neuro_3, d1)
             print("Updated papers stored as: ", d1)
 
         if update:
             print("Updating source dataset...")
-            response = urllib.request.urlopen(dataset_url)
-            dataset_content = response.read().decode("utf-8")
-            dataset_dataframe = pd.read_csv(io.StringIO(dataset_content))
-            new = dataset_dataframe[
-                [
-                    "doi",
-                    "title",
-                    "abstract",
-                    "authors",
-                    "author_corresponding",
-                    "date",
-                    "jatsxml",
-                ]
-            ].rename(columns={"doi": "ID", "jatsxml": "URL"})
-
-            combined_dataset = pd.concat([new, neuro_3], ignore_index=True)
-            combined_dataset2 = combined_dataset.drop_duplicates(
-                subset=["abstract"], keep="last"
-            )
-
-            combined_dataset2.to_csv(d1, index=False)
+            _merge_source("bioarxiv", neuro_3, d1, near_duplicates=near_duplicates)
             print("Source dataset updated!")
 
+        return True
+
     except requests.exceptions.RequestException as re:
         print("Error making requests:", re)
-        # Handle the requests exception appropriately (e.g., logging, user notification, etc.)
+        events.error("bioarxiv", re)
+        return False
 
     except json.JSONDecodeError as je:
         print("Error decoding JSON response:", je)
-        # Handle the JSON decode error appropriately (e.g., logging, user notification, etc.)
+        events.error("bioarxiv", je)
+        return False
+
+    finally:
+        spool.remove()
 
-    except Exception as e:
-        print(f"An unexpected error occurred: {e}")
-        # Handle the unexpected error appropriately (e.g., logging, user notification, etc.)
 
+def _bioarxiv_pages(b1, a1, max_workers=MAX_WORKERS, rate_limit=RATE_LIMIT, resume_cursor=None):
+    """
+    Yields (cursor, records) for every page of bioRxiv neuroscience papers between b1 and a1, in order.
 
-def plos_one(c_date, destination_path, update, b2="2023-05-31"):
+    The first request returns the total number of papers, so every other cursor offset
+    is known up front and the remaining pages are fetched concurrently. With resume_cursor,
+    the pages up to and including that cursor are skipped.
+    """
+    url = BIORXIV_API_URL + "/details/biorxiv/{}/{}/{}/json?category=neuroscience".format(
+        b1, a1, "{}"
+    )
+    session = make_session(pool_size=max_workers)
+    results1 = get_json(session, url.format(0), RateLimiter(rate_limit))
+    total = results1["messages"][0]["total"]
+    cursors = range(BIORXIV_PAGE_SIZE, total, BIORXIV_PAGE_SIZE)
+
+    print("Total number of papers:", total)
+    print(f"Collecting Papers... {len(cursors) + 1} pages, {max_workers} at a time")
+
+    if resume_cursor is None:
+        first = [(0, results1["collection"])]
+    else:
+        first = []
+        cursors = range(resume_cursor + BIORXIV_PAGE_SIZE, total, BIORXIV_PAGE_SIZE)
+    pages = iter_json_pages(
+        session, [url.format(cursor) for cursor in cursors], max_workers, rate_limit
+    )
+    rest = ((cursor, page["collection"]) for cursor, page in zip(cursors, pages))
+    yield from events.track_pages("bioarxiv", itertools.chain(first, rest), len(first) + len(cursors))
+
+
+def _bioarxiv_frame(one):
+    """
+    Keeps the neuroscience papers of a DataFrame of raw bioRxiv records and renames their columns.
+    """
+    neuro = one[one.category == "neuroscience"]
+    neuro_2 = neuro[
+        [
+            "doi",
+            "title",
+            "abstract",
+            "authors",
+            "author_corresponding",
+            "date",
+            "jatsxml",
+        ]
+    ].rename(columns={"doi": "ID", "jatsxml": "URL"})
+    return dedup.drop_duplicates(neuro_2, "abstract", "ID")
+
+
+def plos_one(
+    c_date,
+    destination_path,
+    update,
+    b2="2023-05-31",
+    max_workers=MAX_WORKERS,
+    rate_limit=RATE_LIMIT,
+    paging=None,
+    near_duplicates=False,
+):
     """
     Collects articles from the PLOS ONE journal in the field of neuroscience within a specified date range.
 
@@ -183,133 +387,150 @@ def plos_one(c_date, destination_path, update, b2="2023-05-31"):
         destination_path (str): The file path to store the collected data.
         update (bool): Whether to update an existing dataset or create a new one.
         b2 (str, optional): The start date of the date range in the format 'YYYY-MM-DD'. Default is '2023-05-31'.
+        max_workers (int, optional): Maximum number of pages fetched at the same time. Default is 8.
+        rate_limit (float, optional): Maximum requests per second to the API. Default is 10.
+        paging (str, optional): "start" to fetch start/rows pages concurrently, or "cursor" for Solr
+            cursorMark deep paging. By default "cursor" is used above PLOS_DEEP_PAGING_THRESHOLD results.
+        near_duplicates (bool, optional): With update, also replace the papers whose abstract is a near-duplicate of a new one. Default is False.
     """
+    spool = PageSpool()
     try:
-        query = "neuroscience"
-        fields = "title,author,abstract,journal,subject_facet,publication_date"
-        filter = 'publication_date:[2019-01-01T00:00:00Z TO 2023-12-31T23:59:59Z], subject_facet:"/Neuroscience/"'
-        n_filter = filter.replace("2019-01-01T00:00:00Z", f"{b2}T00:00:00Z").replace(
-            "2023-12-31T23:59:59Z", f"{c_date}T23:59:59Z"
-        )
-        start = 0
-        rows = 100
-
-        # Construct the query URL
-        url = f"http://api.plos.org/search?q={query}&fl={fields}&fq={n_filter}&start={start}&rows={rows}"
-
-        # Send the request and get the response
-        response = requests.get(url)
-
-        # Check if the response is successful
-        if response.status_code == 200:
-            # Parse the response as JSON
-            data = response.json()
-            num = data["response"]["numFound"]
-            if num < 100:
-                print("Collecting Papers........ Est time: ~10 seconds")
-            elif num > 100 and num <= 10000:
-                print("Collecting Papers........ Est time: ~2 mins")
-            elif num > 10000:
-                print("Collecting Papers........ Est time: ~5 mins")
-        else:
-            # Print an error message
-            print(f"Request failed with status code {response.status_code}")
-
-        articles = []  # Define an empty list to store articles
-
-        for i in range(0, num, 100):
-            # Define the query parameters
-            query = "neuroscience"
-            fields = "title,author,abstract,journal,subject_facet,accepted_date,id"
-            filter2 = n_filter
-            start = i
-            rows = 100
-
-            # Construct the query URL
-            url2 = f"http://api.plos.org/search?q={query}&fl={fields}&fq={filter}&start={start}&rows={rows}"
-
-            # Send the request and get the response
-            response = requests.get(url2)
-
-            # Check if the response is successful
-            if response.status_code == 200:
-                # Parse the response as JSON
-                data = response.json()
-
-                # Append the articles from this page to the list
-                articles.extend(data["response"]["docs"])
-            else:
-                # Print an error message
-                print(f"Request failed with status code {response.status_code}")
-
-        with open("neuroscience_articles.csv", mode="w", newline="") as file:
-            # Create a CSV writer
-            writer = csv.writer(file)
-
-            # Write the header row
-            writer.writerow(
-                ["ID", "title", "author", "abstract", "journal", "subject", "date"]
-            )
+        for cursor, docs in _plos_pages(b2, c_date, max_workers, rate_limit, paging):
+            spool.add(docs)
 
-            # Loop over the articles and write the data to the CSV file
-            for article in articles:
-                writer.writerow(
-                    [
-                        article.get("id", ""),
-                        article.get("title", ""),
-                        article.get("author", ""),
-                        article.get("abstract", ""),
-                        article.get("journal", ""),
-                        article.get("subject_facet", ""),
-                        article.get("accepted_date", ""),
-                    ]
-                )
-
-        plos_one_update = pd.read_csv("neuroscience_articles.csv")
-
-        plos_one_update2 = plos_one_update.drop_duplicates(subset=["abstract"], keep="last")
-        plos_one_update3 = plos_one_update2.dropna()
+        plos_one_update3 = _collected_frame("plos_one", spool, b2, c_date)
 
         print("New Papers collected: ", plos_one_update3.shape[0])
 
         # Print the total number of articles collected
         if not update:
-            plos_one_update3.to_csv(destination_path, index=False)
+            write_frame(plos_one_update3, destination_path)
             print("The data is stored as: ", destination_path)
 
         if update:
             # Need to add error handling
             print("Updating source dataset.............")
-            plos_one_url = "https://huggingface.co/datasets/PenguinMan/ARXIV/resolve/main/plos_one_final2.csv"
-            response = urllib.request.urlopen(plos_one_url)
-            dataset_content2 = response.read().decode("utf-8")
-            dataset_dataframe2 = pd.read_csv(io.StringIO(dataset_content2))
-            plos_new = dataset_dataframe2[
-                ["ID", "Title", "Author", "Abstract", "Journal", "Subject", "Accepted_Date"]
-            ].rename(
-                columns={
-                    "Title": "title",
-                    "Author": "author",
-                    "Abstract": "abstract",
-                    "Journal": "journal",
-                    "Subject": "subject",
-                    "Accepted_Date": "date",
-                }
-            )
-
-            plos_combined = pd.concat([plos_new, plos_one_update3], ignore_index=True)
-            plos_combined2 = plos_combined.drop_duplicates(subset=["abstract"], keep="last")
-            plos_combined3 = plos_combined2.dropna()
-            plos_combined3.to_csv(destination_path, index=False)
+            _merge_source("plos_one", plos_one_update3, destination_path, dropna=True, near_duplicates=near_duplicates)
 
             print("Source dataset Updated!!")
             print("The data is stored as: ", destination_path)
 
+        return True
+
     except requests.exceptions.RequestException as re:
         print("Error making requests:", re)
-        # Handle the requests exception appropriately (e.g., logging, user notification
+        events.error("plos_one", re)
+        return False
+
+    finally:
+        spool.remove()
 
-def arxiv(c_date, destination_path, update, c_date2="2023-05-31"):
+
+def _plos_url(**params):
+    return f"{PLOS_API_URL}/search?{urllib.parse.urlencode(params)}"
+
+
+def _plos_pages(b2, c_date, max_workers=MAX_WORKERS, rate_limit=RATE_LIMIT, paging=None, resume_cursor=None):
+    """
+    Yields (cursor, records) for every page of PLOS ONE neuroscience articles between b2 and c_date, in order.
+
+    With start/rows paging the cursor is the start offset of the page and the pages are
+    fetched concurrently. With cursorMark paging it is the cursorMark following the page:
+    each page continues from the previous one instead of re-scanning start rows, so late
+    pages cost the same as early ones, but they are fetched one after the other. With
+    resume_cursor, the pages up to that cursor are skipped; its type selects the paging.
+    """
+    query = "neuroscience"
+    filter = 'publication_date:[2019-01-01T00:00:00Z TO 2023-12-31T23:59:59Z], subject_facet:"/Neuroscience/"'
+    n_filter = filter.replace("2019-01-01T00:00:00Z", f"{b2}T00:00:00Z").replace(
+        "2023-12-31T23:59:59Z", f"{c_date}T23:59:59Z"
+    )
+    fields = "title,author,abstract,journal,subject_facet,accepted_date,id"
+    session = make_session(pool_size=max_workers)
+    rate_limiter = RateLimiter(rate_limit)
+
+    # Only the number of results is needed from the first request
+    data = get_json(session, _plos_url(q=query, fq=n_filter, rows=0), rate_limiter)
+    num = data["response"]["numFound"]
+    if resume_cursor is not None:
+        paging = "cursor" if isinstance(resume_cursor, str) else "start"
+    elif paging is None:
+        paging = "cursor" if num > PLOS_DEEP_PAGING_THRESHOLD else "start"
+    print(f"Collecting Papers........ {num} papers, paging by {paging}")
+
+    if paging == "cursor":
+        pages = _plos_cursor_pages(session, rate_limiter, query, fields, n_filter, resume_cursor or "*")
+        # The number of pages left is unknown when resuming from a cursorMark
+        total_pages = None if resume_cursor else -(-num // PLOS_PAGE_SIZE)
+    else:
+        first = 0 if resume_cursor is None else resume_cursor + PLOS_PAGE_SIZE
+        starts = range(first, num, PLOS_PAGE_SIZE)
+        urls = [
+            _plos_url(q=query, fl=fields, fq=n_filter, start=start, rows=PLOS_PAGE_SIZE)
+            for start in starts
+        ]
+        pages = (
+            (start, page["response"]["docs"])
+            for start, page in zip(starts, iter_json_pages(session, urls, max_workers, rate_limit))
+        )
+        total_pages = len(starts)
+    yield from events.track_pages("plos_one", pages, total_pages)
+
+
+def _plos_cursor_pages(session, rate_limiter, query, fields, n_filter, cursor_mark):
+    """
+    Yields (cursorMark, records) for the pages following cursor_mark, one request after the other.
+    """
+    # The cursor requires a sort on the unique "id" key
+    while True:
+        url = _plos_url(
+            q=query, fl=fields, fq=n_filter, rows=PLOS_PAGE_SIZE, sort="id asc", cursorMark=cursor_mark
+        )
+        data = get_json(session, url, rate_limiter)
+        next_cursor_mark = data.get("nextCursorMark", cursor_mark)
+        if data["response"]["docs"]:
+            yield next_cursor_mark, data["response"]["docs"]
+        if next_cursor_mark == cursor_mark or not data["response"]["docs"]:
+            return
+        cursor_mark = next_cursor_mark
+
+
+def _write_plos_csv(articles, file):
+    """
+    Writes raw PLOS records to an open file as CSV.
+    """
+    # Create a CSV writer
+    writer = csv.writer(file)
+
+    # Write the header row
+    writer.writerow(
+        ["ID", "title", "author", "abstract", "journal", "subject", "date"]
+    )
+
+    # Loop over the articles and write the data to the CSV file
+    for article in articles:
+        writer.writerow(
+            [
+                article.get("id", ""),
+                article.get("title", ""),
+                article.get("author", ""),
+                article.get("abstract", ""),
+                article.get("journal", ""),
+                article.get("subject_facet", ""),
+                article.get("accepted_date", ""),
+            ]
+        )
+
+
+def _plos_frame(plos_one_update):
+    """
+    Drops duplicated and incomplete rows from collected PLOS articles.
+    """
+    plos_one_update2 = dedup.drop_duplicates(plos_one_update, "abstract", "ID")
+    return plos_one_update2.dropna()
+
+
+def arxiv(c_date, destination_path, update, c_date2="2023-05-31", near_duplicates=False):
     """
     Collect papers from the arXiv source and update the dataset.
 
@@ -318,94 +539,345 @@ def arxiv(c_date, destination_path, update, c_date2="2023-05-31"):
         destination_path (str): File path to store the updated dataset.
         update (bool): Flag indicating whether to update the source dataset.
         c_date2 (str, optional): Start date for collecting papers in the format 'yyyy-mm-dd'. Default is '2023-05-31'.
+        near_duplicates (bool, optional): With update, also replace the papers whose abstract is a near-duplicate of a new one. Default is False.
     """
-    try:
-        import arxiv
-
-        # Perform the arXiv search with date filtering
-        search = arxiv.Search(
-            query="brain",
-            max_results=20000,
-            sort_by=arxiv.SortCriterion.SubmittedDate,
-            sort_order=arxiv.SortOrder.Descending,
-        )
-
-        # Create an empty list to store the extracted data
-        data = []
-        print("Collecting Papers........ Est Time: 10 mins")
-        # Iterate over the search results
-        for result in search.results():
-            # Extract the desired information from each result
-            entry_id = result.entry_id
-            submitter = ""
-            if result.authors:
-                submitter = result.authors[0].name
-            authors = [author.name for author in result.authors]
-            title = result.title
-            journal_ref = result.journal_ref if result.journal_ref else ""
-            categories = [result.primary_category]
-            abstract = result.summary
-            versions = len(result.comment) if result.comment else 0
-            update_date = result.updated
-            authors_parsed = []
-
-            # Append the extracted data to the list
-            data.append(
-                {
-                    "id": entry_id,
-                    "submitter": submitter,
-                    "authors": authors,
-                    "title": title,
-                    "categories": categories,
-                    "abstract": abstract,
-                    "versions": versions,
-                    "update_date": update_date,
-                }
-            )
-
-        # Create a DataFrame from the extracted data
-        df = pd.DataFrame(data)
-        df["update_date"] = pd.to_datetime(df["update_date"])
+    import arxiv as arxiv_api
 
-        # Define the start and end dates for filtering
+    spool = PageSpool()
+    try:
+        print(f"Collecting Papers updated between {c_date2} and {c_date}........")
+        for offset, records in _arxiv_pages(c_date2, c_date):
+            spool.add(records)
 
-        # Filter the DataFrame based on the date range
-        filtered_df = df[(df["update_date"] >= c_date2) & (df["update_date"] <= c_date)]
-        arxiv_2 = filtered_df.drop_duplicates(subset=["abstract"], keep="last")
-        arxiv_final = arxiv_2.dropna()
+        arxiv_final = _collected_frame("arxiv", spool, c_date2, c_date)
         if not update:
-            arxiv_final.to_csv(destination_path, index=False)
+            write_frame(arxiv_final, destination_path)
 
         if update:
-            arxiv_url = (
-                "https://huggingface.co/datasets/PenguinMan/ARXIV/resolve/main/arxiv2.csv"
-            )
             print("Updating Source Dataset...............")
-            response3 = urllib.request.urlopen(arxiv_url)
-            dataset_content3 = response3.read().decode("utf-8")
-            dataset_dataframe3 = pd.read_csv(io.StringIO(dataset_content3))
-            arxiv_new = dataset_dataframe3[
-                [
-                    "id",
-                    "submitter",
-                    "authors",
-                    "title",
-                    "categories",
-                    "abstract",
-                    "versions",
-                    "update_date",
-                ]
-            ]
-            arxiv_new2 = arxiv_new.drop_duplicates(subset=["abstract"], keep="last")
-            arxiv_new3 = arxiv_new2.dropna()
-
-            arxiv_new3.to_csv(destination_path, index=False)
+            _merge_source("arxiv", arxiv_final, destination_path, dropna=True, near_duplicates=near_duplicates)
             print("The source dataset is updated and is stored at:", destination_path)
 
-    except requests.exceptions.RequestException as re:
+        return True
+
+    except (requests.exceptions.RequestException, arxiv_api.ArxivError) as re:
         print("Error making requests:", re)
-        # Handle the requests exception appropriately (e.g., logging, user notification, etc.)
+        events.error("arxiv", re)
+        return False
+
+    finally:
+        spool.remove()
+
+
+def _arxiv_pages(c_date2, c_date, resume_cursor=None):
+    """
+    Yields (offset, records) for every page of arXiv "brain" papers updated between c_date2 and c_date, newest first.
+
+    The date window is part of the query (a lastUpdatedDate range), so the API only returns
+    papers of the window. Results are sorted by update date, and the harvest stops at the
+    first result older than c_date2 in case the server ignores the range. The offset is the
+    number of results consumed once the page is done. With resume_cursor, the search
+    restarts at that offset.
+    """
+    import arxiv
+
+    start = pd.Timestamp(c_date2, tz="UTC")
+    end = pd.Timestamp(c_date, tz="UTC") + pd.Timedelta(days=1)
+    window = "lastUpdatedDate:[{} TO {}]".format(
+        start.strftime("%Y%m%d%H%M"), (end - pd.Timedelta(minutes=1)).strftime("%Y%m%d%H%M")
+    )
+    search = arxiv.Search(
+        query=f"brain AND {window}",
+        max_results=None,
+        sort_by=arxiv.SortCriterion.LastUpdatedDate,
+        sort_order=arxiv.SortOrder.Descending,
+    )
+    client = arxiv.Client(page_size=ARXIV_PAGE_SIZE, delay_seconds=ARXIV_DELAY_SECONDS)
+    # The arxiv package does not expose the number of results, so the pages have no ETA
+    offset = resume_cursor or 0
+    pages = _arxiv_result_pages(client.results(search, offset=offset), start, end, offset)
+    yield from events.track_pages("arxiv", pages)
+
+
+def _arxiv_result_pages(results, start, end, offset):
+    """
+    Groups the arxiv.Result objects updated in [start, end) in pages of ARXIV_PAGE_SIZE records.
+    """
+    page = []
+    for result in results:
+        if result.updated < start:
+            break
+        if result.updated >= end:
+            offset += 1
+            continue
+        page.append(_arxiv_record(result))
+        if len(page) == ARXIV_PAGE_SIZE:
+            offset += len(page)
+            yield offset, page
+            page = []
+    if page:
+        yield offset + len(page), page
+
+
+def _arxiv_record(result):
+    """
+    Extracts the stored fields of an arxiv.Result.
+    """
+    submitter = ""
+    if result.authors:
+        submitter = result.authors[0].name
+    return {
+        "id": result.entry_id,
+        "submitter": submitter,
+        "authors": [author.name for author in result.authors],
+        "title": result.title,
+        "categories": [result.primary_category],
+        "abstract": result.summary,
+        "versions": len(result.comment) if result.comment else 0,
+        "update_date": result.updated,
+    }
+
+
+def _arxiv_frame(df, c_date2, c_date):
+    """
+    Keeps the arXiv records updated between c_date2 and c_date (both days included), without duplicates.
+    """
+    df["update_date"] = pd.to_datetime(df["update_date"], utc=True)
+
+    # Filter the DataFrame based on the date range
+    filtered_df = df[
+        (df["update_date"] >= pd.Timestamp(c_date2, tz="UTC"))
+        & (df["update_date"] < pd.Timestamp(c_date, tz="UTC") + pd.Timedelta(days=1))
+    ]
+    arxiv_2 = dedup.drop_duplicates(filtered_df, "abstract", "id")
+    return arxiv_2.dropna()
+
+
+def _source_batches(dataset_name):
+    """
+    Yields the published dataset of a source in batches of SOURCE_BATCH_SIZE rows, with the columns of the collected papers.
+    """
+    for batch in iter_dataset(SOURCE_DATASETS[dataset_name], SOURCE_BATCH_SIZE, SOURCE_DATASETS[dataset_name].columns):
+        batch = batch.rename(columns=SOURCE_RENAMES[dataset_name])
+        if dataset_name == "arxiv":
+            batch = batch.dropna()
+        yield batch
+
 
-    except Exception as e:
-        print(f"An unexpected error occurred: {e}")
-        # Handle the unexpected error appropriately (e.g., logging, user notification, etc.)
+def _source_rows(dataset_name, collected):
+    """
+    Gives newly collected papers the columns, column order and text values of the published dataset.
+
+    The published rows and the new rows end up in the same file, which for Parquet and Feather
+    has a single schema. Collected arXiv records hold lists of authors and categories and a
+    timestamp, which become the strings the published dataset has.
+    """
+    if dataset_name == "arxiv":
+        collected = collected.assign(
+            authors=collected["authors"].map(", ".join),
+            categories=collected["categories"].map(" ".join),
+            versions=collected["versions"].astype(str),
+            update_date=collected["update_date"].dt.strftime("%Y-%m-%d"),
+        )
+    renames = SOURCE_RENAMES[dataset_name]
+    return collected[[renames.get(column, column) for column in SOURCE_DATASETS[dataset_name].columns]]
+
+
+def _merge_source(dataset_name, collected, destination_path, dropna=False, near_duplicates=False):
+    """
+    Writes the published dataset combined with newly collected papers to destination_path, which
+    replace the published rows with the same abstract or ID (or, with near_duplicates, a near-duplicate abstract).
+
+    The published dataset is streamed batch by batch, so it never has to fit in memory;
+    the fingerprints of its rows are cached.
+    """
+    id_column = ID_COLUMNS[dataset_name]
+    collected = _source_rows(dataset_name, collected)
+    batches = functools.partial(_source_batches, dataset_name)
+    index = dedup.source_index(SOURCE_DATASETS[dataset_name].url, batches, id_column, near_duplicates=near_duplicates)
+    merged = dedup.merge_batches(batches, collected, id_column, index=index, near_duplicates=near_duplicates)
+    if dropna:
+        merged = (batch.dropna() for batch in merged)
+    return write_batches(merged, destination_path)
+
+
+def _collected_frame(dataset_name, spool, start, end):
+    """
+    Builds the collected DataFrame of a source from the pages stored in spool.
+
+    Every page is reduced to the stored columns on its own, so only one page of raw
+    records is held in memory at a time.
+    """
+    chunks = []
+    records_in = 0
+    for records in spool.pages():
+        records_in += len(records)
+        if dataset_name == "bioarxiv":
+            chunks.append(_bioarxiv_frame(pd.DataFrame(records, columns=BIORXIV_COLUMNS + ["category"])))
+        elif dataset_name == "plos_one":
+            buffer = io.StringIO()
+            _write_plos_csv(records, buffer)
+            buffer.seek(0)
+            chunks.append(pd.read_csv(buffer))
+        else:
+            chunks.append(_arxiv_frame(pd.DataFrame(records, columns=ARXIV_COLUMNS), start, end))
+
+    if dataset_name == "bioarxiv":
+        empty = _bioarxiv_frame(pd.DataFrame(columns=BIORXIV_COLUMNS + ["category"]))
+    elif dataset_name == "plos_one":
+        empty = pd.DataFrame(columns=["ID", "title", "author", "abstract", "journal", "subject", "date"])
+    else:
+        empty = _arxiv_frame(pd.DataFrame(columns=ARXIV_COLUMNS), start, end)
+    collected = pd.concat(chunks, ignore_index=True) if chunks else empty
+
+    if dataset_name == "plos_one":
+        collected = _plos_frame(collected)
+    else:
+        collected = dedup.drop_duplicates(collected, "abstract", ID_COLUMNS[dataset_name])
+    events.emit("dedup", source=dataset_name, stage="collected", rows_in=records_in, rows=len(collected))
+    return collected
+
+
+def _recover_append(destination_path, append):
+    """
+    Makes a dataset consistent again after a run stopped while appending to it.
+
+    The rows may or may not be in the file, and the dedup index may or may not list them. A CSV
+    file is cut back to its size before the append (dropping a partly written row), a columnar
+    file is either complete or untouched since append_frame replaces it atomically, and the dedup
+    index is rebuilt from the file. The spooled pages are then appended again, exactly once.
+    """
+    print(f"Recovering {destination_path} from an interrupted append...")
+    if os.path.exists(destination_path) and file_format(destination_path) == "csv":
+        if append["size"] is None:
+            os.remove(destination_path)
+        else:
+            os.truncate(destination_path, append["size"])
+    if os.path.exists(state.dedup_path(destination_path)):
+        os.remove(state.dedup_path(destination_path))
+
+
+def incremental_update(
+    dataset_name,
+    c_date,
+    destination_path,
+    c_date2=None,
+    update=False,
+    max_workers=MAX_WORKERS,
+    rate_limit=RATE_LIMIT,
+    near_duplicates=False,
+):
+    """
+    Appends the papers published since the last run to the dataset at destination_path.
+
+    A state file next to destination_path keeps the last date collected, and a DedupIndex in
+    <destination_path>.dedup.npz the fingerprints of the papers already stored. Every fetched page is spooled to <destination_path>.pages and its cursor saved to
+    the state, so a run that crashes resumes after its last completed page. A search index
+    of the dataset in <destination_path>.index (see nbdt.search.build_index) and a feature
+    store in <destination_path>.features (see nbdt.features.build_features) are extended
+    with the appended papers.
+
+    Args:
+        dataset_name (str): "bioarxiv", "plos_one" or "arxiv".
+        c_date (str): End date for collecting papers in the format 'yyyy-mm-dd'.
+        destination_path (str): File path of the dataset to extend.
+        c_date2 (str, optional): Start date of the first run. Later runs start from the last date collected.
+        update (bool, optional): If True and destination_path does not exist yet, it is first filled with the source dataset.
+        max_workers (int, optional): Maximum number of pages fetched at the same time.
+        rate_limit (float, optional): Maximum requests per second to the API.
+        near_duplicates (bool, optional): Also skip the papers whose abstract is a near-duplicate of a stored one.
+
+    Returns:
+        bool: True once the dataset is up to date.
+    """
+    run_state = state.load_state(destination_path)
+    if run_state is None:
+        run_state = {"dataset": dataset_name, "last_date": None, "run": None}
+    elif run_state["dataset"] != dataset_name:
+        raise ValueError(f'"{destination_path}" holds the {run_state["dataset"]} dataset, not {dataset_name}')
+    if run_state["run"] is not None and run_state["run"].get("append") is not None:
+        _recover_append(destination_path, run_state["run"].pop("append"))
+        state.save_state(destination_path, run_state)
+
+    start = run_state["last_date"] or c_date2 or DEFAULT_START_DATES[dataset_name]
+    if start > c_date:
+        print(f"The dataset is already up to date until {run_state['last_date']}.")
+        return True
+
+    window = [start, c_date]
+    run = run_state["run"]
+    spool = PageSpool(state.pages_dir(destination_path))
+    if run is None or run["window"] != window:
+        run = {"window": window, "cursor": None}
+        spool.remove()
+        spool = PageSpool(state.pages_dir(destination_path))
+    elif run["cursor"] is not None:
+        print(f"Resuming the interrupted update after page {run['cursor']}...")
+
+    if dataset_name == "bioarxiv":
+        pages = _bioarxiv_pages(start, c_date, max_workers, rate_limit, resume_cursor=run["cursor"])
+    elif dataset_name == "plos_one":
+        pages = _plos_pages(start, c_date, max_workers, rate_limit, resume_cursor=run["cursor"])
+    else:
+        pages = _arxiv_pages(start, c_date, resume_cursor=run["cursor"])
+
+    for cursor, records in pages:
+        spool.add(records)
+        run["cursor"] = cursor
+        run_state["run"] = run
+        state.save_state(destination_path, run_state)
+
+    collected = _collected_frame(dataset_name, spool, start, c_date)
+    if update:
+        # The dataset started from the published one, see below
+        collected = _source_rows(dataset_name, collected)
+    id_column = ID_COLUMNS[dataset_name]
+
+    if not os.path.exists(destination_path):
+        if update:
+            print("Writing source dataset...")
+            # A run stopped while writing must not leave a partial copy that later runs append to
+            root, extension = os.path.splitext(destination_path)
+            tmp_path = f"{root}.{os.getpid()}.tmp{extension}"
+            write_batches(_source_batches(dataset_name), tmp_path)
+            os.replace(tmp_path, destination_path)
+        if os.path.exists(state.dedup_path(destination_path)):
+            os.remove(state.dedup_path(destination_path))
+    index = None
+    if os.path.exists(state.dedup_path(destination_path)):
+        index = dedup.DedupIndex.load(state.dedup_path(destination_path))
+        if index.near_duplicates != near_duplicates:
+            # Built by a run with the other setting; signatures are added or dropped by rebuilding it
+            index = None
+    if index is None and os.path.exists(destination_path):
+        index = dedup.DedupIndex.from_frame(
+            read_frame(destination_path, [id_column, "abstract"]), id_column, near_duplicates=near_duplicates
+        )
+    elif index is None:
+        index = dedup.DedupIndex(near_duplicates)
+
+    new = index.filter_new(collected, id_column)
+    events.emit("dedup", source=dataset_name, stage="stored", rows_in=len(collected), rows=len(new))
+    # The search index and feature store are opened before the append changes the file they were built from
+    search_index = search.load_index(destination_path)
+    feature_store = features.load_features(destination_path)
+    # Until the dedup index and the state are saved, a run stopping here is undone by the next one
+    run["append"] = {"size": os.path.getsize(destination_path) if os.path.exists(destination_path) else None}
+    run_state["run"] = run
+    state.save_state(destination_path, run_state)
+    append_frame(new, destination_path)
+    if search_index is not None:
+        search_index.add(new)
+        search_index.save(state.index_dir(destination_path), destination_path)
+    if feature_store is not None:
+        feature_store.add(new)
+        feature_store.save(state.features_dir(destination_path), destination_path)
+    print(f"{new.shape[0]} new papers appended to {destination_path}")
+
+    index.add(new, id_column)
+    index.save(state.dedup_path(destination_path))
+    run_state["last_date"] = c_date
+    run_state["run"] = None
+    state.save_state(destination_path, run_state)
+    spool.remove()
+    return True
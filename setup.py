@@ -1,14 +1,24 @@
-from setuptools import setup, find_packages
-
-setup(
-    name='nbdt',
-    version='0.1',
-    author='Subhankar Panda',
-    author_email='subhankarpanda556@example.com',
-    description='nbdt library for reccomending authors, papers, and journals',
-    packages=find_packages(),
-    install_requires=[
-        'pandas',
-        'arxiv',
-    ],
-)
+from setuptools import setup, find_packages
+
+setup(
+    name='nbdt',
+    version='0.1',
+    author='Subhankar Panda',
+    author_email='subhankarpanda556@example.com',
+    description='nbdt library for reccomending authors, papers, and journals',
+    packages=find_packages(),
+    install_requires=[
+        'pandas',
+        'numpy',
+        'arxiv',
+        'requests',
+    ],
+    entry_points={
+        'console_scripts': ['nbdt=nbdt.cli:main'],
+    },
+    extras_require={
+        'parquet': ['pyarrow'],
+        'search': ['pyarrow'],
+        'features': ['pyarrow', 'scipy'],
+    },
+)
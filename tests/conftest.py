@@ -0,0 +1,141 @@
+"""
+Fixtures running nbdt against the local mock servers of benchmarks/servers.py.
+
+The dataset URLs are read from $NBDT_HF_BASE_URL when nbdt is imported, so the mock
+Hugging Face server is started here, before the test modules import nbdt.
+"""
+import os
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+import generators  # noqa: E402
+import servers  # noqa: E402
+
+# Rows of every synthetic published dataset
+ROWS = 500
+
+HF_DIR = tempfile.mkdtemp(prefix="nbdt-hf-")
+for file_name in generators.FILES:
+    generators.write_dataset(HF_DIR, file_name, ROWS)
+HF_REQUESTS = servers.RequestCounter()
+HF_SERVER, HF_URL = servers.serve(servers.static_handler(HF_DIR, HF_REQUESTS))
+os.environ["NBDT_HF_BASE_URL"] = HF_URL
+os.environ["NBDT_CACHE_DIR"] = tempfile.mkdtemp(prefix="nbdt-cache-")
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    """
+    Gives every test an empty cache directory with the default settings.
+    """
+    from nbdt import cache
+
+    monkeypatch.setattr(cache, "_options", dict(cache._options, offline=False, max_size=cache.DEFAULT_MAX_SIZE))
+    path = str(tmp_path / "cache")
+    cache.configure_cache(cache_dir=path)
+    return path
+
+
+@pytest.fixture
+def hf_requests():
+    """
+    Returns a function giving the number of requests made to the mock Hugging Face server since the test started.
+    """
+    start = HF_REQUESTS.snapshot()["requests"]
+    return lambda: HF_REQUESTS.snapshot()["requests"] - start
+
+
+@pytest.fixture
+def events():
+    """
+    Collects the nbdt events emitted during the test.
+    """
+    from nbdt import events as nbdt_events
+
+    collected = []
+    sink = nbdt_events.add_sink(collected.append)
+    yield collected
+    nbdt_events.remove_sink(sink)
+
+
+@pytest.fixture
+def static_server(tmp_path):
+    """
+    Starts a static file server on a directory holding the given files, with static_handler options.
+
+    Returns:
+        callable: files (dict of name to bytes), **options -> (base URL, RequestCounter).
+    """
+    started = []
+
+    def start(files, **options):
+        directory = tmp_path / f"served{len(started)}"
+        directory.mkdir()
+        for name, data in files.items():
+            (directory / name).write_bytes(data)
+        counter = servers.RequestCounter()
+        server, url = servers.serve(servers.static_handler(str(directory), counter, **options))
+        started.append(server)
+        return url, counter
+
+    yield start
+    for server in started:
+        server.shutdown()
+
+
+@pytest.fixture
+def biorxiv_api(monkeypatch):
+    """
+    Points the bioRxiv collector at a mock API serving 250 papers, 100 per page.
+
+    Returns:
+        servers.RequestCounter: The requests and records served.
+    """
+    from nbdt import update
+
+    counter = servers.RequestCounter()
+    server, url = servers.serve(servers.biorxiv_handler(250, counter))
+    monkeypatch.setattr(update, "BIORXIV_API_URL", url)
+    yield counter
+    server.shutdown()
+
+
+@pytest.fixture
+def plos_api(monkeypatch):
+    """
+    Points the PLOS ONE collector at a mock Solr API serving 250 articles.
+
+    Returns:
+        servers.RequestCounter: The requests and records served.
+    """
+    from nbdt import update
+
+    counter = servers.RequestCounter()
+    server, url = servers.serve(servers.plos_handler(250, counter))
+    monkeypatch.setattr(update, "PLOS_API_URL", url)
+    yield counter
+    server.shutdown()
+
+
+@pytest.fixture
+def arxiv_api(monkeypatch):
+    """
+    Points the arxiv package at a mock API serving 50 papers, one every 6 hours back from 2023-09-30.
+
+    Returns:
+        servers.RequestCounter: The requests and records served.
+    """
+    import arxiv
+
+    from nbdt import update
+
+    counter = servers.RequestCounter()
+    server, url = servers.serve(servers.arxiv_handler(50, counter))
+    monkeypatch.setattr(arxiv.Client, "query_url_format", f"{url}/api/query?{{}}")
+    monkeypatch.setattr(update, "ARXIV_DELAY_SECONDS", 0)
+    yield counter
+    server.shutdown()
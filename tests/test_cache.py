@@ -0,0 +1,94 @@
+import hashlib
+import os
+import time
+
+import pytest
+
+from nbdt import cache, load_dataset
+from nbdt.cache import cache_info, cached_download
+from nbdt.registry import get_dataset
+
+
+def _statuses(events):
+    return [event["status"] for event in events if event["event"] == "cache"]
+
+
+def test_cached_file_is_revalidated_instead_of_downloaded_again(static_server, events):
+    url, counter = static_server({"papers.csv": b"id,abstract\n1,a\n"})
+
+    first = cached_download(f"{url}/papers.csv")
+    requests = counter.snapshot()["requests"]
+    second = cached_download(f"{url}/papers.csv")
+
+    assert first == second
+    assert open(second, "rb").read() == b"id,abstract\n1,a\n"
+    # One conditional HEAD request answered with 304
+    assert counter.snapshot()["requests"] == requests + 1
+    assert _statuses(events) == ["downloaded", "revalidated"]
+
+
+def test_changed_file_is_downloaded_again(static_server, tmp_path):
+    url, _ = static_server({"papers.csv": b"id,abstract\n1,a\n"})
+    cached_download(f"{url}/papers.csv")
+
+    served = tmp_path / "served0" / "papers.csv"
+    served.write_bytes(b"id,abstract\n1,a\n2,b\n")
+    os.utime(served, ns=(time.time_ns(), time.time_ns() + 10**9))
+    path = cached_download(f"{url}/papers.csv")
+
+    assert open(path, "rb").read() == b"id,abstract\n1,a\n2,b\n"
+    assert len(cache_info()["entries"]) == 1
+
+
+def test_offline_mode_only_uses_the_cache(static_server):
+    url, counter = static_server({"papers.csv": b"id\n1\n"})
+
+    with pytest.raises(FileNotFoundError):
+        cached_download(f"{url}/papers.csv", offline=True)
+    assert counter.snapshot()["requests"] == 0
+
+    path = cached_download(f"{url}/papers.csv")
+    requests = counter.snapshot()["requests"]
+    assert cached_download(f"{url}/papers.csv", offline=True) == path
+    assert counter.snapshot()["requests"] == requests
+
+
+def test_checksum_mismatch_is_rejected(static_server):
+    data = b"id\n1\n"
+    url, _ = static_server({"papers.csv": data})
+
+    with pytest.raises(ValueError):
+        cached_download(f"{url}/papers.csv", sha256="0" * 64)
+    assert cached_download(f"{url}/papers.csv", sha256=hashlib.sha256(data).hexdigest())
+
+
+def test_load_dataset_reads_the_cached_copy(hf_requests):
+    first = load_dataset("medline_large")
+    requests = hf_requests()
+    second = load_dataset("medline_large")
+
+    assert hf_requests() == requests + 1
+    assert first.equals(second)
+
+
+def test_cache_size_includes_derived_copies():
+    load_dataset("medline_large", format="parquet")
+    entry = cache_info()["entries"][get_dataset("medline_large").url]
+
+    assert cache_info()["size"] > entry["size"]
+
+
+def test_eviction_removes_derived_copies(cache_dir):
+    load_dataset("medline_large", format="parquet")
+    load_dataset("medline_large", 2019, 2020, partitioned=True)
+    assert os.listdir(os.path.join(cache_dir, "columnar"))
+    assert os.listdir(os.path.join(cache_dir, "partitions"))
+
+    # Everything but the file just loaded is evicted
+    cache.configure_cache(max_size=1)
+    load_dataset("plos_one")
+
+    assert list(cache_info()["entries"]) == [get_dataset("plos_one").url]
+    assert os.listdir(os.path.join(cache_dir, "columnar")) == []
+    assert os.listdir(os.path.join(cache_dir, "partitions")) == []
+    assert cache_info()["size"] == os.path.getsize(cached_download(get_dataset("plos_one").url))
@@ -0,0 +1,79 @@
+import os
+
+import pandas as pd
+import pytest
+
+from nbdt.cli import main
+
+
+def test_fetch_warms_the_cache(hf_requests):
+    assert main(["fetch", "medline_large", "plos_one", "--jobs", "2"]) == 0
+    requests = hf_requests()
+
+    assert main(["fetch", "medline_large", "plos_one", "--offline"]) == 0
+    assert hf_requests() == requests
+
+
+def test_failing_job_gives_exit_status_1(capsys):
+    assert main(["fetch", "medline_large", "no_such_dataset"]) == 1
+    assert "no_such_dataset" in capsys.readouterr().err
+
+
+def test_offline_fetch_of_an_uncached_file_fails():
+    assert main(["fetch", "medline_large", "--offline"]) == 1
+
+
+@pytest.mark.parametrize(
+    "argv",
+    [
+        ["fetch", "--jobs", "0"],
+        ["filter", "medline_large", "--output", "out.csv"],
+        ["filter", "medline_large", "--start-year", "2019", "--end-year", "2020", "--output", "out.csv", "--format", "parquet"],
+        ["update", "bioarxiv"],
+        ["unknown"],
+    ],
+)
+def test_wrong_arguments_give_exit_status_2(argv):
+    with pytest.raises(SystemExit) as exit_info:
+        main(argv)
+    assert exit_info.value.code == 2
+
+
+def test_convert_copies_the_columnar_files(tmp_path):
+    assert main(["convert", "medline_large", "plos_one", "--format", "feather", "--output-dir", str(tmp_path)]) == 0
+
+    assert sorted(os.listdir(tmp_path)) == ["cache", "medline_large.feather", "plos_one.feather"]
+    assert "Year" in pd.read_feather(tmp_path / "medline_large.feather")
+
+
+def test_filter_writes_one_file_per_year(tmp_path):
+    output = tmp_path / "years"
+
+    assert main(["filter", "medline_large", "--per-year", "--output", str(output), "--format", "parquet", "--jobs", "2"]) == 0
+
+    files = sorted(os.listdir(output))
+    assert files == [f"medline_large_{year}.parquet" for year in range(2018, 2024)]
+    assert (pd.read_parquet(output / files[0])["Year"] == 2018).all()
+
+
+def test_filter_of_years_without_papers_fails(tmp_path):
+    assert main(["filter", "medline_large", "--start-year", "1990", "--end-year", "1991", "--output", str(tmp_path / "out.csv")]) == 1
+
+
+def test_update_exit_status(biorxiv_api, tmp_path):
+    path = tmp_path / "bioarxiv.csv"
+
+    assert main(["update", f"bioarxiv={path}", "--end-date", "2023-08-31", "--start-date", "2023-01-01", "--incremental"]) == 0
+    assert len(pd.read_csv(path)) == 250
+    assert main(["update", f"bioarxiv={path}", "medline_large", "--end-date", "2023-08-31", "--incremental"]) == 1
+
+
+@pytest.mark.parametrize("argv, max_parallel", [([], None), (["--jobs", "2"], 2)])
+def test_update_runs_every_source_at_once_by_default(monkeypatch, argv, max_parallel):
+    from nbdt import update
+
+    calls = []
+    monkeypatch.setattr(update, "update_all", lambda *args, **options: calls.append(options) or {})
+
+    assert main(["update", "bioarxiv", "plos_one", "--end-date", "2023-08-31"] + argv) == 0
+    assert calls[0]["max_parallel"] == max_parallel
@@ -0,0 +1,143 @@
+import multiprocessing
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+import pytest
+
+from nbdt import load_dataset, registry
+from nbdt.datasets import filter_dataset
+from nbdt.partitions import partition_dataset, read_partitions
+from nbdt.registry import Dataset
+
+
+def _partitioned_rows(_):
+    return len(load_dataset("medline_large", 2019, 2020, partitioned=True))
+
+
+def test_year_filter_keeps_the_selected_years():
+    dataframe = load_dataset("medline_large", 2019, 2020)
+
+    assert dataframe["Year"].between(2019, 2020).all()
+    assert dataframe["PMID"].dtype == "Int64"
+
+
+@pytest.mark.parametrize("options", [{"format": "parquet"}, {"format": "feather"}, {"partitioned": True}, {"mmap": True}])
+def test_columnar_copies_match_the_csv(options):
+    expected = load_dataset("medline_large", 2019, 2020).sort_values("PMID", ignore_index=True)
+    dataframe = load_dataset("medline_large", 2019, 2020, **options).sort_values("PMID", ignore_index=True)
+
+    assert dataframe["PMID"].astype("Int64").tolist() == expected["PMID"].tolist()
+    assert dataframe["Title"].astype(str).tolist() == expected["Title"].tolist()
+
+
+def test_chunks_are_written_in_the_format_of_the_destination(tmp_path, capsys):
+    path = tmp_path / "medline.parquet"
+
+    assert load_dataset("medline_large", 2019, 2020, destination_path=str(path), chunksize=100) is None
+
+    assert "saved to" in capsys.readouterr().out
+    assert pd.read_parquet(path)["PMID"].tolist() == load_dataset("medline_large", 2019, 2020)["PMID"].tolist()
+
+
+def test_chunked_load_without_matching_papers_says_so(tmp_path, capsys):
+    load_dataset("medline_large", 1990, 1991, destination_path=str(tmp_path / "medline.csv"), chunksize=100)
+
+    assert "No papers match" in capsys.readouterr().out
+
+
+def test_compact_is_rejected_with_chunks():
+    with pytest.raises(ValueError):
+        load_dataset("medline_large", chunksize=100, compact=True)
+
+
+@pytest.mark.parametrize(
+    "options",
+    [
+        {"chunksize": 100, "partitioned": True},
+        {"cache": False, "format": "parquet"},
+        {"cache": False, "partitioned": True},
+        {"cache": False, "mmap": True},
+    ],
+)
+def test_unsupported_combinations_are_rejected(options, cache_dir):
+    with pytest.raises(ValueError):
+        load_dataset("medline_large", **options)
+    assert not os.path.exists(os.path.join(cache_dir, "columnar"))
+
+
+def test_compact_load_uses_categories():
+    dataframe = load_dataset("medline_large", compact=True)
+
+    assert dataframe["Journal"].dtype == "category"
+    assert dataframe["Year"].dtype == "Int16"
+
+
+def test_processes_partition_the_same_file_at_once(cache_dir):
+    load_dataset("medline_large")
+    expected = _partitioned_rows(None)
+    partitions = os.path.join(cache_dir, "partitions")
+    shutil.rmtree(partitions)
+
+    with ProcessPoolExecutor(4, mp_context=multiprocessing.get_context("fork")) as executor:
+        assert list(executor.map(_partitioned_rows, range(4))) == [expected] * 4
+    # No temporary directory is left behind
+    assert len(os.listdir(partitions)) == 1
+
+
+@pytest.mark.parametrize("options", [{}, {"format": "parquet"}, {"partitioned": True}])
+def test_columns_without_a_declared_dtype_are_read_as_text(static_server, monkeypatch, options):
+    url, _ = static_server({"papers.csv": b"id,date,citations,extra\n0704.0001,2021-03-01,3,a\n0704.0010,2022-05-01,4,b\n"})
+    dataset = Dataset("papers", f"{url}/papers.csv", date_column="date", dtypes={"citations": "int32", "doi": "Int64"})
+    monkeypatch.setitem(registry._registry, "papers", dataset)
+
+    dataframe = load_dataset("papers", **options).sort_values("id", ignore_index=True)
+
+    assert dataframe["id"].astype(str).tolist() == ["0704.0001", "0704.0010"]
+    assert dataframe["citations"].dtype == "int32"
+    assert dataframe["extra"].astype(str).tolist() == ["a", "b"]
+
+
+@pytest.mark.parametrize("options", [{}, {"format": "parquet"}, {"partitioned": True}, {"mmap": True}])
+def test_a_single_year_bound_is_ignored(options):
+    assert len(load_dataset("medline_large", start_year=2022, **options)) == 500
+    assert len(load_dataset("medline_large", end_year=2019, **options)) == 500
+
+
+def test_mmap_load_does_not_copy_the_file(cache_dir):
+    import pyarrow as pa
+
+    load_dataset("medline_large", mmap=True)
+    (name,) = [name for name in os.listdir(os.path.join(cache_dir, "columnar")) if name.endswith(".arrow")]
+    path = os.path.join(cache_dir, "columnar", name)
+    converted = os.path.getmtime(path)
+    allocated = pa.total_allocated_bytes()
+
+    dataframe = load_dataset("medline_large", 2019, 2020, columns=["PMID", "Title", "Year"], mmap=True)
+
+    # The Arrow file is reused and the columns point into its mapped pages
+    assert os.path.getmtime(path) == converted
+    assert pa.total_allocated_bytes() - allocated < os.path.getsize(path) // 100
+    assert list(dataframe.columns) == ["PMID", "Title", "Year"]
+    assert all(isinstance(dtype, pd.ArrowDtype) for dtype in dataframe.dtypes)
+    assert dataframe["Year"].between(2019, 2020).all()
+    assert len(dataframe) == len(load_dataset("medline_large", 2019, 2020))
+
+
+def test_empty_partitioned_dataset_reads_as_an_empty_frame(tmp_path):
+    empty = pd.DataFrame({"PMID": pd.Series([], dtype="Int64"), "Title": pd.Series([], dtype=str), "Year": pd.Series([], dtype="Int16")})
+    partition_dataset(empty, str(tmp_path), "empty")
+
+    for options in [{}, {"start_year": 2019, "end_year": 2020}]:
+        dataframe = read_partitions(str(tmp_path), **options)
+        assert dataframe.empty and list(dataframe.columns) == ["PMID", "Title", "Year"]
+    assert list(read_partitions(str(tmp_path), columns=["Title"]).columns) == ["Title"]
+
+
+def test_filtering_an_unknown_dataset_raises():
+    dataframe = load_dataset("medline_large", 2019, 2020)
+
+    for frame in [dataframe.drop(columns=["Year", "Month"]), dataframe]:
+        with pytest.raises(ValueError, match='Dataset "no_such_dataset" is not available.'):
+            filter_dataset("no_such_dataset", 2019, 2020, frame)
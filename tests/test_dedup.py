@@ -0,0 +1,106 @@
+import pandas as pd
+import pytest
+
+from nbdt import dedup, iter_dataset
+
+ABSTRACT = (
+    "dopamine release in the striatum encodes reward prediction errors during learning "
+    "in mice and monkeys over many trials of a task"
+)
+
+
+def _source():
+    return pd.DataFrame(
+        {
+            "ID": ["a", "b", "c", "d"],
+            "abstract": ["First  abstract", "Second abstract", "third ABSTRACT", ABSTRACT],
+            "version": [1, 1, 1, 1],
+        }
+    )
+
+
+def test_drop_duplicates_uses_the_normalized_text_and_the_id():
+    frame = pd.DataFrame(
+        {"ID": ["a", "b", "a", "c"], "abstract": ["One text", "one   TEXT", "Other", "Another"]}
+    )
+
+    # The first row has the text of the second and the ID of the third; the last of each is kept
+    kept = dedup.drop_duplicates(frame, "abstract", "ID")
+    assert kept["ID"].tolist() == ["b", "a", "c"]
+    assert kept["abstract"].tolist() == ["one   TEXT", "Other", "Another"]
+
+
+def test_merge_replaces_source_rows_with_the_same_text_or_id():
+    new = pd.DataFrame(
+        {"ID": ["a", "x", "y"], "abstract": ["Changed abstract", "second   abstract", "New abstract"], "version": 2}
+    )
+
+    merged = dedup.merge(_source(), new, "ID")
+
+    assert merged["ID"].tolist() == ["c", "d", "a", "x", "y"]
+    assert merged["version"].tolist() == [1, 1, 2, 2, 2]
+
+
+def test_merge_batches_matches_merge():
+    source = pd.concat([_source()] * 3, ignore_index=True).assign(ID=lambda f: f["ID"] + f.index.astype(str))
+    new = pd.DataFrame({"ID": ["a0", "z"], "abstract": ["Changed", "first abstract"], "version": 2})
+    batches = lambda: (source.iloc[i : i + 5] for i in range(0, len(source), 5))  # noqa: E731
+
+    streamed = pd.concat(list(dedup.merge_batches(batches, new, "ID")), ignore_index=True)
+
+    assert streamed.equals(dedup.merge(source, new, "ID"))
+    # Repeated source texts keep their last row, which "z" then replaces like "a0" replaces its ID
+    assert streamed["ID"].tolist() == ["b9", "c10", "d11", "a0", "z"]
+    assert streamed["version"].tolist() == [1, 1, 1, 2, 2]
+
+
+def test_near_duplicates_are_only_merged_when_asked():
+    new = pd.DataFrame({"ID": ["e"], "abstract": [ABSTRACT + " today"], "version": 2})
+
+    assert "d" in dedup.merge(_source(), new, "ID")["ID"].tolist()
+    assert "d" not in dedup.merge(_source(), new, "ID", near_duplicates=True)["ID"].tolist()
+    with pytest.raises(ValueError):
+        dedup.merge(_source(), new, "ID", index=dedup.DedupIndex.from_frame(_source(), "ID"), near_duplicates=True)
+
+
+def test_index_finds_new_rows_and_survives_a_round_trip(tmp_path):
+    index = dedup.DedupIndex.from_frame(_source(), "ID", near_duplicates=True)
+    index.save(str(tmp_path / "index.npz"))
+    loaded = dedup.DedupIndex.load(str(tmp_path / "index.npz"))
+    new = pd.DataFrame(
+        {"ID": ["b", "e", "f", "g", "g"], "abstract": ["Changed", "FIRST abstract", ABSTRACT + " today", "New", "New"]}
+    )
+
+    assert len(loaded) == 4 and loaded.near_duplicates
+    assert loaded.filter_new(new, "ID")["ID"].tolist() == ["g"]
+    assert dedup.DedupIndex.from_frame(_source(), "ID").filter_new(new, "ID")["ID"].tolist() == ["f", "g"]
+
+
+def test_loaded_index_is_not_sorted_again(tmp_path, monkeypatch):
+    index = dedup.DedupIndex.from_frame(_source(), "ID")
+    index.save(str(tmp_path / "index.npz"))
+    monkeypatch.setattr(dedup, "DELTA_SIZE", 3)
+    loaded = dedup.DedupIndex.load(str(tmp_path / "index.npz"))
+    added = pd.DataFrame({"ID": ["e", "f"], "abstract": ["Fifth abstract", "Sixth abstract"]})
+    new = pd.DataFrame({"ID": ["c", "e", "g"], "abstract": ["Changed", "New", "Seventh abstract"]})
+
+    with monkeypatch.context() as patch:
+        # Only the delta is sorted, once it holds DELTA_SIZE fingerprints
+        patch.setattr(dedup.np, "sort", lambda values: pytest.fail("sorted"))
+        loaded.add(added, "ID")
+        assert loaded.filter_new(new, "ID")["ID"].tolist() == ["g"]
+    loaded.add(new.iloc[2:], "ID")
+
+    assert loaded.ids.tolist() == dedup.DedupIndex.from_frame(pd.concat([_source(), added, new.iloc[2:]]), "ID").ids.tolist()
+    assert loaded.filter_new(new, "ID").empty
+
+
+def test_iter_dataset_streams_the_rows_of_the_selected_years():
+    batches = list(iter_dataset("medline_large", batch_size=120, columns=["PMID", "P_Date"], years=(2019, 2020)))
+
+    assert all(len(batch) <= 120 for batch in batches)
+    rows = pd.concat(batches)
+    assert list(rows.columns) == ["PMID", "P_Date"]
+    assert rows["P_Date"].str[:4].isin(["2019", "2020"]).all()
+    everything = pd.concat(iter_dataset("medline_large", batch_size=1000))
+    assert len(rows) == everything["P_Date"].str[:4].isin(["2019", "2020"]).sum()
@@ -0,0 +1,67 @@
+import gzip
+import hashlib
+import os
+
+import pytest
+
+from nbdt import download
+
+DATA = b"PMID,Title,Abstract\n" + b"1,neural cortex,synaptic plasticity memory dopamine\n" * 100000
+DIGEST = hashlib.sha256(DATA).hexdigest()
+# Eight chunks, larger than the blocks the server writes, so that a response can be cut halfway
+CHUNK_SIZE = -(-len(DATA) // 8)
+
+
+def test_ranges_are_downloaded_in_parallel(static_server, tmp_path, events):
+    url, counter = static_server({"file.csv": DATA})
+
+    info = download.download(f"{url}/file.csv", str(tmp_path / "file.csv"), sha256=DIGEST, chunk_size=CHUNK_SIZE)
+
+    assert (tmp_path / "file.csv").read_bytes() == DATA
+    assert info == {**info, "sha256": DIGEST, "size": len(DATA)}
+    # A HEAD request and one request per chunk
+    assert counter.snapshot()["requests"] == 9
+    assert [event["ranges"] for event in events if event["event"] == "download"] == [True]
+    assert not os.path.exists(tmp_path / "file.csv.part")
+
+
+def test_interrupted_download_resumes_with_the_missing_ranges(static_server, tmp_path, monkeypatch, events):
+    # The sixth request (the fifth chunk, after the HEAD request) is cut halfway and not retried
+    url, counter = static_server({"file.csv": DATA}, fail_request=6)
+    monkeypatch.setattr(download, "CHUNK_RETRIES", 1)
+    path = str(tmp_path / "file.csv")
+
+    with pytest.raises(Exception):
+        download.download(f"{url}/file.csv", path, sha256=DIGEST, max_workers=1, chunk_size=CHUNK_SIZE)
+    assert os.path.exists(path + ".part")
+    first = counter.snapshot()["requests"]
+
+    download.download(f"{url}/file.csv", path, sha256=DIGEST, max_workers=1, chunk_size=CHUNK_SIZE)
+
+    assert open(path, "rb").read() == DATA
+    # The four chunks before the cut one are kept; only a HEAD request and the chunks left are sent
+    resumed = [event["resumed_chunks"] for event in events if event["event"] == "download"]
+    assert resumed[0] >= 4
+    assert counter.snapshot()["requests"] - first == 1 + 8 - resumed[0]
+
+
+def test_server_without_ranges_is_read_in_one_request(static_server, tmp_path):
+    url, counter = static_server({"file.csv": DATA}, ranges=False, gzip_encoding=True)
+
+    info = download.download(f"{url}/file.csv", str(tmp_path / "file.csv"), sha256=DIGEST, chunk_size=CHUNK_SIZE)
+
+    # The gzip-encoded response is stored decoded
+    assert (tmp_path / "file.csv").read_bytes() == DATA
+    assert info["size"] == len(DATA)
+    assert counter.snapshot()["requests"] == 2
+
+
+def test_corrupt_download_is_discarded(static_server, tmp_path):
+    url, _ = static_server({"file.csv": gzip.compress(DATA)})
+    path = str(tmp_path / "file.csv")
+
+    with pytest.raises(ValueError):
+        download.download(f"{url}/file.csv", path, sha256=DIGEST)
+    with pytest.raises(ValueError):
+        download.download(f"{url}/file.csv", path, size=len(DATA))
+    assert os.listdir(tmp_path) == ["served0"]
@@ -0,0 +1,95 @@
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+from nbdt import build_features, state
+from nbdt.features import FEATURES, FeatureStore, load_features
+
+PAPERS = pd.DataFrame(
+    {
+        "title": ["Dopamine receptors", "Cortical circuits", "Dopamine release", "Hippocampal memory"],
+        "abstract": [
+            "Receptor binding of dopamine in the striatum.",
+            "Spiking of cortical neurons in layer five.",
+            "Dopamine release in the striatum of mice.",
+            "Place cells of the hippocampus store memory.",
+        ],
+        "journal": ["Neuron", "Cortex", "neuron", "Hippocampus"],
+    }
+)
+
+
+def _write(path, frame):
+    frame.to_csv(path, index=False)
+    # Later writes must change the recorded modification time
+    os.utime(path, ns=(time.time_ns(), time.time_ns() + 10**9))
+
+
+def _store(frame):
+    store = FeatureStore(sp.csr_matrix((0, FEATURES), dtype=np.float32), np.zeros(0, np.int32), [])
+    store.add(frame)
+    return store
+
+
+def test_papers_find_themselves_first(tmp_path):
+    path = tmp_path / "papers.csv"
+    _write(path, PAPERS)
+    store = build_features(str(path), max_workers=1)
+
+    rows, scores = store.nearest_papers(store.matrix, k=2)
+
+    assert rows[:, 0].tolist() == [0, 1, 2, 3]
+    assert np.allclose(scores[:, 0], 1, atol=1e-5)
+    # The two dopamine papers are each other's closest other paper
+    assert rows[0, 1] == 2 and rows[2, 1] == 0
+
+
+def test_texts_find_papers_and_journals(tmp_path):
+    path = tmp_path / "papers.csv"
+    _write(path, PAPERS)
+    store = build_features(str(path), max_workers=1)
+
+    rows, _ = store.nearest_papers(["place cells in the hippocampus"], k=1)
+    journals, _ = store.nearest_journals("dopamine in the striatum", k=2)
+
+    assert rows.tolist() == [[3]]
+    # Journals are grouped by their normalized name and shown as first written
+    assert store.journal_names == ["Neuron", "Cortex", "Hippocampus"]
+    assert journals[0, 0] == "Neuron"
+
+
+def test_added_papers_get_the_weights_of_a_full_build():
+    full = _store(PAPERS)
+    store = _store(PAPERS.iloc[:2])
+    store.add(PAPERS.iloc[2:])
+
+    assert np.allclose(store.idf, full.idf)
+    assert abs(store.matrix - full.matrix).max() < 1e-6
+    assert store.journals.tolist() == full.journals.tolist()
+
+
+def test_store_is_kept_and_rebuilt_when_the_file_changes(tmp_path):
+    path = tmp_path / "papers.csv"
+    _write(path, PAPERS)
+    store = build_features(str(path), max_workers=1)
+    assert os.path.exists(state.features_dir(str(path)))
+
+    loaded = load_features(str(path))
+    assert abs(loaded.counts - store.counts).max() == 0
+    assert loaded.journal_names == store.journal_names
+
+    _write(path, PAPERS.iloc[:3])
+    assert load_features(str(path)) is None
+    assert len(build_features(str(path), max_workers=1)) == 3
+
+
+def test_parallel_vectorizing_matches_one_process():
+    one = build_features("plos_one", batch_size=100, max_workers=1, rebuild=True)
+    two = build_features("plos_one", batch_size=100, max_workers=2, rebuild=True)
+
+    assert len(one) == 500
+    assert abs(one.counts - two.counts).max() == 0
+    assert one.journals.tolist() == two.journals.tolist()
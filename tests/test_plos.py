@@ -0,0 +1,76 @@
+import pandas as pd
+import pytest
+
+from nbdt import spool, state, update
+
+
+def _collect(path, paging):
+    return update.plos_one("2023-08-31", str(path), False, "2023-01-01", max_workers=2, paging=paging)
+
+
+def _incremental(path):
+    return update.update_dataset("plos_one", "2023-08-31", str(path), "2023-01-01", incremental=True, max_workers=1)
+
+
+def _crash_on_call(monkeypatch, owner, name, call):
+    # Makes owner.name raise on its call-th call, like a process killed at that point
+    original = getattr(owner, name)
+    calls = []
+
+    def crashing(*args, **kwargs):
+        calls.append(1)
+        if len(calls) == call:
+            raise RuntimeError("crash")
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(owner, name, crashing)
+
+
+def test_start_paging_fetches_every_page_once(plos_api, tmp_path):
+    path = tmp_path / "plos.csv"
+
+    assert _collect(path, "start")
+
+    stored = pd.read_csv(path)
+    assert len(stored) == 250 and stored["ID"].is_unique
+    # The count, then pages starting at 0, 100 and 200
+    assert plos_api.snapshot() == {"requests": 4, "records": 250}
+
+
+def test_cursor_paging_stops_when_the_cursor_mark_stops_moving(plos_api, tmp_path):
+    path = tmp_path / "plos.csv"
+
+    assert _collect(path, "cursor")
+
+    stored = pd.read_csv(path)
+    assert len(stored) == 250 and stored["ID"].is_unique
+    # The count, three pages, and the empty page returning the same cursorMark
+    assert plos_api.snapshot() == {"requests": 5, "records": 250}
+
+
+def test_large_results_are_paged_by_cursor(plos_api, tmp_path, monkeypatch):
+    monkeypatch.setattr(update, "PLOS_DEEP_PAGING_THRESHOLD", 100)
+
+    assert _collect(tmp_path / "plos.csv", None)
+
+    assert plos_api.snapshot()["requests"] == 5
+
+
+@pytest.mark.parametrize("threshold, cursor", [(10000, 100), (100, "200")])
+def test_interrupted_run_resumes_after_its_last_page(plos_api, tmp_path, monkeypatch, threshold, cursor):
+    monkeypatch.setattr(update, "PLOS_DEEP_PAGING_THRESHOLD", threshold)
+    path = tmp_path / "plos.csv"
+    with monkeypatch.context() as patch:
+        # The third page is fetched but not stored
+        _crash_on_call(patch, spool.PageSpool, "add", 3)
+        with pytest.raises(RuntimeError):
+            _incremental(path)
+    assert state.load_state(str(path))["run"]["cursor"] == cursor
+    records = plos_api.snapshot()["records"]
+
+    assert _incremental(path)
+
+    # Only the 50 articles of the last page are fetched again
+    assert plos_api.snapshot()["records"] - records == 50
+    stored = pd.read_csv(path)
+    assert len(stored) == 250 and stored["ID"].is_unique
@@ -0,0 +1,62 @@
+import sys
+from importlib.metadata import EntryPoint
+
+import pytest
+
+from nbdt import load_dataset, registry
+from nbdt.registry import ENTRY_POINT_GROUP, get_dataset, list_datasets
+
+PLUGIN = """
+from nbdt.registry import Dataset
+
+papers = Dataset("papers", "{url}/papers.csv", date_column="date")
+
+
+def more_papers():
+    return [Dataset("more_papers", "{url}/papers.csv", date_column="date"), Dataset("other_papers", "{url}/papers.csv", date_column="date")]
+"""
+
+
+@pytest.fixture
+def plugin(tmp_path, monkeypatch, static_server):
+    url, _ = static_server({"papers.csv": b"id,date\n0704.0001,2021-03-01\n"})
+    (tmp_path / "nbdt_plugin.py").write_text(PLUGIN.format(url=url))
+    (tmp_path / "nbdt_broken_plugin.py").write_text("raise ImportError('not installed')\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.setattr(registry, "_registry", dict(registry._registry))
+    entry_points = [
+        EntryPoint("papers", "nbdt_plugin:papers", ENTRY_POINT_GROUP),
+        EntryPoint("more_papers", "nbdt_plugin:more_papers", ENTRY_POINT_GROUP),
+        EntryPoint("broken", "nbdt_broken_plugin:papers", ENTRY_POINT_GROUP),
+        EntryPoint("medline_large", "nbdt_broken_plugin:papers", ENTRY_POINT_GROUP),
+    ]
+    monkeypatch.setattr(registry, "_entry_points", lambda: entry_points)
+    yield
+    # The next test writes the plugin with the URL of its own server
+    sys.modules.pop("nbdt_plugin", None)
+
+
+def test_entry_points_are_listed_without_being_imported(plugin):
+    names = list_datasets()
+
+    assert {"papers", "more_papers", "broken", "medline_large", "plos_one"} <= set(names)
+    assert names == sorted(names)
+
+
+def test_only_the_requested_entry_point_is_imported(plugin):
+    dataset = get_dataset("papers")
+
+    assert dataset.name == "papers"
+    assert load_dataset("papers")["id"].tolist() == ["0704.0001"]
+    with pytest.raises(ImportError):
+        get_dataset("broken")
+
+
+def test_entry_point_function_registers_every_dataset_it_returns(plugin):
+    assert get_dataset("more_papers").name == "more_papers"
+    assert "other_papers" in registry._registry
+
+
+def test_registered_datasets_take_precedence(plugin):
+    assert get_dataset("medline_large") is registry._registry["medline_large"]
+    assert get_dataset("no_such_dataset") is None
@@ -0,0 +1,73 @@
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from nbdt import build_index, load_dataset, state
+from nbdt.search import SearchIndex, load_index
+
+PAPERS = pd.DataFrame(
+    {
+        "title": ["Dopamine receptors", "Cortical circuits", "Dopamine and memory"],
+        "abstract": ["Receptor binding in the striatum.", "Spiking in the cortex.", "Memory needs the hippocampus."],
+        "authors": ["Doe, J.; Roe, R.", "Roe, R.; Moe, M.", "Poe, P.; Doe, J."],
+        "journal": ["Neuron", "Journal of Neuroscience", "neuron "],
+    }
+)
+
+
+def _write(path, frame):
+    frame.to_csv(path, index=False)
+    # Later writes must change the recorded modification time
+    os.utime(path, ns=(time.time_ns(), time.time_ns() + 10**9))
+
+
+def test_lookups_return_the_matching_rows(tmp_path):
+    path = tmp_path / "papers.csv"
+    _write(path, PAPERS)
+
+    index = build_index(str(path))
+
+    assert len(index) == 3
+    assert index.keyword("dopamine").tolist() == [0, 2]
+    assert index.keyword("DOPAMINE receptor").tolist() == [0]
+    assert index.keyword("dopamine", "cortex").tolist() == []
+    assert index.author("roe,  r.").tolist() == [0, 1]
+    assert index.journal("NEURON").tolist() == [0, 2]
+    assert index.journal("Nature").tolist() == []
+
+
+def test_index_is_stored_and_rebuilt_when_the_file_changes(tmp_path):
+    path = tmp_path / "papers.csv"
+    _write(path, PAPERS)
+    build_index(str(path))
+    assert os.path.exists(state.index_dir(str(path)))
+    assert load_index(str(path)).keyword("cortex").tolist() == [1]
+
+    _write(path, PAPERS.iloc[::-1])
+
+    assert load_index(str(path)) is None
+    assert build_index(str(path)).keyword("cortex").tolist() == [1]
+    assert build_index(str(path), rebuild=True).keyword("hippocampus").tolist() == [0]
+
+
+def test_added_rows_are_indexed_like_a_full_build():
+    index = SearchIndex.from_batches([PAPERS.iloc[:2]])
+    index.add(PAPERS.iloc[2:])
+    expected = SearchIndex.from_batches([PAPERS])
+
+    assert len(index) == 3
+    for field, arrays in expected._fields.items():
+        for array, other in zip(arrays, index._fields[field]):
+            assert np.array_equal(array, other)
+
+
+def test_published_dataset_lookups_match_a_scan():
+    index = build_index("medline_large")
+    dataframe = load_dataset("medline_large")
+
+    text = (dataframe["Title"] + " " + dataframe["Abstract"]).str.lower()
+    expected = np.flatnonzero(text.str.contains(r"\bdopamine\b") & text.str.contains(r"\bsynaptic\b"))
+    assert index.keyword("dopamine synaptic").tolist() == expected.tolist()
+    assert index.journal("Journal 7").tolist() == np.flatnonzero(dataframe["Journal"] == "Journal 7").tolist()
@@ -0,0 +1,213 @@
+import datetime
+import os
+
+import pandas as pd
+import pytest
+
+from nbdt import dedup, spool, state, update
+from nbdt.storage import read_frame
+
+
+def _incremental(path, end_date, **options):
+    return update.update_dataset("bioarxiv", end_date, str(path), "2023-01-01", incremental=True, max_workers=1, **options)
+
+
+def _crash_on_call(monkeypatch, owner, name, call):
+    # Makes owner.name raise on its call-th call, like a process killed at that point
+    original = getattr(owner, name)
+    calls = []
+
+    def crashing(*args, **kwargs):
+        calls.append(1)
+        if len(calls) == call:
+            raise RuntimeError("crash")
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(owner, name, crashing)
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [("2023-08-20", "2023-08-20"), ("2023-02-03", "2023-02-03"), ("20-08-2023", "2023-08-20"), ("08-2023", "2023-08-01")],
+)
+def test_dates_are_parsed_iso_first_then_day_first(text, expected):
+    assert update._parse_date(text).isoformat() == expected
+
+
+def test_month_end_handles_december():
+    assert update._month_end(datetime.date(2023, 12, 5)).isoformat() == "2023-12-31"
+    assert update._month_end(datetime.date(2024, 2, 1)).isoformat() == "2024-02-29"
+
+
+def test_incremental_run_keeps_the_requested_end_date(biorxiv_api, tmp_path):
+    path = tmp_path / "bioarxiv.csv"
+
+    assert _incremental(path, "2023-08-20")
+
+    assert len(pd.read_csv(path)) == 250
+    assert state.load_state(str(path)) == {"dataset": "bioarxiv", "last_date": "2023-08-20", "run": None}
+    assert not os.path.exists(state.pages_dir(str(path)))
+
+
+def test_up_to_date_dataset_is_not_fetched_again(biorxiv_api, tmp_path):
+    path = tmp_path / "bioarxiv.csv"
+    _incremental(path, "2023-08-20")
+    requests = biorxiv_api.snapshot()["requests"]
+
+    assert _incremental(path, "2023-08-01")
+    assert biorxiv_api.snapshot()["requests"] == requests
+
+
+def test_later_run_only_appends_new_papers(biorxiv_api, tmp_path):
+    path = tmp_path / "bioarxiv.parquet"
+    _incremental(path, "2023-08-20")
+
+    # The mock API serves the same papers again; they are all stored already
+    assert _incremental(path, "2023-09-10")
+
+    assert len(read_frame(str(path))) == 250
+    assert state.load_state(str(path))["last_date"] == "2023-09-10"
+
+
+def test_interrupted_run_resumes_after_its_last_page(biorxiv_api, tmp_path, monkeypatch):
+    path = tmp_path / "bioarxiv.csv"
+    # The third page is fetched but not stored
+    _crash_on_call(monkeypatch, spool.PageSpool, "add", 3)
+
+    with pytest.raises(RuntimeError):
+        _incremental(path, "2023-08-20")
+    run = state.load_state(str(path))["run"]
+    assert run == {"window": ["2023-01-01", "2023-08-20"], "cursor": 100}
+    requests = biorxiv_api.snapshot()["requests"]
+
+    assert _incremental(path, "2023-08-20")
+
+    # The first page (for the total) and the one left
+    assert biorxiv_api.snapshot()["requests"] - requests == 2
+    stored = pd.read_csv(path)
+    assert len(stored) == 250 and stored["ID"].is_unique
+
+
+@pytest.mark.parametrize("file_name", ["bioarxiv.csv", "bioarxiv.parquet"])
+@pytest.mark.parametrize("crash", ["dedup index", "state"])
+def test_run_interrupted_while_appending_appends_once(biorxiv_api, tmp_path, monkeypatch, file_name, crash):
+    path = tmp_path / file_name
+    _incremental(path, "2023-06-30")
+    with monkeypatch.context() as patch:
+        if crash == "dedup index":
+            _crash_on_call(patch, dedup.DedupIndex, "save", 1)
+        else:
+            # The page cursors and the append marker are saved before the final state
+            _crash_on_call(patch, state, "save_state", 1 + 3 + 1)
+        os.remove(state.dedup_path(str(path)))
+        stored = read_frame(str(path))
+        # Pretend the first run stored only half of the papers
+        half = stored.iloc[:125]
+        os.remove(path)
+        update.append_frame(half, str(path))
+        with pytest.raises(RuntimeError):
+            _incremental(path, "2023-08-20")
+        assert len(read_frame(str(path))) == 250
+
+    assert _incremental(path, "2023-08-20")
+
+    stored = read_frame(str(path))
+    assert len(stored) == 250 and stored["ID"].is_unique
+    assert state.load_state(str(path))["run"] is None
+
+
+def test_update_merges_new_papers_into_the_published_dataset(biorxiv_api, tmp_path):
+    path = tmp_path / "bioarxiv.parquet"
+
+    assert update.update_dataset("bioarxiv", "2023-08-31", str(path), "2023-01-01", update=True)
+
+    merged = read_frame(str(path))
+    assert merged["ID"].is_unique
+    # The published dataset has IDs 10.1101/00000000 to 00000499; the first 250 are replaced by the collected papers
+    collected = merged[merged["abstract"].str.startswith("Abstract of paper")]
+    assert len(collected) == 250
+    assert len(merged) > 250
+
+
+def test_unknown_dataset_is_reported():
+    assert update.update_dataset("medline_large", "2023-08-31", "medline.csv") is False
+
+
+def test_update_all_reports_every_dataset(biorxiv_api, tmp_path):
+    results = update.update_all(
+        "2023-08-31", {"bioarxiv": str(tmp_path / "bioarxiv.csv"), "medline_large": str(tmp_path / "medline.csv")}
+    )
+
+    assert {name: result["ok"] for name, result in results.items()} == {"bioarxiv": True, "medline_large": False}
+    assert len(pd.read_csv(tmp_path / "bioarxiv.csv")) == 250
+
+
+@pytest.mark.parametrize("file_name", ["arxiv.parquet", "arxiv.feather"])
+@pytest.mark.parametrize("incremental", [False, True])
+def test_arxiv_update_writes_columnar_files(arxiv_api, tmp_path, file_name, incremental):
+    path = str(tmp_path / file_name)
+
+    assert update.update_dataset("arxiv", "2023-09-30", path, "2023-08-31", update=True, incremental=incremental)
+
+    merged = read_frame(path)
+    assert list(merged.columns) == update.ARXIV_COLUMNS
+    collected = merged[merged["title"].str.startswith("Brain paper")]
+    # The 50 papers go back to 2023-09-17; their lists and timestamps are stored as the published strings
+    assert len(collected) == 50
+    assert collected["authors"].iloc[0] == "Author 0"
+    assert collected["categories"].iloc[0] == "q-bio.NC"
+    assert collected["update_date"].iloc[0] == "2023-09-30"
+
+
+def test_arxiv_harvest_only_fetches_the_date_window(arxiv_api, tmp_path):
+    path = tmp_path / "arxiv.csv"
+
+    assert update.update_dataset("arxiv", "2023-09-25", str(path), "2023-09-20", incremental=True)
+
+    stored = pd.read_csv(path)
+    # Papers 17 (2023-09-25 18:00) to 40 (2023-09-20 00:00)
+    assert sorted(stored["title"]) == sorted(f"Brain paper {i}" for i in range(17, 41))
+    # Paper 16 (2023-09-26 00:00) is on the minute closing the window and is dropped after it is served
+    assert arxiv_api.snapshot()["records"] == 25
+
+
+def test_interrupted_arxiv_harvest_resumes_at_its_offset(arxiv_api, tmp_path, monkeypatch):
+    monkeypatch.setattr(update, "ARXIV_PAGE_SIZE", 10)
+    path = tmp_path / "arxiv.csv"
+    with monkeypatch.context() as patch:
+        # The second page is fetched but not stored
+        _crash_on_call(patch, spool.PageSpool, "add", 2)
+        with pytest.raises(RuntimeError):
+            update.update_dataset("arxiv", "2023-09-25", str(path), "2023-09-20", incremental=True)
+    # The offset counts paper 16, served and skipped before the first page
+    assert state.load_state(str(path))["run"]["cursor"] == 11
+    records = arxiv_api.snapshot()["records"]
+
+    assert update.update_dataset("arxiv", "2023-09-25", str(path), "2023-09-20", incremental=True)
+
+    # The search restarts at the 12th result
+    assert arxiv_api.snapshot()["records"] - records == 14
+    stored = pd.read_csv(path)
+    assert len(stored) == 24 and stored["id"].is_unique
+
+
+def test_interrupted_source_copy_leaves_no_partial_file(biorxiv_api, tmp_path, monkeypatch):
+    path = tmp_path / "bioarxiv.csv"
+    source_batches = update._source_batches
+
+    def crashing(dataset_name):
+        batches = source_batches(dataset_name)
+        yield next(batches)
+        raise RuntimeError("crash")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(update, "SOURCE_BATCH_SIZE", 100)
+        patch.setattr(update, "_source_batches", crashing)
+        with pytest.raises(RuntimeError):
+            update.update_dataset("bioarxiv", "2023-08-31", str(path), "2023-01-01", update=True, incremental=True)
+    assert not path.exists()
+
+    assert update.update_dataset("bioarxiv", "2023-08-31", str(path), "2023-01-01", update=True, incremental=True)
+
+    # The 500 published papers, of which the first 250 have the IDs of the collected ones
+    assert len(pd.read_csv(path)) == 500